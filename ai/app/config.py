@@ -0,0 +1,165 @@
+"""
+Configuración central de EdiCarex AI.
+Se carga una sola vez en el arranque (lifespan) y solo se recarga de forma explícita
+desde el endpoint de administración.
+"""
+from typing import Dict, List, Optional
+from dotenv import dotenv_values
+from pydantic_settings import BaseSettings, SettingsConfigDict
+import os
+
+ENV_FILE = ".env"
+
+# Variables que load_env_file copió desde .env (las que el proceso ya traía no se tocan)
+_DOTENV_KEYS: set = set()
+
+
+def load_env_file(path: str = ENV_FILE) -> None:
+    """
+    Copia .env al entorno del proceso sin pisar variables definidas por el despliegue.
+    En una recarga refresca (o retira) las que vinieron de .env, ya que pydantic-settings
+    prioriza el entorno sobre el archivo y, si no, las ediciones de .env no se verían.
+    """
+    values = {key: value for key, value in dotenv_values(path).items() if value is not None}
+    for key in _DOTENV_KEYS - values.keys():
+        os.environ.pop(key, None)
+        _DOTENV_KEYS.discard(key)
+    for key, value in values.items():
+        if key in _DOTENV_KEYS or key not in os.environ:
+            os.environ[key] = value
+            _DOTENV_KEYS.add(key)
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=ENV_FILE, env_file_encoding="utf-8", extra="ignore")
+
+    # Credenciales y modelos del gateway LLM (orden = prioridad de fallback)
+    groq_api_key: Optional[str] = None
+    groq_models: List[str] = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768"]
+
+    # Pool HTTP compartido hacia Groq
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 60.0
+    http_connect_timeout: float = 5.0
+
+    # Hedging entre modelos: si el modelo en curso no responde dentro del percentil
+    # indicado de su latencia observada, se lanza en paralelo el siguiente modelo.
+    hedge_enabled: bool = True
+    hedge_percentile: float = 95.0
+    hedge_min_delay: float = 0.5
+    hedge_default_delay: float = 3.0
+
+    # Limitador de cuota Groq (peticiones y tokens por minuto) con clases de prioridad
+    # (menor número = mayor prioridad). Los valores por defecto siguen el plan gratuito.
+    rate_limit_enabled: bool = True
+    groq_requests_per_minute: int = 30
+    groq_tokens_per_minute: int = 6000
+    priority_classes: Dict[str, int] = {
+        "triage": 0,
+        "chat": 1,
+        "summarization": 2,
+        "pharmacy": 3,
+        "analytics": 4,
+    }
+
+    # Presupuesto de tokens del prompt de usuario por endpoint (las secciones recortables
+    # se reducen y las series largas se sustituyen por agregados para no excederlo)
+    prompt_token_budgets: Dict[str, int] = {
+        "default": 4000,
+        "triage": 1200,
+        "chat": 3000,
+        "pharmacy": 1500,
+        "analytics": 2500,
+        "summarization": 6000,
+    }
+
+    # Resumen por fragmentos (map-reduce) para notas largas: tokens por fragmento y
+    # fragmentos resumidos en paralelo
+    summarization_chunk_tokens: int = 1200
+    summarization_max_concurrency: int = 8
+    # Pre-resumen extractivo (TF-IDF): solo recorta notas de un único paso que superan el
+    # objetivo; en map-reduce se aplica a cada fragmento (proporción de tokens conservada).
+    # Estimación inicial de ms de LLM por token de entrada (se ajusta con lo observado)
+    summarization_extractive_target_tokens: int = 6000
+    summarization_chunk_extractive_ratio: float = 0.6
+    summarization_ms_per_token: float = 1.0
+
+    # Sesiones de chat en el servidor: LRU acotado con expiración por inactividad y
+    # SQLite opcional (vacío = solo en memoria). Al superar el presupuesto de tokens del
+    # historial, los mensajes antiguos se compactan en un resumen acumulado; cada turno
+    # envía solo ese resumen y los últimos mensajes.
+    chat_sessions_path: Optional[str] = None
+    chat_max_sessions: int = 5000
+    chat_session_ttl: float = 3600.0
+    chat_history_token_budget: int = 1200
+    chat_recent_messages: int = 6
+    chat_summary_max_tokens: int = 400
+
+    # Léxico versionado de términos de emergencia del filtro de seguridad del chat
+    emergency_lexicon_path: str = "models/emergency_lexicon_v1.json"
+
+    # Base de conocimiento curada del chat (preguntas frecuentes respondidas sin LLM) y
+    # similitud coseno mínima para responder desde ella
+    chat_faq_path: str = "models/chat_faq_v1.json"
+    chat_faq_threshold: float = 0.65
+
+    # Caché semántica del chat: vecino más cercano sobre vectores locales (float16) de
+    # preguntas autocontenidas ya respondidas por el LLM; excluye mensajes con datos personales
+    chat_semantic_cache_enabled: bool = True
+    chat_semantic_cache_threshold: float = 0.88
+    chat_semantic_cache_capacity: int = 100000
+    chat_semantic_cache_dim: int = 256
+
+    # Circuit breaker por modelo
+    breaker_failure_threshold: int = 5
+    breaker_error_rate_threshold: float = 0.5
+    breaker_window: int = 20
+    breaker_min_requests: int = 10
+    breaker_cooldown: float = 30.0
+
+    # Plazo máximo total por endpoint (segundos) antes del respaldo de emergencia
+    default_deadline: float = 60.0
+    endpoint_deadlines: Dict[str, float] = {
+        "triage": 8.0,
+        "chat": 20.0,
+        "pharmacy": 30.0,
+        "analytics": 45.0,
+        "summarization": 45.0,
+    }
+
+    # Triaje por vía rápida: si reglas y modelo local coinciden por encima de estos
+    # umbrales, se responde sin esperar al LLM (la justificación llega después)
+    triage_fast_path_enabled: bool = True
+    triage_fast_path_min_score: int = 90
+    triage_fast_path_min_severity: float = 0.8
+
+    # Artefacto del modelo local de severidad de triaje (scripts/train_severity_model.py)
+    severity_model_path: str = "models/triage_severity_v1.npy"
+
+    # Estado incremental de pronóstico de farmacia (SQLite en datos de ejecución, fuera de
+    # models/ que solo guarda artefactos versionados; vacío = solo en memoria)
+    demand_state_path: Optional[str] = "data/demand_state.db"
+
+    # Monitor de conectividad en segundo plano (/health)
+    health_check_interval: float = 30.0
+    health_check_timeout: float = 5.0
+
+    # Intervalo de muestreo del retraso del event loop (/metrics)
+    event_loop_lag_interval: float = 0.5
+
+    # Caché de respuestas LLM por endpoint (TTL en segundos, tamaño en entradas).
+    # Triaje y chat quedan excluidos por defecto.
+    cache_sqlite_path: Optional[str] = None
+    cache_policies: Dict[str, dict] = {
+        "default": {"enabled": False},
+        "triage": {"enabled": False},
+        "chat": {"enabled": False},
+        "pharmacy": {"ttl": 3600, "max_entries": 2048, "disk": True, "disk_ttl": 6 * 3600},
+        "analytics": {"ttl": 900, "max_entries": 256, "disk": True, "disk_ttl": 3600},
+        "summarization": {"ttl": 1800, "max_entries": 512, "disk": True, "disk_ttl": 24 * 3600},
+    }
+
+    # Token para operaciones de administración (recarga de configuración)
+    ai_admin_token: Optional[str] = None
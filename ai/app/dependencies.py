@@ -0,0 +1,56 @@
+"""
+Dependencias de FastAPI de EdiCarex AI.
+Exponen a los routers las instancias de alcance de aplicación creadas en el lifespan.
+Las peticiones que llegan durante el calentamiento esperan a que termine.
+"""
+from fastapi import Request
+import asyncio
+from app.services.groq_service import GroqService
+from app.services.triage_service import TriageService
+from app.services.pharmacy_service import PharmacyService
+from app.services.analytics_service import AnalyticsService
+from app.services.summarization_service import SummarizationService
+from app.services.chat_service import ChatService
+from app.services.generator_service import GeneratorService
+
+
+async def wait_until_warm(request: Request):
+    """Espera el calentamiento del lifespan (si sigue en curso); propaga su error si falló."""
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is not None:
+        await asyncio.shield(warmup)
+
+
+async def get_groq_service(request: Request) -> GroqService:
+    await wait_until_warm(request)
+    return request.app.state.groq
+
+
+async def get_triage_service(request: Request) -> TriageService:
+    await wait_until_warm(request)
+    return request.app.state.triage_service
+
+
+async def get_pharmacy_service(request: Request) -> PharmacyService:
+    await wait_until_warm(request)
+    return request.app.state.pharmacy_service
+
+
+async def get_analytics_service(request: Request) -> AnalyticsService:
+    await wait_until_warm(request)
+    return request.app.state.analytics_service
+
+
+async def get_summarization_service(request: Request) -> SummarizationService:
+    await wait_until_warm(request)
+    return request.app.state.summarization_service
+
+
+async def get_chat_service(request: Request) -> ChatService:
+    await wait_until_warm(request)
+    return request.app.state.chat_service
+
+
+async def get_generator_service(request: Request) -> GeneratorService:
+    await wait_until_warm(request)
+    return request.app.state.generator_service
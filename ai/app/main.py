@@ -1,21 +1,117 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import triage, summarization, pharmacy, generator, chat, analytics
-from dotenv import load_dotenv
+from app.routers import triage, summarization, pharmacy, generator, chat, analytics, admin, health, metrics
+from app.config import Settings, load_env_file
+from app.services.groq_service import GroqService
+from app.services.triage_service import TriageService
+from app.services.severity_model import SeverityModel
+from app.services.pharmacy_service import PharmacyService
+from app.services.demand_state import DemandStateStore
+from app.services.analytics_service import AnalyticsService
+from app.services.summarization_service import SummarizationService
+from app.services.chat_service import ChatService
+from app.services.generator_service import GeneratorService
+from app.services.chat_sessions import ChatSessionStore
+from app.services.safety_filter import EmergencyClassifier
+from app.services.faq_index import FaqIndex
+from app.services.health_monitor import HealthMonitor
+from app.utils.metrics import EventLoopMonitor, MetricsMiddleware
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
 import os
 import logging
+import time
 
 # Configuración de Logging Profesional
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("EdiCarexAI")
 
-load_dotenv()
+load_env_file()
+
+
+# Dependencias pesadas que no se importan con app.main: se cargan en el calentamiento
+WARMUP_MODULES = ("groq", "httpx", "sklearn.feature_extraction.text")
+
+
+def _preload_modules():
+    for name in WARMUP_MODULES:
+        importlib.import_module(name)
+
+
+async def warm_up(app: FastAPI):
+    """
+    Construye una única vez el gateway LLM, los modelos locales y los servicios.
+    Corre en segundo plano para que /health/live responda mientras tanto; las rutas
+    que necesitan servicios esperan a que termine.
+    """
+    start = time.perf_counter()
+    settings = app.state.settings
+    await asyncio.to_thread(_preload_modules)
+    severity_model = await asyncio.to_thread(SeverityModel.load, settings.severity_model_path)
+    demand_state = await asyncio.to_thread(DemandStateStore, settings.demand_state_path or None)
+    safety = await asyncio.to_thread(EmergencyClassifier.load, settings.emergency_lexicon_path)
+    faq = await asyncio.to_thread(FaqIndex.load, settings.chat_faq_path, settings.chat_faq_threshold)
+
+    groq = GroqService(settings)
+    app.state.groq = groq
+    app.state.demand_state = demand_state
+    app.state.triage_service = TriageService(groq, severity_model)
+    app.state.pharmacy_service = PharmacyService(groq, demand_state)
+    app.state.analytics_service = AnalyticsService(groq)
+    app.state.summarization_service = SummarizationService(groq)
+    app.state.generator_service = GeneratorService()
+    chat_sessions = ChatSessionStore(settings.chat_max_sessions, settings.chat_session_ttl, settings.chat_sessions_path or None)
+    app.state.chat_sessions = chat_sessions
+    app.state.chat_service = ChatService(groq, chat_sessions, safety, faq)
+    monitor = HealthMonitor(groq, interval=settings.health_check_interval, timeout=settings.health_check_timeout)
+    app.state.health_monitor = monitor
+    monitor.start()
+    app.state.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Gateway LLM de EdiCarex inicializado en {app.state.warmup_ms} ms.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Carga la configuración y lanza el calentamiento sin bloquear el arranque del servidor.
+    """
+    app.state.settings = Settings()
+    app.state.warmup_ms = None
+    app.state.loop_monitor = EventLoopMonitor(app.state.settings.event_loop_lag_interval)
+    app.state.loop_monitor.start()
+    app.state.warmup = asyncio.create_task(warm_up(app), name="edicarex-warmup")
+    yield
+    warmup = app.state.warmup
+    warmup.cancel()
+    try:
+        await warmup
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"El calentamiento de EdiCarex falló: {e}")
+
+    state = app.state
+    await state.loop_monitor.stop()
+    if getattr(state, "health_monitor", None) is not None:
+        await state.health_monitor.stop()
+    if getattr(state, "triage_service", None) is not None:
+        await state.triage_service.close()
+    if getattr(state, "demand_state", None) is not None:
+        state.demand_state.close()
+    if getattr(state, "chat_service", None) is not None:
+        await state.chat_service.close()
+        state.chat_sessions.close()
+    if getattr(state, "groq", None) is not None:
+        await state.groq.close()
+
 
 app = FastAPI(
     title="EdiCarex AI Enterprise",
     description="Servicios de Inteligencia Artificial de nivel Senior para la plataforma EdiCarex. Todos los servicios están optimizados para el área clínica y financiera.",
     version="2.5.0",
+    lifespan=lifespan,
 )
 
 # Middleware de Manejo de Errores Global (Estilo Senior)
@@ -40,32 +136,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas de latencia por ruta (middleware ASGI puro, más externo que CORS)
+app.add_middleware(MetricsMiddleware)
+
 # Registro de Routers
 app.include_router(triage.router, prefix="/predict", tags=["Triage Médico"])
 app.include_router(summarization.router, prefix="", tags=["Resúmenes Clínicos"])
 app.include_router(pharmacy.router, prefix="/pharmacy", tags=["Gestión de Farmacia"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analítica Financiera"])
+app.include_router(generator.router, prefix="/generator", tags=["Documentación Clínica"])
 app.include_router(chat.router, prefix="/ai", tags=["Asistente Virtual"])
-
-
-@app.get("/health", tags=["Sistema"])
-async def health_check():
-    from app.services.groq_service import GroqService
-    groq = GroqService()
-    connectivity = await groq.verify_connectivity()
-    
-    return {
-        "status": "online" if connectivity else "degraded",
-        "service": "EdiCarex AI Enterprise",
-        "engines": {
-            "core": "Llama 3.1 & Mixtral (Groq LPU)",
-            "statistical": "Pandas & Numpy",
-            "clinical": "Scikit-Learn Severity Cluster",
-            "security": "JOSE & Passlib (Integrity Mode)"
-        },
-        "connectivity": "verified" if connectivity else "failure",
-        "version": "2.5.0"
-    }
+app.include_router(admin.router, prefix="/admin", tags=["Administración"])
+app.include_router(health.router, prefix="/health", tags=["Sistema"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Sistema"])
 
 
 @app.get("/", include_in_schema=False)
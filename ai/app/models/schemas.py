@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
+import datetime
 
 
 class TriageInput(BaseModel):
@@ -14,17 +15,48 @@ class TriageOutput(BaseModel):
     priority: str = Field(..., description="Nivel de prioridad: BAJA, NORMAL, ALTA, URGENTE")
     notes: str = Field(..., description="Notas de triaje y recomendaciones")
     confidence: float = Field(..., ge=0, le=1, description="Confianza de la predicción")
+    triage_id: Optional[str] = Field(default=None, description="ID para consultar la justificación LLM diferida (vía rápida)")
+    enrichment: Optional[str] = Field(default=None, description="Estado de la justificación LLM diferida: 'pending'")
+
+
+class TriageEnrichmentOutput(BaseModel):
+    triage_id: str
+    status: str = Field(..., description="Estado de la justificación LLM: pending, completed o failed")
+    priority: str = Field(..., description="Prioridad asignada por la vía rápida")
+    score: int = Field(..., ge=0, le=100)
+    confidence: float = Field(..., ge=0, le=1)
+    notes: str = Field(..., description="Notas de triaje (justificación LLM cuando está disponible)")
+    llm_priority: Optional[str] = Field(default=None, description="Prioridad sugerida por el LLM (solo informativa)")
+
+
+class TriageBatchInput(BaseModel):
+    patients: List[TriageInput] = Field(..., min_length=1, max_length=500, description="Pacientes a triar en lote")
+    max_concurrency: int = Field(default=8, ge=1, le=32, description="Llamadas LLM simultáneas máximas")
+
+
+class TriageBatchItem(TriageOutput):
+    index: int = Field(..., description="Posición del paciente en el lote de entrada")
+    source: str = Field(..., description="Origen del resultado: 'rules' (vía rápida; justificación LLM diferida en triage_id), 'groq' o 'fallback'")
 
 
 class SummarizationInput(BaseModel):
     text: str = Field(..., description="Texto clínico a resumir")
     max_length: Optional[int] = Field(default=200, description="Longitud máxima del resumen")
+    mode: str = Field(default="auto", pattern="^(auto|single|chunked|extractive)$",
+                      description="auto (fragmenta notas largas) | single | chunked | extractive (sin LLM)")
+    max_concurrency: Optional[int] = Field(default=None, ge=1, le=16, description="Fragmentos resumidos en paralelo")
+    target_tokens: Optional[int] = Field(default=None, ge=32, le=50000, description="Presupuesto de tokens de la etapa extractiva")
 
 
 class SummarizationOutput(BaseModel):
     summary: str = Field(..., description="Texto resumido")
     original_length: int = Field(..., description="Longitud del texto original")
     summary_length: int = Field(..., description="Longitud del resumen")
+    clinical_entities: List[str] = Field(default=[], description="Entidades clínicas sin duplicados")
+    mode: str = Field(default="single", description="Modo aplicado: single, chunked o extractive")
+    chunks: int = Field(default=1, description="Fragmentos procesados por el LLM")
+    compression_ratio: float = Field(default=1.0, description="Tokens enviados al LLM / tokens originales")
+    llm_time_saved_ms: float = Field(default=0.0, description="Tiempo de LLM estimado ahorrado por la etapa extractiva")
 
 
 class PharmacyDemandInput(BaseModel):
@@ -40,6 +72,69 @@ class PharmacyDemandOutput(BaseModel):
     recommendation: str = Field(..., description="Recomendación de stock")
 
 
+class PharmacyBatchItem(BaseModel):
+    medication_id: str = Field(..., description="ID del medicamento")
+    historical_data: List[float] = Field(default=[], description="Consumo por periodo, del más antiguo al más reciente")
+    current_stock: Optional[int] = Field(default=None, ge=0, description="Stock disponible (opcional)")
+
+
+class PharmacyBatchInput(BaseModel):
+    items: List[PharmacyBatchItem] = Field(..., min_length=1, max_length=20000, description="Catálogo a pronosticar")
+    days_ahead: int = Field(default=30, ge=1, le=365, description="Días a predecir a futuro")
+    season_length: int = Field(default=7, ge=2, le=90, description="Periodos por ciclo estacional")
+    interval_level: float = Field(default=0.9, gt=0.5, lt=1, description="Nivel del intervalo de predicción")
+    include_narratives: bool = Field(default=False, description="Generar narrativa LLM para medicamentos señalados")
+    max_narratives: int = Field(default=20, ge=0, le=200, description="Máximo de narrativas LLM por lote")
+
+
+class PharmacyForecast(BaseModel):
+    medication_id: str
+    predicted_demand: int = Field(..., description="Demanda acumulada predicha en el horizonte")
+    lower_bound: int = Field(..., description="Límite inferior del intervalo de predicción")
+    upper_bound: int = Field(..., description="Límite superior del intervalo de predicción")
+    daily_demand: float = Field(..., description="Demanda media diaria predicha")
+    method: str = Field(..., description="Método de pronóstico seleccionado")
+    confidence: float = Field(..., ge=0, le=1)
+    flags: List[str] = Field(default=[], description="Motivos de revisión")
+    recommendation: str = Field(..., description="Recomendación de stock")
+    narrative_source: str = Field(default="local", description="local | groq")
+
+
+class PharmacyBatchOutput(BaseModel):
+    days_ahead: int
+    interval_level: float
+    forecasts: List[PharmacyForecast]
+    flagged: int = Field(..., description="Medicamentos señalados para revisión")
+    narratives_generated: int = Field(default=0, description="Narrativas generadas por el LLM")
+    processing_ms: float
+
+
+class ConsumptionRecord(BaseModel):
+    medication_id: str = Field(..., description="ID del medicamento")
+    date: datetime.date = Field(..., description="Día del consumo")
+    quantity: float = Field(..., ge=0, description="Unidades consumidas ese día")
+
+
+class ConsumptionIngestInput(BaseModel):
+    records: List[ConsumptionRecord] = Field(..., min_length=1, max_length=100000, description="Consumos a añadir")
+
+
+class ConsumptionIngestOutput(BaseModel):
+    accepted: int = Field(..., description="Registros aplicados al estado")
+    skipped: int = Field(..., description="Registros descartados por fecha ya ingerida")
+    medications: int = Field(..., description="Medicamentos actualizados")
+    tracked: int = Field(..., description="Medicamentos con estado almacenado")
+
+
+class PharmacyStateForecastInput(BaseModel):
+    medication_ids: List[str] = Field(..., min_length=1, max_length=20000, description="Medicamentos a pronosticar")
+    days_ahead: int = Field(default=30, ge=1, le=365, description="Días a predecir a futuro")
+    interval_level: float = Field(default=0.9, gt=0.5, lt=1, description="Nivel del intervalo de predicción")
+    current_stock: Dict[str, int] = Field(default={}, description="Stock disponible por medicamento (opcional)")
+    include_narratives: bool = Field(default=False, description="Generar narrativa LLM para medicamentos señalados")
+    max_narratives: int = Field(default=20, ge=0, le=200, description="Máximo de narrativas LLM por lote")
+
+
 class TextGeneratorInput(BaseModel):
     template_type: str = Field(..., description="Tipo de texto médico: receta, referencia, alta")
     patient_data: Dict = Field(..., description="Datos del paciente para la generación")
@@ -51,20 +146,38 @@ class TextGeneratorOutput(BaseModel):
     template_type: str
 
 
+class GeneratorBulkRecord(BaseModel):
+    patient_data: Dict = Field(..., description="Datos del paciente para la generación")
+    additional_notes: Optional[str] = Field(default="", description="Notas adicionales")
+    template_type: Optional[str] = Field(default=None, description="Sobrescribe el tipo de plantilla del lote")
+
+
+class GeneratorBulkInput(BaseModel):
+    template_type: Optional[str] = Field(default=None, description="Tipo de plantilla por defecto del lote: receta, referencia, alta")
+    records: List[GeneratorBulkRecord] = Field(..., min_length=1, max_length=20000, description="Registros de pacientes a documentar (máximo 20000 por lote)")
+    format: str = Field(default="ndjson", pattern="^(ndjson|zip)$", description="ndjson (un documento por línea) o zip (un .txt por documento)")
+
+
 class ChatInput(BaseModel):
     message: str = Field(..., description="Mensaje del usuario al asistente médico IA")
     context: Optional[str] = Field(default="", description="Contexto adicional para la conversación")
-    history: Optional[List[Dict]] = Field(default=[], description="Historial de chat")
+    history: Optional[List[Dict]] = Field(default=[], description="Historial de chat (solo si la sesión aún no existe en el servidor)")
+    session_id: Optional[str] = Field(default=None, max_length=128, description="ID de la sesión de chat en el servidor (se crea si se omite)")
 
 
 class ChatOutput(BaseModel):
     response: str = Field(..., description="Respuesta del asistente IA")
     confidence: float = Field(default=0.85, ge=0, le=1, description="Confianza de la respuesta")
     suggestions: Optional[List[str]] = Field(default=[], description="Sugerencias de seguimiento")
-    source: str = Field(default="groq", description="Fuente de la respuesta: 'groq' o 'local_fallback'")
+    source: str = Field(default="groq", description="Fuente de la respuesta: 'groq', 'local_faq', 'semantic_cache', 'security_filter' o 'local_fallback'")
     model: Optional[str] = Field(default=None, description="Nombre del modelo de IA específico utilizado")
+    session_id: Optional[str] = Field(default=None, description="ID de la sesión de chat para el siguiente turno")
+    safety_match: Optional[Dict] = Field(default=None, description="Término de emergencia que activó el filtro de seguridad")
 
 
 class AnalyticsInput(BaseModel):
     financial_data: Dict = Field(..., description="Datos financieros históricos por mes")
+    mode: str = Field(default="hybrid", pattern="^(hybrid|local)$", description="hybrid (insight LLM) | local (sin LLM)")
+    horizon: int = Field(default=6, ge=1, le=24, description="Meses a proyectar")
+    metric: Optional[str] = Field(default=None, description="Métrica del histórico a proyectar (por defecto revenue)")
 
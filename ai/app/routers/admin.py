@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from typing import Optional
+import asyncio
+from app.config import Settings, load_env_file
+from app.services.groq_service import GroqService
+from app.services.chat_service import ChatService
+from app.services.faq_index import FaqIndex
+from app.dependencies import get_groq_service, get_chat_service
+
+router = APIRouter()
+
+
+def require_admin_token(request: Request, x_admin_token: Optional[str] = Header(default=None)):
+    """Valida el token de administración configurado en AI_ADMIN_TOKEN."""
+    expected = request.app.state.settings.ai_admin_token
+    if not expected:
+        raise HTTPException(status_code=403, detail="Operaciones de administración deshabilitadas (AI_ADMIN_TOKEN no configurado).")
+    if x_admin_token != expected:
+        raise HTTPException(status_code=401, detail="Token de administración inválido.")
+
+
+@router.post("/reload-config", dependencies=[Depends(require_admin_token)])
+async def reload_config(request: Request, groq: GroqService = Depends(get_groq_service)):
+    """
+    Recarga explícita de la configuración del gateway LLM: credenciales, modelos, cuota y
+    prioridades del limitador, políticas de caché, umbrales de los circuit breakers e
+    intervalos de los monitores de salud y del event loop. Los parámetros de cada petición
+    (plazos, presupuestos de tokens, vía rápida de triaje, resumen) se leen de la
+    configuración vigente en cada llamada.
+
+    Requieren reinicio: el pool HTTP, las rutas SQLite (caché, sesiones, estado de demanda)
+    y los artefactos cargados al arrancar (léxico, preguntas frecuentes, caché semántica,
+    modelo de severidad). Las variables de entorno del despliegue prevalecen sobre .env.
+    
+    Retorna:
+        - models: Lista de modelos activa tras la recarga
+        - credentials: Si se encontró la credencial de Groq
+    """
+    # Refresca primero las variables que vinieron de .env: el entorno tiene prioridad sobre el archivo
+    load_env_file()
+    settings = Settings()
+    groq.reload(settings)
+    request.app.state.settings = settings
+    monitor = request.app.state.health_monitor
+    monitor.interval = settings.health_check_interval
+    monitor.timeout = settings.health_check_timeout
+    request.app.state.loop_monitor.interval = settings.event_loop_lag_interval
+    await monitor.check_all()
+    return {
+        "status": "reloaded",
+        "models": groq.models,
+        "credentials": bool(groq.client),
+    }
+
+
+@router.get("/cache/stats", dependencies=[Depends(require_admin_token)])
+async def cache_stats(groq: GroqService = Depends(get_groq_service),
+                      chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Contadores de la caché de respuestas LLM por endpoint (aciertos, fallos, desalojos),
+    de la coalescencia single-flight, de los recortes de prompt por presupuesto de tokens,
+    de las preguntas frecuentes del chat respondidas sin LLM y de la caché semántica del chat.
+    """
+    return {
+        **groq.cache.snapshot(),
+        "singleflight": {"coalesced": groq.singleflight.coalesced, "inflight": groq.singleflight.inflight},
+        "prompt_truncations": groq.prompt_stats,
+        "chat_faq": {**chat_service.faq_stats, "version": chat_service.faq.version},
+        "chat_semantic_cache": chat_service.semantic_cache.snapshot() if chat_service.semantic_cache is not None else None,
+    }
+
+
+@router.post("/cache/clear", dependencies=[Depends(require_admin_token)])
+async def cache_clear(endpoint: Optional[str] = None, groq: GroqService = Depends(get_groq_service),
+                      chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Vacía la caché de respuestas (de un endpoint concreto o completa).
+    Con `endpoint=chat` o sin endpoint también se vacía la caché semántica del chat.
+    """
+    groq.cache.clear(endpoint)
+    if chat_service.semantic_cache is not None and endpoint in (None, "chat"):
+        chat_service.semantic_cache.clear()
+    return {"status": "cleared", "endpoint": endpoint or "all"}
+
+
+@router.post("/faq/reload", dependencies=[Depends(require_admin_token)])
+async def reload_faq(request: Request, chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Reconstruye el índice de preguntas frecuentes del chat desde CHAT_FAQ_PATH sin reiniciar.
+    Si la base de conocimiento no es válida se conserva el índice anterior.
+    """
+    settings = request.app.state.settings
+    try:
+        faq = await asyncio.to_thread(FaqIndex.load, settings.chat_faq_path, settings.chat_faq_threshold)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Base de conocimiento inválida: {e}")
+    chat_service.reload_faq(faq)
+    return {"status": "reloaded", "version": faq.version, "entries": len(faq)}
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.models.schemas import AnalyticsInput
 from app.services.analytics_service import AnalyticsService
+from app.dependencies import get_analytics_service
 
 router = APIRouter()
-analytics_service = AnalyticsService()
 
 @router.post("/predict/growth")
-async def predict_growth(data: AnalyticsInput):
+async def predict_growth(data: AnalyticsInput, analytics_service: AnalyticsService = Depends(get_analytics_service)):
     """
     Predice el crecimiento futuro y las tendencias basándose en datos financieros reales.
+
+    Las proyecciones, intervalos y `accuracy_score` (backtest) salen del motor estadístico
+    local. Con `mode=local` no se invoca al LLM; en `hybrid` el LLM redacta el `insight`.
+    Con menos de dos meses de histórico no se proyecta: `predictions` vacío y
+    `projected_annual_growth`/`accuracy_score` en null (`source: "fallback"`).
     """
     try:
-        result = await analytics_service.predict_growth(data.financial_data)
+        result = await analytics_service.predict_growth(data.financial_data, data.mode, data.horizon, data.metric)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fallo en la predicción analítica: {str(e)}")
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.models.schemas import ChatInput, ChatOutput
 from app.services.chat_service import ChatService
+from app.dependencies import get_chat_service
+import json
 
 router = APIRouter()
-chat_service = ChatService()
 
 
 @router.post("/chat", response_model=ChatOutput)
-async def medical_chat(data: ChatInput):
+async def medical_chat(data: ChatInput, chat_service: ChatService = Depends(get_chat_service)):
     """
     Endpoint del Chat Médico IA.
     
@@ -23,3 +25,35 @@ async def medical_chat(data: ChatInput):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en el chat: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def medical_chat_stream(data: ChatInput, chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Chat Médico IA en streaming (Server-Sent Events).
+    
+    Eventos:
+        - token: Fragmento de texto de la respuesta a medida que se genera
+        - done: Metadatos finales (confidence, suggestions, source, model, timings)
+        - error: La respuesta se interrumpió
+    """
+    async def event_source():
+        async for event in chat_service.stream(data):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/chat/sessions/{session_id}")
+async def reset_chat_session(session_id: str, chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Elimina la sesión de chat del servidor (historial y resumen acumulado).
+    """
+    if not await chat_service.reset_session(session_id):
+        raise HTTPException(status_code=404, detail="Sesión de chat no encontrada")
+    return {"session_id": session_id, "deleted": True}
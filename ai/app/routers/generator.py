@@ -1,16 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import TextGeneratorInput, TextGeneratorOutput
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.models.schemas import TextGeneratorInput, TextGeneratorOutput, GeneratorBulkInput
 from app.services.generator_service import GeneratorService
+from app.dependencies import get_generator_service
+from app.utils.zip_stream import ZipStream
+from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter()
-generator_service = GeneratorService()
+
+# Registros renderizados por tramo (en un hilo) antes de enviar sus bytes al cliente
+BULK_CHUNK = 256
 
 
 @router.post("/text", response_model=TextGeneratorOutput)
-async def generate_text(data: TextGeneratorInput):
+async def generate_text(data: TextGeneratorInput, generator_service: GeneratorService = Depends(get_generator_service)):
     """
     Generar documentos de texto médicos (recetas, referencias, resúmenes de alta).
-    
+
     Retorna:
         - generated_text: Documento médico generado
         - template_type: Tipo de documento generado
@@ -20,3 +28,66 @@ async def generate_text(data: TextGeneratorInput):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fallo en la generación de texto: {str(e)}")
+
+
+def _ndjson_chunk(generator_service: GeneratorService, records: list, default_type, start: int) -> bytes:
+    return "".join(
+        json.dumps(result, ensure_ascii=False) + "\n"
+        for result in generator_service.generate_many(records, default_type, start)
+    ).encode("utf-8")
+
+
+def _zip_chunk(generator_service: GeneratorService, records: list, default_type, start: int,
+               archive: ZipStream, errors: list) -> bytes:
+    for result in generator_service.generate_many(records, default_type, start):
+        if "error" in result:
+            errors.append(result)
+        else:
+            archive.add(f"{result['index'] + 1:06d}_{result['template_type']}.txt", result["generated_text"])
+    return archive.drain()
+
+
+@router.post("/bulk")
+async def generate_bulk(data: GeneratorBulkInput, generator_service: GeneratorService = Depends(get_generator_service)):
+    """
+    Generar documentos médicos en lote (p. ej. recetas o altas de cierre de mes), hasta
+    20000 registros por petición; los lotes mayores se envían en varias peticiones.
+
+    Los documentos se renderizan por tramos y se envían según se generan, sin acumular
+    el lote completo en memoria:
+        - ndjson: una línea {index, template_type, generated_text} (o {index, error}) por registro
+        - zip: un .txt por documento y errores.ndjson con los registros que fallaron
+    """
+    if data.template_type:
+        try:
+            generator_service.resolve(data.template_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    records = data.records
+
+    def chunks():
+        for start in range(0, len(records), BULK_CHUNK):
+            yield start, [record.model_dump() for record in records[start:start + BULK_CHUNK]]
+
+    if data.format == "zip":
+        async def stream_zip():
+            archive, errors = ZipStream(), []
+            for start, chunk in chunks():
+                yield await asyncio.to_thread(
+                    _zip_chunk, generator_service, chunk, data.template_type, start, archive, errors
+                )
+            if errors:
+                archive.add("errores.ndjson", "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in errors))
+            yield archive.close()
+
+        filename = f"edicarex_documentos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            stream_zip(), media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    async def stream_ndjson():
+        for start, chunk in chunks():
+            yield await asyncio.to_thread(_ndjson_chunk, generator_service, chunk, data.template_type, start)
+
+    return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson")
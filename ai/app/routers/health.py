@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+def warmup_status(request: Request) -> dict:
+    """Estado del calentamiento del lifespan (carga de dependencias y servicios)."""
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None or (warmup.done() and not warmup.cancelled() and warmup.exception() is None):
+        status = "done"
+    elif not warmup.done():
+        status = "pending"
+    else:
+        status = "failed"
+    return {"status": status, "duration_ms": getattr(request.app.state, "warmup_ms", None)}
+
+
+@router.get("")
+async def health_check(request: Request):
+    """
+    Estado general del servicio, servido desde la caché del monitor de conectividad.
+    """
+    warmup = warmup_status(request)
+    if warmup["status"] != "done":
+        return {"status": "starting", "service": "EdiCarex AI Enterprise", "warmup": warmup, "version": "2.5.0"}
+
+    monitor = request.app.state.health_monitor
+    groq = request.app.state.groq
+    ready = monitor.ready
+    if not monitor.last_run:
+        connectivity = "pending"
+    else:
+        connectivity = "verified" if ready else "failure"
+
+    return {
+        "status": "online" if ready else "degraded",
+        "service": "EdiCarex AI Enterprise",
+        "engines": {
+            "core": "Llama 3.1 & Mixtral (Groq LPU)",
+            "statistical": "Pandas & Numpy",
+            "clinical": "Scikit-Learn Severity Cluster",
+            "security": "JOSE & Passlib (Integrity Mode)"
+        },
+        "connectivity": connectivity,
+        "warmup": warmup,
+        "monitor": monitor.snapshot(),
+        "breakers": groq.breaker_snapshot(),
+        "latency": groq.latency.snapshot(),
+        "rate_limiter": groq.limiter.snapshot(),
+        "version": "2.5.0"
+    }
+
+
+@router.get("/live")
+async def liveness():
+    """Liveness: el proceso está vivo y atiende peticiones."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """
+    Readiness: calentamiento completado y al menos un backend LLM respondió en la
+    última ronda del monitor. Retorna 503 para que el balanceador deje de enrutar a este pod.
+    """
+    warmup = warmup_status(request)
+    if warmup["status"] != "done":
+        return JSONResponse(status_code=503, content={"status": "not_ready", "warmup": warmup})
+    monitor = request.app.state.health_monitor
+    if not monitor.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "monitor": monitor.snapshot()})
+    return {"status": "ready"}
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("")
+async def prometheus_metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por ruta y por modelo,
+    reintentos, respaldos, fallos de JSON, tokens y retraso del event loop.
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
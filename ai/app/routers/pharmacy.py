@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import PharmacyDemandInput, PharmacyDemandOutput
+from fastapi import APIRouter, Depends, HTTPException
+from app.models.schemas import (
+    PharmacyDemandInput, PharmacyDemandOutput, PharmacyBatchInput, PharmacyBatchOutput,
+    ConsumptionIngestInput, ConsumptionIngestOutput, PharmacyStateForecastInput
+)
 from app.services.pharmacy_service import PharmacyService
+from app.dependencies import get_pharmacy_service
 
 router = APIRouter()
-pharmacy_service = PharmacyService()
 
 
 @router.post("/demand", response_model=PharmacyDemandOutput)
-async def predict_demand(data: PharmacyDemandInput):
+async def predict_demand(data: PharmacyDemandInput, pharmacy_service: PharmacyService = Depends(get_pharmacy_service)):
     """
     Predecir la demanda de medicamentos de la farmacia utilizando pronósticos de series temporales.
     
@@ -22,3 +25,42 @@ async def predict_demand(data: PharmacyDemandInput):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fallo en la predicción de demanda: {str(e)}")
+
+
+@router.post("/demand/batch", response_model=PharmacyBatchOutput)
+async def predict_demand_batch(data: PharmacyBatchInput, pharmacy_service: PharmacyService = Depends(get_pharmacy_service)):
+    """
+    Pronosticar la demanda de todo el catálogo en una sola llamada con el motor local
+    (suavizado exponencial, Croston o estacional ingenuo según el historial de cada medicamento).
+
+    Retorna por medicamento la demanda acumulada en `days_ahead`, el intervalo de predicción,
+    el método elegido y las alertas. Con `include_narratives` el LLM redacta la recomendación
+    solo de los medicamentos señalados.
+    """
+    try:
+        return await pharmacy_service.predict_demand_batch(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fallo en la predicción de demanda por lote: {str(e)}")
+
+
+@router.post("/consumption", response_model=ConsumptionIngestOutput)
+async def ingest_consumption(data: ConsumptionIngestInput, pharmacy_service: PharmacyService = Depends(get_pharmacy_service)):
+    """
+    Añadir consumos diarios (append-only) al estado incremental de pronóstico.
+    Los registros de días ya ingeridos para un medicamento se descartan.
+    """
+    try:
+        return await pharmacy_service.ingest_consumption(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fallo en la ingesta de consumos: {str(e)}")
+
+
+@router.post("/demand/state", response_model=PharmacyBatchOutput)
+async def forecast_from_state(data: PharmacyStateForecastInput, pharmacy_service: PharmacyService = Depends(get_pharmacy_service)):
+    """
+    Pronosticar a partir del estado ingerido: solo se envían los IDs, sin historial.
+    """
+    try:
+        return await pharmacy_service.forecast_from_state(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fallo en el pronóstico desde estado: {str(e)}")
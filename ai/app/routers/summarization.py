@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.models.schemas import SummarizationInput, SummarizationOutput
 from app.services.summarization_service import SummarizationService
+from app.dependencies import get_summarization_service
 
 router = APIRouter()
-summarization_service = SummarizationService()
 
 
 @router.post("/summarize", response_model=SummarizationOutput)
-async def summarize_text(data: SummarizationInput):
+async def summarize_text(data: SummarizationInput, summarization_service: SummarizationService = Depends(get_summarization_service)):
     """
     Resumir notas clínicas y registros médicos.
     
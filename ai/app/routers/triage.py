@@ -1,13 +1,15 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import TriageInput, TriageOutput
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List
+from app.models.schemas import TriageInput, TriageOutput, TriageBatchInput, TriageBatchItem, TriageEnrichmentOutput
 from app.services.triage_service import TriageService
+from app.dependencies import get_triage_service
 
 router = APIRouter()
-triage_service = TriageService()
 
 
 @router.post("/triage", response_model=TriageOutput)
-async def predict_triage(data: TriageInput):
+async def predict_triage(data: TriageInput, triage_service: TriageService = Depends(get_triage_service)):
     """
     Predicción de triaje impulsada por IA basada en síntomas, signos vitales y datos del paciente.
     
@@ -22,3 +24,56 @@ async def predict_triage(data: TriageInput):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fallo en la predicción de triaje: {str(e)}")
+
+
+@router.post("/triage/batch", response_model=List[TriageBatchItem])
+async def predict_triage_batch(data: TriageBatchInput, stream: bool = True,
+                               triage_service: TriageService = Depends(get_triage_service)):
+    """
+    Triaje masivo para simulacros y eventos con víctimas múltiples.
+    
+    Con `stream=true` (por defecto) retorna NDJSON: los pacientes de vía rápida (mismo
+    criterio que /predict/triage) se emiten primero y el resto a medida que el LLM
+    termina. Con `stream=false`
+    retorna la lista completa en el orden de entrada.
+    
+    Cada elemento incluye:
+        - index: Posición del paciente en la petición
+        - score, priority, notes, confidence: Resultado del triaje
+        - source: 'rules', 'groq' o 'fallback'
+        - triage_id, enrichment: en 'rules', justificación LLM diferida (GET /predict/triage/{triage_id})
+    """
+    results = triage_service.predict_batch(data.patients, data.max_concurrency)
+
+    if stream:
+        async def ndjson():
+            async for index, result, source in results:
+                item = TriageBatchItem(index=index, source=source, **result.model_dump())
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    try:
+        items = [
+            TriageBatchItem(index=index, source=source, **result.model_dump())
+            async for index, result, source in results
+        ]
+        return sorted(items, key=lambda item: item.index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fallo en el triaje por lote: {str(e)}")
+
+
+@router.get("/triage/{triage_id}", response_model=TriageEnrichmentOutput)
+async def get_triage_enrichment(triage_id: str, triage_service: TriageService = Depends(get_triage_service)):
+    """
+    Consulta la justificación clínica LLM de un triaje resuelto por vía rápida.
+    
+    Retorna:
+        - status: pending, completed o failed
+        - notes: Justificación LLM cuando está disponible
+        - llm_priority: Prioridad sugerida por el LLM (informativa; no reemplaza la asignada)
+    """
+    entry = triage_service.enrichments.get(triage_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Triaje no encontrado o expirado.")
+    return entry
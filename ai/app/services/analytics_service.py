@@ -1,90 +1,130 @@
-from app.models.schemas import ChatOutput
 from app.services.groq_service import GroqService
-import json
+from app.services.growth_forecast import extract_series, forecast_growth
+from app.utils.metrics import FALLBACKS
+from typing import List, Optional
 import logging
-import pandas as pd
-import numpy as np
 
 logger = logging.getLogger("EdiCarexAI.Analytics")
 
+# Campos de etiqueta temporal que se conservan en el histórico enviado al LLM
+PERIOD_FIELDS = ("month", "period", "date", "label", "name", "year")
+
+CFO_PERSONA = (
+    "Eres el Director Financiero (CFO) de EdiCarex Enterprise de nivel Global. "
+    "Tu análisis debe ser puramente estratégico y basado en datos reales. "
+    "Identifica ineficiencias, proyecta ROI y utiliza un lenguaje corporativo de alta finanza médica."
+)
+
+INSIGHT_TASK = """
+TAREA:
+Las proyecciones, intervalos y la precisión ya fueron calculados por el motor estadístico local; no los recalcules.
+Redacta el insight ejecutivo a partir de ellos:
+1. Insight de Inversión Hospitalaria: dónde asignar capital (e.g., ampliar Farmacia, mejorar UCI, contrataciones).
+2. Análisis de Riesgos Financieros: según la amplitud de los intervalos y la volatilidad.
+
+FORMATO JSON REQUERIDO:
+{"insight": "Narrativa ejecutiva profunda y formateada con markdown (listas, negritas) en español."}
+"""
+
+
 class AnalyticsService:
     """
     Servicio de Analítica Predictiva CFO de EdiCarex.
     Especializado en proyecciones de ingresos y estrategia hospitalaria.
+    Las cifras las calcula el motor local; el LLM solo redacta el insight.
     """
-    def __init__(self):
-        self.groq = GroqService()
+    def __init__(self, groq: GroqService):
+        self.groq = groq
 
-    async def predict_growth(self, financial_data: dict) -> dict:
+    async def predict_growth(self, financial_data: dict, mode: str = "hybrid", horizon: int = 6,
+                             metric: Optional[str] = None) -> dict:
         """
         Genera proyecciones estratégicas utilizando el cerebro de EdiCarex.
+        `mode="local"` omite el LLM (para dashboards de refresco frecuente).
         """
-        system_persona = (
-            "Eres el Director Financiero (CFO) de EdiCarex Enterprise de nivel Global. "
-            "Tu análisis debe ser puramente estratégico y basado en datos reales. "
-            "Identifica ineficiencias, proyecta ROI y utiliza un lenguaje corporativo de alta finanza médica."
-        )
-        
-        # Procesamiento estadístico local (Hybrid Intelligence)
-        trend_analysis = "No data available in local engine"
-        if financial_data.get("history") or financial_data.get("monthlyBreakdown"):
-            try:
-                history = financial_data.get("history") or financial_data.get("monthlyBreakdown")
-                df = pd.DataFrame(history)
-                if not df.empty and "revenue" in df.columns:
-                    mean_val = df["revenue"].mean()
-                    std_val = df["revenue"].std()
-                    trend = (df["revenue"].iloc[-1] - df["revenue"].iloc[0]) / len(df) if len(df) > 1 else 0
-                    trend_analysis = f"Media de Ingresos: {mean_val:.2f}, Volatilidad (STD): {std_val:.2f}, Delta de Crecimiento: {trend:.2f}/mes"
-            except Exception as e:
-                logger.warning(f"Error en pre-procesamiento estadístico EdiCarex: {e}")
+        history = financial_data.get("history") or financial_data.get("monthlyBreakdown") or []
+        labels, values, metric = extract_series(history if isinstance(history, list) else [], metric)
+        forecast = forecast_growth(labels, values, horizon) if len(values) else None
+        if forecast is None:
+            return self._fallback_prediction(financial_data)
 
-        prompt = f"""
-        REPORTE ESTRATÉGICO DE CRECIMIENTO HOSPITALARIO (EdiCarex CFO Core)
-        
-        INDICADORES ESTADÍSTICOS TÉCNICOS (Pandas Engine):
-        {trend_analysis}
+        result = {
+            "predictions": forecast["predictions"],
+            "insight": self._local_insight(forecast, metric),
+            "projected_annual_growth": forecast["projected_annual_growth"],
+            "accuracy_score": forecast["accuracy_score"],
+            "model": forecast["method"],
+            "metric": metric,
+            "backtest": forecast["backtest"],
+            "mode": mode,
+            "source": "local",
+        }
+        if mode == "local":
+            return result
 
-        CONJUNTO DE DATOS FINANCIEROS:
-        {json.dumps(financial_data, indent=2)}
-        
-        REQUERIMIENTOS DEL REPORTE:
-        1. Proyecciones Semestrales: Detalla mes a mes con intervalos de confianza realistas.
-        2. Insight de Inversión Hospitalaria: Una recomendación de alto nivel sobre dónde asignar capital (e.g., ampliar Farmacia, mejorar UCI, contrataciones).
-        3. Análisis de Riesgos Financieros: Basado en la volatilidad de los datos proporcionados.
-        
-        FORMATO JSON REQUERIDO:
-        {{
-            "predictions": [
-                {{"month": "Nombre", "predicted": float, "confidence": float}}
-            ],
-            "insight": "Narrativa ejecutiva profunda y formateada con markdown (listas, negritas) en español.",
-            "projected_annual_growth": float,
-            "accuracy_score": float
-        }}
-        """
+        indicators = {k: v for k, v in financial_data.items() if k not in ("history", "monthlyBreakdown")}
+        prompt = (
+            self.groq.prompt_builder("analytics")
+            .section(None, "REPORTE ESTRATÉGICO DE CRECIMIENTO HOSPITALARIO (EdiCarex CFO Core)")
+            .data("PROYECCIÓN DEL MOTOR LOCAL", {
+                "metrica": metric, "modelo": forecast["method"], "estadisticas": forecast["stats"],
+                "crecimiento_anual_proyectado_pct": forecast["projected_annual_growth"],
+                "precision_backtest": forecast["accuracy_score"],
+                "proyecciones": [[p["month"], p["predicted"], p["lower"], p["upper"]] for p in forecast["predictions"]],
+            })
+            .data("INDICADORES FINANCIEROS", indicators)
+            .records("HISTÓRICO", history, fields=self._history_fields(history))
+            .section(None, INSIGHT_TASK)
+            .build()
+        )
 
         try:
-            result = await self.groq.execute_prompt(prompt, system_persona)
-            if result:
+            llm = await self.groq.execute_prompt(prompt, CFO_PERSONA, endpoint="analytics")
+            if llm and not llm.get("fallback") and llm.get("insight"):
+                insight = llm["insight"]
                 # Post-procesamiento EdiCarex para asegurar profesionalidad
-                if "strategic" not in result.get("insight", "").lower():
-                    result["insight"] = "### [ANÁLISIS ESTRATÉGICO EDICAREX]\n\n" + result.get("insight", "")
-                
+                if "strategic" not in insight.lower():
+                    insight = "### [ANÁLISIS ESTRATÉGICO EDICAREX]\n\n" + insight
+                result["insight"] = insight
+                result["source"] = "groq"
                 logger.info("Información estratégica de EdiCarex generada exitosamente.")
-                return result
-            return self._fallback_prediction(financial_data)
         except Exception as e:
             logger.error(f"Error en analítica EdiCarex: {e}")
-            return self._fallback_prediction(financial_data)
+        return result
+
+    def _local_insight(self, forecast: dict, metric: str) -> str:
+        """Insight determinístico a partir de las cifras del motor local."""
+        predictions = forecast["predictions"]
+        growth = forecast["projected_annual_growth"]
+        trend = "crecimiento" if growth > 1 else "contracción" if growth < -1 else "estabilidad"
+        widest = max(predictions, key=lambda p: p["upper"] - p["lower"])
+        return (
+            "### [ANÁLISIS ESTRATÉGICO EDICAREX]\n\n"
+            f"- **Tendencia de {metric}:** {trend} ({growth:+.1f}% anual proyectado, modelo {forecast['method']}).\n"
+            f"- **Próximo mes ({predictions[0]['month']}):** {predictions[0]['predicted']:,.2f} "
+            f"(intervalo {predictions[0]['lower']:,.2f} – {predictions[0]['upper']:,.2f}).\n"
+            f"- **Mayor incertidumbre:** {widest['month']} (±{(widest['upper'] - widest['lower']) / 2:,.2f}).\n"
+            f"- **Precisión en backtest:** {forecast['accuracy_score']:.0%}."
+        )
+
+    def _history_fields(self, history) -> Optional[List[str]]:
+        """Columnas útiles del histórico: la etiqueta de periodo y las métricas numéricas."""
+        if not isinstance(history, list) or not history or not isinstance(history[0], dict):
+            return None
+        first = history[0]
+        return [
+            k for k, v in first.items()
+            if k in PERIOD_FIELDS or (isinstance(v, (int, float)) and not isinstance(v, bool))
+        ]
 
     def _fallback_prediction(self, data: dict) -> dict:
-        """Contingencia profesional de EdiCarex."""
+        """Con menos de dos observaciones no hay base para proyectar: se informa sin inventar cifras."""
+        FALLBACKS.inc("analytics")
         return {
-            "predictions": [
-                {"month": "Mes Proyectado", "predicted": 5000.0, "confidence": 0.8}
-            ],
-            "insight": "Análisis en modo de respaldo. Los datos sugieren una trayectoria estable. Se recomienda activar el motor avanzado para insights profundos de EdiCarex.",
-            "projected_annual_growth": 5.2,
-            "accuracy_score": 0.6
+            "predictions": [],
+            "insight": "Análisis en modo de respaldo. Se requieren al menos dos meses de histórico con métricas numéricas (`history` o `monthlyBreakdown`) para proyectar.",
+            "projected_annual_growth": None,
+            "accuracy_score": None,
+            "model": None,
+            "source": "fallback",
         }
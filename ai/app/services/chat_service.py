@@ -1,7 +1,37 @@
 from app.models.schemas import ChatInput, ChatOutput
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 import re
+import time
+import uuid
+import asyncio
+import logging
 from app.services.groq_service import GroqService
+from app.services.chat_sessions import ChatSession, ChatSessionStore
+from app.services.safety_filter import EmergencyClassifier
+from app.services.faq_index import FaqIndex
+from app.utils.prompt_builder import truncate_text
+from app.utils.metrics import FALLBACKS
+from app.utils.semantic_cache import SemanticCache
+from app.utils.term_matcher import TermMatcher
+
+logger = logging.getLogger("EdiCarexAI.Chat")
+
+SUMMARY_PERSONA = "Eres el documentalista de EdiCarex: condensas conversaciones médicas sin perder datos clínicos."
+
+# Intenciones de la respuesta local de respaldo (autómata compilado al importar)
+LOCAL_INTENTS = TermMatcher({
+    **dict.fromkeys(["hola", "buenos dias", "buenas tardes", "buenas noches", "quien eres"], "saludo"),
+    **dict.fromkeys(["fiebre", "calentura", "temperatura alta", "febril"], "fiebre"),
+})
+
+COMPACTION_TASK = """
+Actualiza el resumen de la conversación integrando los mensajes nuevos.
+- Conserva síntomas, antecedentes, medicamentos, datos del paciente y recomendaciones ya dadas.
+- Omite saludos y cortesías. Máximo %d palabras.
+
+FORMATO JSON:
+{"summary": "resumen actualizado"}
+"""
 
 class ChatService:
     """
@@ -9,34 +39,245 @@ class ChatService:
     Provee respuestas inteligentes y orientación médica bajo la identidad EdiCarex.
     """
 
-    def __init__(self):
-        self.groq_service = GroqService()
-        
-        # Respuestas generales EdiCarex
-        self.general_responses = {
-            "saludo": "¡Hola! Soy EdiCarex AI, tu asistente médico inteligente. Estoy aquí para orientarte en temas de salud. ¿Cómo puedo ayudarte hoy?",
-            "despedida": "Gracias por confiar en EdiCarex. Recuerda que esta información es orientativa. ¡Cuídate mucho!",
-            "emergencia": "⚠️ ATENCIÓN: Si experimentas una emergencia, contacta de inmediato al 911 o acude al centro de salud más cercano. La seguridad es nuestra prioridad en EdiCarex.",
-            "cita": "En EdiCarex facilitamos tu acceso a la salud. Puedes agendar una cita en la sección de 'Citas' del menú.",
-        }
-
-        self.knowledge_base = {
-            "fiebre": {
-                "causes": ["Infecciones", "Inflamación"],
-                "recommendations": ["Hidratación", "Reposo", "Monitoreo de temperatura"],
-            },
-            # ... más base de conocimiento ...
-        }
+    def __init__(self, groq: GroqService, sessions: Optional[ChatSessionStore] = None,
+                 safety: Optional[EmergencyClassifier] = None, faq: Optional[FaqIndex] = None,
+                 semantic_cache: Optional[SemanticCache] = None):
+        self.groq_service = groq
+        settings = groq.settings
+        self.safety = safety if safety is not None else EmergencyClassifier.load(settings.emergency_lexicon_path)
+        # Base de conocimiento curada: se responde localmente antes de consultar a Groq
+        self.faq = faq if faq is not None else FaqIndex.load(settings.chat_faq_path, settings.chat_faq_threshold)
+        self.faq_stats = {"hits": 0, "misses": 0}
+        # Respuestas del LLM reutilizables para preguntas equivalentes (None = deshabilitada)
+        if semantic_cache is None and settings.chat_semantic_cache_enabled:
+            semantic_cache = SemanticCache(
+                settings.chat_semantic_cache_capacity, settings.chat_semantic_cache_threshold,
+                settings.chat_semantic_cache_dim,
+            )
+        self.semantic_cache = semantic_cache
+        self.sessions = sessions if sessions is not None else ChatSessionStore()
+        self._compactions: set = set()
 
     async def chat(self, data: ChatInput) -> ChatOutput:
         """
         Procesa consultas utilizando el ecosistema híbrido EdiCarex.
         Prioriza Groq LPU, con fallback a redes neuronales locales y heurística.
+        La conversación continúa en la sesión del servidor indicada por `session_id`.
         """
         message = data.message.lower().strip()
+        session = await self._session(data)
         
         # 1. Filtro de Seguridad Senior (Prioridad Absoluta)
-        if any(word in message for word in ["emergencia", "urgente", "suicidio", "morir", "infarto"]):
+        result = self._check_security(message)
+
+        # 2. Preguntas frecuentes: respuesta curada local, sin ida y vuelta al LLM
+        if result is None:
+            result = self._answer_faq(message)
+
+        # 3. Caché semántica: respuesta previa del LLM a una pregunta equivalente
+        cacheable = self._semantic_cacheable(data, session)
+        if result is None and cacheable:
+            result = await self._cached_answer(data.message)
+
+        # 4. Cerebro Central: Groq LPU (Llama 3.3 70B)
+        # GroqService ya maneja sus propios reintentos y fallback interno a Mixtral/Llama 8B
+        if result is None:
+            result = await self.groq_service.generate_response(
+                data.message, data.context or "", session.summary, self._recent(session)
+            )
+            if result is not None and cacheable:
+                await self.semantic_cache.set(data.message, result.model_dump(include={"response", "confidence", "suggestions", "model"}))
+        
+        # 5. Fallback Estructural: Conocimiento Clínico Estático de EdiCarex
+        # Si Groq falla o devuelve el fallback de emergencia, usamos nuestras plantillas profesionales.
+        if result is None:
+            result = self._get_professional_local_response(message)
+
+        await self._remember(session, data.message, result.response)
+        result.session_id = session.session_id
+        return result
+
+    async def stream(self, data: ChatInput) -> AsyncIterator[dict]:
+        """
+        Variante en streaming del chat. El filtro de seguridad y las preguntas frecuentes se
+        evalúan antes de emitir cualquier token; si Groq no responde se emite la respuesta
+        local completa.
+        Registra el tiempo hasta el primer token (TTFT) y la duración total.
+        """
+        start = time.perf_counter()
+        message = data.message.lower().strip()
+        session = await self._session(data)
+
+        local = self._check_security(message) or self._answer_faq(message)
+        cacheable = self._semantic_cacheable(data, session)
+        if local is None and cacheable:
+            local = await self._cached_answer(data.message)
+        if local is None:
+            ttft_ms = None
+            parts: List[str] = []
+            try:
+                async for event in self.groq_service.stream_response(
+                    data.message, data.context or "", session.summary, self._recent(session)
+                ):
+                    if event["event"] == "token":
+                        parts.append(event["text"])
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - start) * 1000
+                    if event["event"] == "done":
+                        total_ms = (time.perf_counter() - start) * 1000
+                        event["timings"] = {"ttft_ms": round(ttft_ms or total_ms, 1), "total_ms": round(total_ms, 1)}
+                        event["session_id"] = session.session_id
+                        logger.info(f"Chat stream ({event['model']}): TTFT {event['timings']['ttft_ms']}ms, total {event['timings']['total_ms']}ms")
+                        await self._remember(session, data.message, "".join(parts))
+                        if cacheable:
+                            await self.semantic_cache.set(data.message, {
+                                "response": "".join(parts), "confidence": event["confidence"],
+                                "suggestions": event["suggestions"], "model": event["model"],
+                            })
+                    yield event
+            except Exception as e:
+                logger.error(f"Error en streaming del chat EdiCarex: {e}")
+                yield {"event": "error", "message": "Se interrumpió la respuesta del asistente."}
+                return
+            if ttft_ms is not None:
+                return
+            local = self._get_professional_local_response(message)
+
+        await self._remember(session, data.message, local.response)
+        total_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield {"event": "token", "text": local.response}
+        yield {
+            "event": "done",
+            "confidence": local.confidence,
+            "suggestions": local.suggestions,
+            "source": local.source,
+            "model": local.model,
+            "safety_match": local.safety_match,
+            "session_id": session.session_id,
+            "timings": {"ttft_ms": total_ms, "total_ms": total_ms}
+        }
+
+    async def _session(self, data: ChatInput) -> ChatSession:
+        """Sesión del servidor; una sesión nueva se siembra con el historial enviado por el cliente."""
+        session = await self.sessions.get(data.session_id) if data.session_id else None
+        if session is None:
+            session = ChatSession(data.session_id or uuid.uuid4().hex)
+            for item in data.history or []:
+                content = item.get("content") or item.get("message") or item.get("text")
+                if content:
+                    session.add("assistant" if item.get("role") in ("assistant", "bot", "ai") else "user", str(content))
+            self._schedule_compaction(session)
+        return session
+
+    def _recent(self, session: ChatSession) -> List[Dict[str, str]]:
+        """Últimos mensajes que viajan literales en el prompt (el resto va en el resumen)."""
+        keep = self.groq_service.settings.chat_recent_messages
+        return session.messages[-keep:] if keep else []
+
+    async def _remember(self, session: ChatSession, message: str, response: str):
+        session.add("user", message)
+        session.add("assistant", response)
+        self._schedule_compaction(session)
+        await self.sessions.save(session)
+
+    def _schedule_compaction(self, session: ChatSession):
+        """Compacta en segundo plano cuando el historial supera su presupuesto de tokens."""
+        settings = self.groq_service.settings
+        if session.compacting or len(session.messages) <= settings.chat_recent_messages:
+            return
+        if session.history_tokens() <= settings.chat_history_token_budget:
+            return
+        session.compacting = True
+        task = asyncio.create_task(self._compact(session))
+        self._compactions.add(task)
+        task.add_done_callback(self._compactions.discard)
+
+    async def _compact(self, session: ChatSession):
+        """
+        Integra los mensajes anteriores a los recientes en el resumen acumulado.
+        Si el LLM no responde, el resumen se actualiza recortando el texto para que el
+        prompt siga acotado.
+        """
+        settings = self.groq_service.settings
+        compacted = False
+        try:
+            count = len(session.messages) - settings.chat_recent_messages
+            older = session.messages[:count]
+            transcript = "\n".join(
+                f"{'Usuario' if m['role'] == 'user' else 'Asistente'}: {m['content']}" for m in older
+            )
+            builder = self.groq_service.prompt_builder("chat")
+            if session.summary:
+                builder.section("RESUMEN ACTUAL", session.summary)
+            builder.text("MENSAJES NUEVOS", transcript)
+            builder.section("TAREA", COMPACTION_TASK % (settings.chat_summary_max_tokens * 3 // 4))
+            result = await self.groq_service.execute_prompt(builder.build(), SUMMARY_PERSONA, endpoint="chat")
+            if result and not result.get("fallback") and result.get("summary"):
+                summary = str(result["summary"])
+            else:
+                summary = f"{session.summary}\n{transcript}".strip()
+            session.summary = truncate_text(summary, settings.chat_summary_max_tokens)
+            # Solo se retiran los mensajes resumidos; los añadidos mientras tanto se conservan
+            del session.messages[:count]
+            session.summarized += count
+            compacted = True
+            logger.info(f"Sesión de chat {session.session_id}: {count} mensajes compactados en el resumen.")
+        except Exception as e:
+            logger.error(f"No se pudo compactar la sesión de chat {session.session_id}: {e}")
+        finally:
+            session.compacting = False
+        await self.sessions.save(session)
+        if compacted:
+            # Los turnos llegados durante la compactación pueden volver a exceder el presupuesto
+            self._schedule_compaction(session)
+
+    async def reset_session(self, session_id: str) -> bool:
+        return await self.sessions.delete(session_id)
+
+    async def close(self):
+        for task in list(self._compactions):
+            task.cancel()
+        await asyncio.gather(*self._compactions, return_exceptions=True)
+
+    def _semantic_cacheable(self, data: ChatInput, session: ChatSession) -> bool:
+        """Solo preguntas autocontenidas: sin contexto adicional ni conversación previa."""
+        return self.semantic_cache is not None and not data.context and not session.messages and not session.summary
+
+    async def _cached_answer(self, message: str) -> Optional[ChatOutput]:
+        cached = await self.semantic_cache.get(message)
+        if cached is None:
+            return None
+        return ChatOutput(
+            response=cached["response"],
+            confidence=cached.get("confidence", 0.9),
+            suggestions=cached.get("suggestions", []),
+            source="semantic_cache",
+            model=cached.get("model")
+        )
+
+    def reload_faq(self, faq: FaqIndex):
+        """Sustituye el índice de preguntas frecuentes (recarga en caliente)."""
+        self.faq = faq
+
+    def _answer_faq(self, message: str) -> Optional[ChatOutput]:
+        entry = self.faq.match(message)
+        if entry is None:
+            self.faq_stats["misses"] += 1
+            return None
+        self.faq_stats["hits"] += 1
+        return ChatOutput(
+            response=entry["answer"],
+            confidence=entry.get("confidence", 0.95),
+            suggestions=entry.get("suggestions", []),
+            source="local_faq",
+            model=f"EdiCarex Knowledge Index v{self.faq.version}"
+        )
+
+    def _check_security(self, message: str) -> Optional[ChatOutput]:
+        """Filtro de seguridad: clasifica el mensaje contra el léxico de emergencias en una pasada."""
+        match = self.safety.classify(message)
+        if match:
+            logger.warning(f"Filtro de seguridad activado por '{match['term']}' ({match['category']}).")
             return ChatOutput(
                 response=(
                     "### 🚨 PROTOCOLO DE EMERGENCIA EDICAREX ACTIVADO\n\n"
@@ -49,24 +290,18 @@ class ChatService:
                 confidence=1.0,
                 suggestions=["Llamar a Emergencias", "Ver ubicación del Hospital", "Protocolo de Primeros Auxilios"],
                 source="security_filter",
-                model="EdiCarex Guardian"
+                model="EdiCarex Guardian",
+                safety_match=match
             )
-
-        # 2. Cerebro Central: Groq LPU (Llama 3.3 70B)
-        # GroqService ya maneja sus propios reintentos y fallback interno a Mixtral/Llama 8B
-        groq_response = await self.groq_service.generate_response(data.message)
-        if groq_response and "Local Fallback" not in groq_response.model:
-            return groq_response
-        
-        # 3. Fallback Estructural: Conocimiento Clínico Estático de EdiCarex
-        # Si Groq falla o devuelve el fallback de emergencia, usamos nuestras plantillas profesionales.
-        return self._get_professional_local_response(message)
+        return None
 
     def _get_professional_local_response(self, message: str) -> ChatOutput:
         """
         Genera una respuesta clara y amable basada en reglas de apoyo EdiCarex.
         """
-        if any(word in message for word in ["hola", "buenos dias", "quien eres"]):
+        FALLBACKS.inc("chat")
+        intent = LOCAL_INTENTS.search(message)
+        if intent == "saludo":
             return ChatOutput(
                 response=(
                     "¡Hola! Soy tu asistente de EdiCarex. 👋\n\n"
@@ -80,7 +315,7 @@ class ChatService:
                 model="EdiCarex Knowledge Core"
             )
 
-        if "fiebre" in message:
+        if intent == "fiebre":
             return ChatOutput(
                 response=(
                     "Entiendo que tienes fiebre. Aquí tienes algunas recomendaciones generales de EdiCarex mientras contactas a un médico:\n\n"
@@ -0,0 +1,154 @@
+"""
+Sesiones de chat de EdiCarex en el servidor.
+Cada sesión guarda un resumen acumulado de la conversación y los mensajes aún no
+resumidos; vive en un LRU en memoria con expiración y, opcionalmente, en SQLite.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.prompt_builder import estimate_tokens
+
+logger = logging.getLogger("EdiCarexAI.ChatSessions")
+
+
+class ChatSession:
+    """Estado de una conversación: resumen acumulado + mensajes recientes {role, content}."""
+
+    def __init__(self, session_id: str, summary: str = "", messages: Optional[List[Dict[str, str]]] = None,
+                 summarized: int = 0, updated_at: Optional[float] = None):
+        self.session_id = session_id
+        self.summary = summary
+        self.messages = messages or []
+        self.summarized = summarized  # mensajes ya incorporados al resumen
+        self.updated_at = updated_at or time.time()
+        self.compacting = False
+
+    def add(self, role: str, content: str):
+        self.messages.append({"role": role, "content": content})
+        self.updated_at = time.time()
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(m["content"]) for m in self.messages)
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary, "messages": self.messages, "summarized": self.summarized}
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict, updated_at: float) -> "ChatSession":
+        return cls(session_id, data.get("summary", ""), data.get("messages", []), data.get("summarized", 0), updated_at)
+
+
+class ChatSessionStore:
+    """
+    Almacén acotado de sesiones: LRU en memoria con TTL por inactividad y nivel
+    opcional en SQLite para conservar conversaciones entre reinicios y workers.
+    """
+
+    def __init__(self, max_sessions: int = 5000, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.path = path
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self.evictions = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                " session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expired(self, session: ChatSession, now: float) -> bool:
+        return session.updated_at + self.ttl < now
+
+    def _evict(self, now: float):
+        # El orden LRU coincide con la última actividad: los expirados están al inicio
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and not self._expired(session, now):
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            if not self._expired(session, now):
+                self._sessions.move_to_end(session_id)
+                return session
+            del self._sessions[session_id]
+        if self._conn is None:
+            return None
+        try:
+            session = await asyncio.to_thread(self._load, session_id, now)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo leer la sesión de chat {session_id}: {e}")
+            return None
+        if session is not None:
+            self._sessions[session_id] = session
+            self._evict(now)
+        return session
+
+    def _load(self, session_id: str, now: float) -> Optional[ChatSession]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] + self.ttl < now:
+                self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                return None
+        return ChatSession.from_dict(session_id, json.loads(row[0]), row[1])
+
+    async def save(self, session: ChatSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        self._evict(time.time())
+        if self._conn is None:
+            return
+        try:
+            await asyncio.to_thread(self._persist, session.session_id, json.dumps(session.to_dict(), ensure_ascii=False),
+                                    session.updated_at)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo persistir la sesión de chat {session.session_id}: {e}")
+
+    def _persist(self, session_id: str, data: str, updated_at: float):
+        with self._db_lock:
+            self._conn.execute("INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?)", (session_id, data, updated_at))
+            self._conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    async def delete(self, session_id: str) -> bool:
+        found = self._sessions.pop(session_id, None) is not None
+        if self._conn is not None:
+            def remove() -> int:
+                with self._db_lock:
+                    return self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount
+            found = bool(await asyncio.to_thread(remove)) or found
+        return found
+
+    def snapshot(self) -> dict:
+        return {
+            "sessions_memory": len(self._sessions), "max_sessions": self.max_sessions,
+            "ttl": self.ttl, "evictions": self.evictions, "disk_enabled": self._conn is not None,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
+            self._conn = None
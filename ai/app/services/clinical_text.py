@@ -0,0 +1,78 @@
+"""
+Segmentación de notas clínicas de EdiCarex: secciones, oraciones y fragmentos
+acotados por tokens que respetan esos límites.
+"""
+from typing import List, Optional, Tuple
+import re
+
+from app.utils.prompt_builder import CHARS_PER_TOKEN, estimate_tokens
+
+# Encabezados: "ANTECEDENTES:", "## Plan", "Examen físico:" al inicio de línea
+SECTION_HEADER = re.compile(
+    r"^\s*(?:#{1,6}\s*(?P<md>[^\n]+?)|(?P<title>[A-ZÁÉÍÓÚÑ][A-Za-zÁÉÍÓÚÑáéíóúñü0-9 /().-]{2,60}):)\s*$"
+    r"|^\s*(?P<inline>[A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ0-9 /().-]{2,60}):\s+",
+    re.MULTILINE,
+)
+# Abreviaturas cuyo punto no cierra la oración ("Dra. Ramos indica...")
+ABBREVIATIONS = ("Dr", "Dra", "Dres", "Sr", "Sra", "Srta", "Lic", "Enf", "Obst", "Ing", "Prof", "Tec",
+                 "Av", "Jr", "Nro", "Nº", "No", "Cap", "Fig", "Aprox", "Vs", "Etc", "Ej", "Cta", "Hab", "Serv")
+_NOT_ABBREVIATION = "".join(
+    rf"(?<!\b{re.escape(form)}\.)" for abbr in ABBREVIATIONS for form in {abbr, abbr.lower(), abbr.upper()}
+)
+# Fin de oración seguido de espacio y mayúscula/dígito/viñeta, o salto de línea
+SENTENCE_BOUNDARY = re.compile(rf"(?<=[.!?;]){_NOT_ABBREVIATION}\s+(?=[A-ZÁÉÍÓÚÑ0-9¿¡•\-])|\n+")
+
+
+def split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    """Lista de (encabezado, cuerpo); el texto previo al primer encabezado va sin título."""
+    sections = []
+    last_title, last_end = None, 0
+    for match in SECTION_HEADER.finditer(text):
+        body = text[last_end:match.start()].strip()
+        if body or last_title:
+            sections.append((last_title, body))
+        last_title = (match.group("md") or match.group("title") or match.group("inline")).strip()
+        last_end = match.end()
+    body = text[last_end:].strip()
+    if body or last_title:
+        sections.append((last_title, body))
+    return sections
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Agrupa oraciones en fragmentos de hasta `max_tokens`. Una sección nueva inicia
+    fragmento si el actual ya supera la mitad del presupuesto; las oraciones que no
+    caben solas se cortan por caracteres.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append("\n".join(current))
+        current, size = [], 0
+
+    for title, body in split_sections(text):
+        if title and size > max_tokens // 2:
+            flush()
+        pieces = ([f"{title}:"] if title else []) + split_sentences(body)
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if tokens > max_tokens:
+                flush()
+                step = max_tokens * CHARS_PER_TOKEN
+                chunks.extend(piece[i:i + step] for i in range(0, len(piece), step))
+                continue
+            if size + tokens > max_tokens:
+                flush()
+            current.append(piece)
+            size += tokens + 1
+    flush()
+    return chunks
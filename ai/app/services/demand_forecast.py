@@ -0,0 +1,193 @@
+"""
+Motor local de pronóstico de demanda farmacéutica de EdiCarex.
+Todos los métodos operan vectorizados sobre el catálogo completo como matriz 2-D
+(medicamentos x periodos), con NaN a la izquierda para historiales más cortos.
+"""
+from statistics import NormalDist
+from typing import Dict, List, Sequence
+import warnings
+import numpy as np
+
+# Parámetros de suavizado
+SES_ALPHAS = np.linspace(0.05, 0.95, 19)
+CROSTON_ALPHA = 0.1
+# Umbral de intervalo medio entre demandas (Syntetos-Boylan) para demanda intermitente
+INTERMITTENT_ADI = 1.32
+MAX_HISTORY = 730
+MIN_OBSERVATIONS = 3
+
+METHOD_SES = "suavizado_exponencial"
+METHOD_CROSTON = "croston_sba"
+METHOD_SEASONAL = "estacional_ingenuo"
+METHOD_NO_DATA = "datos_insuficientes"
+
+
+def build_matrix(histories: Sequence[Sequence[float]], max_history: int = MAX_HISTORY) -> np.ndarray:
+    """Apila historiales de distinta longitud alineados a la derecha (último periodo = última columna)."""
+    width = max([min(len(h), max_history) for h in histories] + [1])
+    Y = np.full((len(histories), width), np.nan)
+    for i, h in enumerate(histories):
+        if len(h):
+            tail = np.asarray(h[-max_history:], dtype=float)
+            Y[i, width - len(tail):] = tail
+    return np.clip(Y, 0, None)
+
+
+def simple_exponential_smoothing(Y: np.ndarray, alphas: np.ndarray = SES_ALPHAS):
+    """
+    SES con alfa óptimo por medicamento (mínimo error cuadrático a un paso, búsqueda en rejilla).
+    Retorna (nivel final, desviación del error a un paso, alfa elegido).
+    """
+    a = alphas[:, None]
+    n = Y.shape[0]
+    level = np.full((len(alphas), n), np.nan)
+    sse = np.zeros((len(alphas), n))
+    count = np.zeros(n)
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        valid = ~np.isnan(y)
+        started = ~np.isnan(level[0])
+        scored = valid & started
+        err = np.where(scored, y - level, 0.0)
+        sse += err ** 2
+        count += scored
+        level = np.where(valid, np.where(started, level + a * (y - level), y), level)
+
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(n)
+    sigma = np.sqrt(sse[best, cols] / np.maximum(count, 1))
+    return level[best, cols], sigma, alphas[best]
+
+
+def croston(Y: np.ndarray, alpha: float = CROSTON_ALPHA):
+    """
+    Croston con corrección SBA para demanda intermitente.
+    Retorna (tasa de demanda por periodo, desviación del error a un paso).
+    """
+    n = Y.shape[0]
+    size = np.full(n, np.nan)
+    interval = np.full(n, np.nan)
+    since = np.zeros(n)
+    sse = np.zeros(n)
+    count = np.zeros(n)
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        valid = ~np.isnan(y)
+        rate = (1 - alpha / 2) * size / interval
+        scored = valid & ~np.isnan(rate)
+        sse += np.where(scored, (y - np.nan_to_num(rate)) ** 2, 0.0)
+        count += scored
+
+        since = since + valid
+        demand = valid & (y > 0)
+        first = demand & np.isnan(size)
+        size = np.where(demand, np.where(first, y, size + alpha * (y - size)), size)
+        interval = np.where(demand, np.where(first, since, interval + alpha * (since - interval)), interval)
+        since = np.where(demand, 0, since)
+
+    rate = np.nan_to_num((1 - alpha / 2) * size / interval)
+    return rate, np.sqrt(sse / np.maximum(count, 1))
+
+
+def seasonal_naive(Y: np.ndarray, season_length: int, horizon: int):
+    """
+    Pronóstico estacional ingenuo: repite el último ciclo completo.
+    Retorna (demanda total en el horizonte, desviación del error estacional, disponible).
+    """
+    n, width = Y.shape
+    available = np.sum(~np.isnan(Y), axis=1) >= 2 * season_length
+    if width < 2 * season_length:
+        return np.zeros(n), np.full(n, np.inf), np.zeros(n, dtype=bool)
+
+    last_cycle = np.nan_to_num(Y[:, -season_length:])
+    full_cycles, remainder = divmod(horizon, season_length)
+    total = full_cycles * last_cycle.sum(axis=1) + last_cycle[:, :remainder].sum(axis=1)
+
+    diffs = Y[:, season_length:] - Y[:, :-season_length]
+    with warnings.catch_warnings():
+        # Filas sin pares estacionales completos: se marcan como no disponibles abajo
+        warnings.simplefilter("ignore", RuntimeWarning)
+        sigma = np.sqrt(np.nanmean(diffs ** 2, axis=1))
+    sigma = np.where(available, np.nan_to_num(sigma, nan=np.inf), np.inf)
+    return total, sigma, available
+
+
+def forecast_catalog(histories: Sequence[Sequence[float]], days_ahead: int, season_length: int = 7,
+                     interval_level: float = 0.9) -> Dict[str, np.ndarray]:
+    """
+    Pronostica la demanda acumulada de `days_ahead` periodos para todo el catálogo.
+    Selecciona por medicamento: Croston si la demanda es intermitente, estacional ingenuo
+    si su error histórico mejora al de SES, y SES en el resto de casos.
+    """
+    Y = build_matrix(histories)
+    n = Y.shape[0]
+    h = max(1, int(days_ahead))
+
+    observations = np.sum(~np.isnan(Y), axis=1)
+    nonzero = np.sum(np.nan_to_num(Y) > 0, axis=1)
+    adi = np.where(nonzero > 0, observations / np.maximum(nonzero, 1), np.inf)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(observations > 0, np.nansum(Y, axis=1) / np.maximum(observations, 1), 0.0)
+        sq = np.nansum((Y - mean[:, None]) ** 2, axis=1) / np.maximum(observations, 1)
+        cv = np.where(mean > 0, np.sqrt(sq) / np.where(mean > 0, mean, 1), 0.0)
+
+    ses_level, ses_sigma, _ = simple_exponential_smoothing(Y)
+    cro_rate, cro_sigma = croston(Y)
+    sn_total, sn_sigma, sn_available = seasonal_naive(Y, season_length, h)
+
+    intermittent = (adi > INTERMITTENT_ADI) & (observations >= MIN_OBSERVATIONS)
+    seasonal = ~intermittent & sn_available & (sn_sigma < 0.9 * ses_sigma)
+    no_data = observations < MIN_OBSERVATIONS
+
+    point = np.select(
+        [no_data, intermittent, seasonal],
+        [mean * h, cro_rate * h, sn_total],
+        np.nan_to_num(ses_level) * h,
+    )
+    sigma = np.select([no_data, intermittent, seasonal], [np.sqrt(sq), cro_sigma, sn_sigma], ses_sigma)
+    method = np.select(
+        [no_data, intermittent, seasonal],
+        [METHOD_NO_DATA, METHOD_CROSTON, METHOD_SEASONAL],
+        METHOD_SES,
+    ).astype(object)
+
+    z = NormalDist().inv_cdf(0.5 + interval_level / 2)
+    half_width = z * np.nan_to_num(sigma) * np.sqrt(h)
+    lower = np.clip(point - half_width, 0, None)
+    upper = point + half_width
+
+    # Confianza: ancho relativo del intervalo (más estrecho = más confiable)
+    relative = half_width / np.maximum(point, 1.0)
+    confidence = np.clip(0.95 - 0.5 * relative, 0.3, 0.95)
+    confidence = np.where(no_data, 0.3, confidence)
+
+    return {
+        "point": point,
+        "lower": lower,
+        "upper": upper,
+        "daily": point / h,
+        "method": method,
+        "confidence": confidence,
+        "cv": cv,
+        "intermittent": intermittent,
+        "no_data": no_data,
+        "observations": observations,
+    }
+
+
+def flag_items(forecast: Dict[str, np.ndarray], current_stock: List) -> List[List[str]]:
+    """Motivos por los que un medicamento requiere revisión (y narrativa LLM opcional)."""
+    flags = []
+    for i in range(len(forecast["point"])):
+        item = []
+        if forecast["no_data"][i]:
+            item.append("datos_insuficientes")
+        if forecast["intermittent"][i]:
+            item.append("demanda_intermitente")
+        if forecast["cv"][i] > 1.0:
+            item.append("alta_volatilidad")
+        stock = current_stock[i]
+        if stock is not None and stock < forecast["upper"][i]:
+            item.append("riesgo_desabastecimiento")
+        flags.append(item)
+    return flags
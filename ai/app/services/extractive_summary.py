@@ -0,0 +1,127 @@
+"""
+Pre-resumen extractivo local de EdiCarex.
+Reduce una nota clínica a un presupuesto de tokens antes del paso abstractivo (LLM):
+descarta firmas y texto administrativo, elimina oraciones casi duplicadas (tablas de
+signos vitales repetidas, secciones copiadas) y elige las oraciones con mayor puntaje
+TF-IDF ponderado por sección.
+"""
+from typing import Dict, List, Optional
+import re
+import unicodedata
+import numpy as np
+
+from app.services.clinical_text import split_sections, split_sentences
+from app.utils.prompt_builder import estimate_tokens
+
+# Similitud coseno a partir de la cual dos oraciones se consideran la misma
+DUPLICATE_THRESHOLD = 0.85
+
+# Peso por sección (se busca la palabra clave en el encabezado normalizado)
+SECTION_WEIGHTS: Dict[str, float] = {
+    "diagnostico": 1.6, "impresion": 1.5, "analisis": 1.4, "plan": 1.5, "tratamiento": 1.5,
+    "indicaciones": 1.4, "medicacion": 1.4, "medicamentos": 1.4, "evolucion": 1.2,
+    "enfermedad actual": 1.3, "motivo": 1.3, "antecedentes": 1.1, "alergias": 1.4,
+    "examen": 1.0, "laboratorio": 1.0, "signos vitales": 0.8, "datos administrativos": 0.3,
+}
+
+# Líneas completas de firma o pie de página (sobre texto normalizado): nunca recortan
+# oraciones clínicas que mencionan al médico ("Dr Salas solicita TAC...")
+BOILERPLATE = re.compile(
+    r"(?:firma(?: y sello)?|firmado|sello|atentamente|elaborado por|impreso(?: el| por)?|fecha de impresion)"
+    r"\s*(?:[:,_-].*)?"
+    r"|(?:cmp|c\.\s*m\.\s*p\.?|colegiatura|rne)\s*(?:n[o°º]?\s*\.?)?\s*:?\s*\d+.*"
+    r"|(?:pagina|hoja)\s+\d+(?:\s+de\s+\d+)?"
+    r"|[_\-=.\s]{3,}"
+)
+_NAME = r"(?:[A-ZÁÉÍÓÚÑ][a-záéíóúñü]*\.?|de|del|la|las|los|y)"
+# Firma del médico: "Dra. María del Carmen Ramos", "Médico tratante: Dr. Pérez - CMP 12345".
+# Solo nombres propios (mayúscula inicial) tras el título; sobre el texto original
+SIGNATURE = re.compile(
+    rf"(?:(?i:m[eé]dico\s+tratante)\s*:?\s*(?:(?i:dra?)\.?\s+)?|(?i:dra?)\.?\s+)"
+    rf"{_NAME}(?:\s+{_NAME}){{0,5}}"
+    r"(?:\s*[-–,|(]?\s*(?i:c\.?\s*m\.?\s*p|colegiatura|r\.?\s*n\.?\s*e)\.?\s*(?:n[o°º]?\s*\.?)?\s*:?\s*\d+\)?)?\s*"
+)
+
+
+def is_boilerplate(sentence: str) -> bool:
+    return BOILERPLATE.fullmatch(_normalize(sentence)) is not None or SIGNATURE.fullmatch(sentence.strip()) is not None
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).strip()
+
+
+def section_weight(title: Optional[str]) -> float:
+    if not title:
+        return 1.0
+    key = _normalize(title)
+    return max((w for name, w in SECTION_WEIGHTS.items() if name in key), default=1.0)
+
+
+def extract(text: str, target_tokens: int) -> dict:
+    """
+    Retorna el texto reducido a ~`target_tokens` (en orden original y con sus
+    encabezados) y contadores de la reducción.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer  # diferido: se precarga en el calentamiento
+
+    original_tokens = estimate_tokens(text)
+    units = []  # (sección, oración, peso)
+    boilerplate = 0
+    for title, body in split_sections(text):
+        weight = section_weight(title)
+        for sentence in split_sentences(body):
+            if is_boilerplate(sentence):
+                boilerplate += 1
+                continue
+            units.append((title, sentence, weight))
+
+    stats = {
+        "original_tokens": original_tokens, "sentences": len(units), "boilerplate_removed": boilerplate,
+        "duplicates_removed": 0,
+    }
+    if not units:
+        return {"text": text, "tokens": original_tokens, **stats}
+
+    sentences = [u[1] for u in units]
+    try:
+        matrix = TfidfVectorizer(strip_accents="unicode", sublinear_tf=True, ngram_range=(1, 2)).fit_transform(sentences)
+    except ValueError:
+        # Sin vocabulario útil (solo números o símbolos): se conserva el texto
+        return {"text": text, "tokens": original_tokens, **stats}
+
+    # Casi duplicados: se conserva la última aparición (la información más reciente)
+    similarity = (matrix @ matrix.T).tocoo()
+    duplicate = np.zeros(len(units), dtype=bool)
+    mask = (similarity.data >= DUPLICATE_THRESHOLD) & (similarity.row < similarity.col)
+    duplicate[similarity.row[mask]] = True
+    stats["duplicates_removed"] = int(duplicate.sum())
+
+    # Puntaje: similitud con el centroide del documento (representatividad) por el peso de sección
+    centroid = np.asarray(matrix[~duplicate].mean(axis=0)).ravel()
+    norm = np.linalg.norm(centroid) or 1.0
+    scores = np.asarray(matrix @ (centroid / norm)).ravel() * np.array([u[2] for u in units])
+    scores[duplicate] = -np.inf
+
+    tokens = np.array([estimate_tokens(s) + 1 for s in sentences])
+    selected = np.zeros(len(units), dtype=bool)
+    budget = target_tokens
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] == -np.inf:
+            break
+        if tokens[i] <= budget:
+            selected[i] = True
+            budget -= tokens[i]
+
+    lines: List[str] = []
+    last_title = None
+    for keep, (title, sentence, _) in zip(selected, units):
+        if not keep:
+            continue
+        if title and title != last_title:
+            lines.append(f"{title}:")
+            last_title = title
+        lines.append(sentence)
+    reduced = "\n".join(lines)
+    return {"text": reduced, "tokens": estimate_tokens(reduced), **stats}
@@ -0,0 +1,54 @@
+"""
+Índice local de preguntas frecuentes del chat de EdiCarex.
+Vectoriza con TF-IDF de n-gramas de caracteres (tolerante a tildes y errores de
+escritura) las preguntas de ejemplo de una base de conocimiento curada y versionada;
+las consultas rutinarias se responden por similitud coseno sin llamar al LLM.
+"""
+from typing import Optional
+import json
+import logging
+import numpy as np
+
+from app.utils.term_matcher import normalize
+
+logger = logging.getLogger("EdiCarexAI.FAQ")
+
+
+class FaqIndex:
+    """Índice inmutable; la recarga construye uno nuevo y lo sustituye de forma atómica."""
+
+    def __init__(self, knowledge: dict, threshold: float = 0.6):
+        from sklearn.feature_extraction.text import TfidfVectorizer  # diferido: se precarga en el calentamiento
+
+        self.version = knowledge.get("version")
+        self.threshold = threshold
+        self.entries = knowledge.get("entries", [])
+        questions, owners = [], []
+        for i, entry in enumerate(self.entries):
+            for question in entry.get("questions", []):
+                questions.append(normalize(question))
+                owners.append(i)
+        self._owners = np.array(owners, dtype=np.int32)
+        self._vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True)
+        self._matrix = self._vectorizer.fit_transform(questions) if questions else None
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.6) -> "FaqIndex":
+        with open(path, encoding="utf-8") as f:
+            index = cls(json.load(f), threshold)
+        logger.info(f"Base de conocimiento del chat v{index.version}: {len(index.entries)} entradas indexadas.")
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, message: str) -> Optional[dict]:
+        """Entrada más similar al mensaje (con su puntaje) si supera el umbral."""
+        if self._matrix is None:
+            return None
+        query = self._vectorizer.transform([normalize(message)])
+        scores = (self._matrix @ query.T).toarray().ravel()
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return {**self.entries[self._owners[best]], "score": round(float(scores[best]), 3)}
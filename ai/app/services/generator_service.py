@@ -1,75 +1,115 @@
 from app.models.schemas import TextGeneratorInput, TextGeneratorOutput
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from string import Formatter
 
-
-class GeneratorService:
-    """
-    Servicio de Generación de Documentación Clínica de EdiCarex.
-    Crea documentos médicos de alta fidelidad con la identidad corporativa.
-    """
-
-    def __init__(self):
-        self.templates = {
-            "prescription": self._prescription_template,
-            "referral": self._referral_template,
-            "discharge": self._discharge_template,
-        }
-
-    def generate(self, data: TextGeneratorInput) -> TextGeneratorOutput:
-        """Genera documentación profesional de EdiCarex."""
-        template_func = self.templates.get(data.template_type.lower())
-        if not template_func:
-            raise ValueError(f"Tipo de plantilla no soportado: {data.template_type}")
-        
-        return TextGeneratorOutput(
-            generated_text=template_func(data.patient_data, data.additional_notes),
-            template_type=data.template_type
-        )
-
-    def _prescription_template(self, patient_data: dict, notes: str) -> str:
-        """Plantilla de Receta Médica EdiCarex."""
-        return f"""
+# Plantillas de documentos EdiCarex. Campos: {fecha}, {nombre}, {edad} y {notas}
+PRESCRIPTION_TEMPLATE = """
 =========================================
       RECETA MÉDICA - EDICAREX AI
 =========================================
-Fecha: {datetime.now().strftime("%d/%m/%Y")}
-Paciente: {patient_data.get("name", "N/A")}
-Edad: {patient_data.get("age", "N/A")}
+Fecha: {fecha}
+Paciente: {nombre}
+Edad: {edad}
 
 INDICACIONES TERAPÉUTICAS:
-{notes if notes else "Siga las instrucciones del médico tratante."}
+{notas}
 
 Firma: ________________________
 Sistema de Gestión Hospitalaria EdiCarex
 """
 
-    def _referral_template(self, patient_data: dict, notes: str) -> str:
-        """Plantilla de Referencia Médica EdiCarex."""
-        return f"""
+REFERRAL_TEMPLATE = """
 =========================================
     ORDEN DE REFERENCIA - EDICAREX
 =========================================
-Fecha: {datetime.now().strftime("%d/%m/%Y")}
-Paciente: {patient_data.get("name", "N/A")}
+Fecha: {fecha}
+Paciente: {nombre}
 
 MOTIVO DE REFERENCIA:
-{notes if notes else "Evaluación por especialista."}
+{notas}
 
 Atentamente,
 Cuerpo Médico EdiCarex
 """
 
-    def _discharge_template(self, patient_data: dict, notes: str) -> str:
-        """Plantilla de Alta Médica EdiCarex."""
-        return f"""
+DISCHARGE_TEMPLATE = """
 =========================================
     RESUMEN DE ALTA - EDICAREX
 =========================================
-Paciente: {patient_data.get("name", "N/A")}
-Fecha de Alta: {datetime.now().strftime("%d/%m/%Y")}
+Paciente: {nombre}
+Fecha de Alta: {fecha}
 
 INSTRUCCIONES DE SEGUIMIENTO:
-{notes if notes else "Reposo absoluto y control en 7 días."}
+{notas}
 
 EdiCarex: Tecnología al servicio de la salud.
 """
+
+# Nombres en español aceptados como alias de los tipos de plantilla
+TEMPLATE_ALIASES = {"receta": "prescription", "referencia": "referral", "alta": "discharge"}
+
+
+def compile_template(text: str) -> List[Tuple[str, Optional[str]]]:
+    """Divide la plantilla una sola vez en (literal, campo) para renderizar sin volver a analizarla."""
+    return [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+
+
+class GeneratorService:
+    """
+    Servicio de Generación de Documentación Clínica de EdiCarex.
+    Crea documentos médicos de alta fidelidad con la identidad corporativa.
+    Las plantillas se compilan al crear el servicio (una vez por proceso).
+    """
+
+    def __init__(self):
+        # (partes compiladas, indicación por defecto si no hay notas)
+        self.templates = {
+            "prescription": (compile_template(PRESCRIPTION_TEMPLATE), "Siga las instrucciones del médico tratante."),
+            "referral": (compile_template(REFERRAL_TEMPLATE), "Evaluación por especialista."),
+            "discharge": (compile_template(DISCHARGE_TEMPLATE), "Reposo absoluto y control en 7 días."),
+        }
+
+    def resolve(self, template_type: str) -> str:
+        key = template_type.lower()
+        key = TEMPLATE_ALIASES.get(key, key)
+        if key not in self.templates:
+            raise ValueError(f"Tipo de plantilla no soportado: {template_type}")
+        return key
+
+    def render(self, template_type: str, patient_data: dict, notes: Optional[str], fecha: Optional[str] = None) -> str:
+        parts, default_notes = self.templates[self.resolve(template_type)]
+        values = {
+            "fecha": fecha or datetime.now().strftime("%d/%m/%Y"),
+            "nombre": patient_data.get("name", "N/A"),
+            "edad": patient_data.get("age", "N/A"),
+            "notas": notes if notes else default_notes,
+        }
+        return "".join(literal + (str(values[field]) if field else "") for literal, field in parts)
+
+    def generate(self, data: TextGeneratorInput) -> TextGeneratorOutput:
+        """Genera documentación profesional de EdiCarex."""
+        return TextGeneratorOutput(
+            generated_text=self.render(data.template_type, data.patient_data, data.additional_notes),
+            template_type=data.template_type
+        )
+
+    def generate_many(self, records: Iterable[Dict], default_type: Optional[str] = None,
+                      start: int = 0) -> Iterator[Dict]:
+        """
+        Renderiza un lote de registros {patient_data, additional_notes, template_type?}.
+        Produce un resultado por registro (o su error) sin detener el lote.
+        """
+        fecha = datetime.now().strftime("%d/%m/%Y")
+        for index, record in enumerate(records, start):
+            template_type = record.get("template_type") or default_type
+            try:
+                if not template_type:
+                    raise ValueError("Falta template_type")
+                patient_data = record.get("patient_data")
+                if not isinstance(patient_data, dict):
+                    raise ValueError("patient_data debe ser un objeto")
+                text = self.render(template_type, patient_data, record.get("additional_notes"), fecha)
+                yield {"index": index, "template_type": template_type, "generated_text": text}
+            except ValueError as e:
+                yield {"index": index, "template_type": template_type, "error": str(e)}
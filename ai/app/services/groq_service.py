@@ -1,37 +1,91 @@
-import os
-from groq import Groq
+from app.config import Settings
 from app.models.schemas import ChatOutput
-from typing import List, Optional
+from app.utils.response_cache import ResponseCache, make_cache_key
+from app.utils.singleflight import SingleFlight
+from app.utils.latency_tracker import LatencyTracker
+from app.utils.circuit_breaker import CircuitBreaker, is_breaker_failure
+from app.utils.rate_limiter import PriorityRateLimiter
+from app.utils.prompt_builder import PromptBuilder, estimate_tokens, system_prompt as build_system_prompt
+from app.utils.metrics import FALLBACKS, JSON_PARSE_FAILURES, LLM_RETRIES, UPSTREAM_LATENCY, record_usage
+from typing import TYPE_CHECKING, AsyncIterator, Callable, List, Optional, Tuple
+import copy
 import json
 import logging
-import httpx
 import asyncio
+import time
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger("EdiCarexAI.Groq")
 
+# Persona de EdiCarex: Profesional pero Humana y Empática
+BASE_SYSTEM_PERSONA = (
+    "Eres el asistente central de EdiCarex Enterprise. "
+    "Debes identificarte siempre como 'EdiCarex AI' y referirte a este centro médico como 'EdiCarex' o 'Clínica EdiCarex'. "
+    "Tu objetivo es ser un compañero experto, empático y profesional para el usuario (Edisson). "
+    "Aunque eres una IA médica de élite, mantén una conversación fluida y natural. "
+    "Evita ser excesivamente rígido o robótico. Responde con calidez pero manteniendo el rigor clínico cuando sea necesario. "
+    "Usa markdown para mejorar la legibilidad, pero no fuerces estructuras pesadas si la consulta es sencilla. "
+    "Tu prioridad es ayudar de manera directa y humana."
+)
+
+# Tokens de respuesta que se reservan en el limitador antes de conocer el consumo real
+COMPLETION_TOKEN_RESERVE = 512
+
+# Delimitador que separa el texto transmitido de los metadatos JSON finales del stream
+STREAM_META_DELIMITER = "<<<META>>>"
+
+CHAT_PERSONA = (
+    "Eres un asistente médico inteligente que habla como un experto cercano. "
+    "No seas redundante ni analices en exceso cada palabra del usuario. "
+    "Responde de forma directa, útil y amigable."
+)
+
+_CHAT_GUIDELINES = """
+- Responde de forma natural y profesional, con continuidad respecto a la conversación previa.
+- Si es una duda médica, mantén el rigor pero sé empático.
+- Usa markdown (listas, negritas) para que se lea bien.
+- Solo incluye una advertencia legal breve al final si es necesario.
+"""
+
+CHAT_TASK = _CHAT_GUIDELINES + """
+FORMATO JSON:
+{"response": "Tu respuesta directa aquí", "confidence": 0.XX, "suggestions": ["preg 1", "preg 2", "preg 3"]}
+"""
+
+CHAT_STREAM_TASK = _CHAT_GUIDELINES + f"""
+FORMATO:
+- Escribe directamente la respuesta en markdown (no uses JSON para la respuesta).
+- Al terminar, en una línea aparte escribe {STREAM_META_DELIMITER} seguido de este JSON:
+{{"confidence": 0.XX, "suggestions": ["preg 1", "preg 2", "preg 3"]}}
+"""
+
 class GroqService:
     """
-    Servicio profesional para el ecosistema EdiCarex utilizando Groq.
-    Garantiza inferencia ultra-rápida y alta disponibilidad.
+    Gateway LLM de EdiCarex sobre Groq (una instancia por proceso).
+    Es dueño del pool HTTP keep-alive, la lista de modelos y la configuración;
+    se crea en el lifespan de la aplicación y se inyecta en los servicios.
     """
     
-    def __init__(self):
-        self._initialize_service()
+    def __init__(self, settings: Optional[Settings] = None, http_client: Optional["httpx.AsyncClient"] = None):
+        settings = settings or Settings()
+        self._http_client = http_client
+        self.cache = ResponseCache(settings.cache_policies, settings.cache_sqlite_path)
+        self.singleflight = SingleFlight()
+        self.latency = LatencyTracker()
+        self.breakers: dict = {}
+        self.prompt_stats: dict = {}
+        self.limiter = PriorityRateLimiter(
+            settings.groq_requests_per_minute, settings.groq_tokens_per_minute, settings.priority_classes
+        )
+        self._initialize_service(settings)
 
-    def _initialize_service(self):
-        from dotenv import load_dotenv
-        load_dotenv(override=True)
-        
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            env_path = os.path.join(os.getcwd(), ".env")
-            if os.path.exists(env_path):
-                with open(env_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if line.startswith("GROQ_API_KEY="):
-                            self.api_key = line.split("=", 1)[1].strip()
-                            os.environ["GROQ_API_KEY"] = self.api_key
-                            break
+    def _initialize_service(self, settings: Settings):
+        self.settings = settings
+        self.api_key = settings.groq_api_key
+        self.models: List[str] = list(settings.groq_models)
+        self.model_name = self.models[0]
 
         if not self.api_key:
             logger.error("CRÍTICO: No se encontró la credencial de Groq para EdiCarex AI.")
@@ -39,68 +93,393 @@ class GroqService:
             return
 
         try:
-            self.client = Groq(api_key=self.api_key)
-            self.model_name = 'llama-3.3-70b-versatile'
+            # groq/httpx se importan aquí (fuera del import de la app) para acelerar el arranque
+            import httpx
+            from groq import AsyncGroq
+
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.http_max_connections,
+                        max_keepalive_connections=settings.http_max_keepalive_connections,
+                        keepalive_expiry=settings.http_keepalive_expiry,
+                    ),
+                    timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+                )
+            # Los reintentos los gestiona el gateway (backoff, breakers, hedging), no el SDK
+            self.client = AsyncGroq(api_key=self.api_key, http_client=self._http_client, max_retries=0)
             logger.info(f"Cerebro EdiCarex (Groq: {self.model_name}) sincronizado.")
         except Exception as e:
             logger.error(f"Error en sincronización Groq para EdiCarex: {e}")
             self.client = None
 
-    async def execute_prompt(self, prompt: str, system_persona: str = "", retries: int = 2) -> Optional[dict]:
+    def reload(self, settings: Settings):
+        """
+        Recarga explícita de configuración: credencial, modelos, cuota y prioridades del
+        limitador, políticas de caché y umbrales de los circuit breakers existentes.
+        Reutiliza el pool HTTP y la caché SQLite actuales; solo se invoca desde administración.
+        """
+        self._initialize_service(settings)
+        self.limiter.configure(
+            settings.groq_requests_per_minute, settings.groq_tokens_per_minute, settings.priority_classes
+        )
+        self.cache.configure(settings.cache_policies)
+        for breaker in self.breakers.values():
+            breaker.configure(**self._breaker_options())
+        logger.info(f"Configuración del gateway recargada. Modelos: {', '.join(self.models)}")
+
+    async def close(self):
+        """Libera el pool de conexiones HTTP hacia Groq."""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self.cache.close()
+
+    async def probe_model(self, model_name: str, timeout: float) -> None:
+        """
+        Sonda ligera de disponibilidad de un modelo (metadatos, sin consumir tokens).
+        Lanza excepción si el modelo no responde.
+        """
+        if not self.client:
+            raise RuntimeError("Cliente Groq no inicializado (sin credencial)")
+        await self.client.models.retrieve(model_name, timeout=timeout)
+
+    async def execute_prompt(self, prompt: str, system_persona: str = "", retries: int = 2,
+                             endpoint: Optional[str] = None, temperature: float = 0.6,
+                             use_cache: bool = True) -> Optional[dict]:
         """
         Ejecución robusta con Groq, reintentos exponenciales y rotación de modelos.
         Garantiza que EdiCarex nunca falle silenciosamente.
+        `endpoint` selecciona la política de caché; `use_cache=False` la omite para esta llamada.
         """
         if not self.client:
             return self._get_emergency_fallback(prompt)
 
-        # Persona de EdiCarex: Profesional pero Humana y Empática
-        base_system = (
-            "Eres el asistente central de EdiCarex Enterprise. "
-            "Debes identificarte siempre como 'EdiCarex AI' y referirte a este centro médico como 'EdiCarex' o 'Clínica EdiCarex'. "
-            "Tu objetivo es ser un compañero experto, empático y profesional para el usuario (Edisson). "
-            "Aunque eres una IA médica de élite, mantén una conversación fluida y natural. "
-            "Evita ser excesivamente rígido o robótico. Responde con calidez pero manteniendo el rigor clínico cuando sea necesario. "
-            "Usa markdown para mejorar la legibilidad, pero no fuerces estructuras pesadas si la consulta es sencilla. "
-            "Tu prioridad es ayudar de manera directa y humana."
-        )
-        full_system_prompt = f"{base_system} Contexto específico: {system_persona}"
-        
-        available_models = [self.model_name, 'llama-3.1-8b-instant', 'mixtral-8x7b-32768']
-        
-        for model_name in available_models:
-            for attempt in range(retries + 1):
-                try:
-                    if attempt > 0:
-                        wait_time = 2 ** attempt
-                        logger.info(f"Reintentando en {model_name} (intento {attempt+1}) tras {wait_time}s...")
-                        await asyncio.sleep(wait_time)
-
-                    completion = self.client.chat.completions.create(
-                        model=model_name,
-                        messages=[
-                            {"role": "system", "content": full_system_prompt},
-                            {"role": "user", "content": prompt}
-                        ],
-                        response_format={"type": "json_object"},
-                        temperature=0.6, # Mayor temperatura para naturalidad (dentro de lo seguro)
-                        max_tokens=2048
-                    )
-                    
-                    res_text = completion.choices[0].message.content
-                    if not res_text:
+        full_system_prompt = self._system_prompt(system_persona)
+
+        cacheable = use_cache and self.cache.enabled(endpoint)
+        request_key = make_cache_key("|".join(self.models), full_system_prompt, prompt, temperature)
+        if cacheable:
+            cached = await self.cache.get(endpoint, request_key)
+            if cached is not None:
+                return cached
+
+        async def upstream() -> Optional[dict]:
+            deadline = self.settings.endpoint_deadlines.get(endpoint, self.settings.default_deadline)
+            result = await self._call_models(full_system_prompt, prompt, retries, temperature, deadline, endpoint)
+            # Solo se cachean respuestas válidas del LLM (nunca respaldos ni JSON fallidos)
+            if result is not None and cacheable and "error" not in result:
+                await self.cache.set(endpoint, request_key, result)
+            return result
+
+        # Peticiones idénticas concurrentes comparten una sola llamada upstream
+        result = await self.singleflight.do(request_key, upstream)
+        if result is None:
+            return self._get_emergency_fallback(prompt)
+        return copy.deepcopy(result)
+
+    def _system_prompt(self, system_persona: str) -> str:
+        return build_system_prompt(BASE_SYSTEM_PERSONA, system_persona)
+
+    def prompt_builder(self, endpoint: str) -> PromptBuilder:
+        """Constructor de prompts con el presupuesto de tokens configurado para el endpoint."""
+        budgets = self.settings.prompt_token_budgets
+        return PromptBuilder(endpoint, budgets.get(endpoint, budgets.get("default", 4000)), self.prompt_stats)
+
+    async def stream_prompt(self, prompt: str, system_persona: str = "", temperature: float = 0.6,
+                            max_tokens: int = 2048) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Ejecución en streaming: produce tuplas (modelo, fragmento) a medida que Groq genera tokens.
+        Rota de modelo solo si falla antes del primer token; sin cliente no produce nada.
+        La espera hasta el primer token (cola de cuota incluida) está acotada por el plazo del
+        endpoint de chat; el consumo real informado al final del stream ajusta la cuota.
+        """
+        if not self.client:
+            return
+
+        messages = [
+            {"role": "system", "content": self._system_prompt(system_persona)},
+            {"role": "user", "content": prompt}
+        ]
+        estimated_tokens = self._estimate_tokens(messages[0]["content"], prompt)
+        loop = asyncio.get_running_loop()
+        deadline = self.settings.endpoint_deadlines.get("chat", self.settings.default_deadline)
+        first_token_by = loop.time() + deadline
+        for model_name in self.models:
+            breaker = self.breaker(model_name)
+            if not breaker.available():
+                continue
+            try:
+                await asyncio.wait_for(self._acquire_quota("chat", estimated_tokens), first_token_by - loop.time())
+            except asyncio.TimeoutError:
+                logger.warning(f"Plazo de {deadline}s agotado en la cola de cuota antes del primer token.")
+                return
+            if not breaker.allow():
+                self._refund_quota(estimated_tokens)
+                continue
+            started = False
+            usage = None
+            start = time.perf_counter()
+            try:
+                stream = await asyncio.wait_for(self.client.chat.completions.create(
+                    model=model_name,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                ), first_token_by - loop.time())
+                async with stream:
+                    chunks = stream.__aiter__()
+                    while True:
+                        try:
+                            if started:
+                                chunk = await chunks.__anext__()
+                            else:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), first_token_by - loop.time())
+                        except StopAsyncIteration:
+                            break
+                        # Groq informa el consumo en el último fragmento (x_groq.usage)
+                        usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            started = True
+                            yield model_name, delta
+                breaker.record_success()
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start, model_name, "ok")
+                if started:
+                    return
+            except asyncio.TimeoutError:
+                if started:
+                    raise
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start, model_name, "error")
+                breaker.release()
+                logger.warning(f"Plazo de {deadline}s agotado esperando el primer token de {model_name}.")
+                return
+            except BaseException as e:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start, model_name, "error")
+                if isinstance(e, Exception) and is_breaker_failure(e):
+                    breaker.record_failure(str(e))
+                else:
+                    breaker.release()
+                if started or not isinstance(e, Exception):
+                    # No es posible cambiar de modelo a mitad de una respuesta ya emitida
+                    raise
+                logger.warning(f"Falla de streaming en {model_name}: {str(e)[:100]}")
+            finally:
+                record_usage(model_name, usage)
+                self._settle_quota(estimated_tokens, usage)
+
+    async def _call_models(self, system_prompt: str, prompt: str, retries: int, temperature: float,
+                           deadline: float, endpoint: Optional[str] = None) -> Optional[dict]:
+        """
+        Ejecuta la cadena de modelos con hedging bajo un plazo total (`deadline`, segundos).
+        Retorna None si todos fallan o se agota el plazo.
+        """
+        try:
+            return await asyncio.wait_for(
+                self._hedged_call(system_prompt, prompt, retries, temperature, endpoint), timeout=deadline
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Plazo de {deadline}s agotado en la cadena de modelos EdiCarex.")
+            return None
+
+    def _hedge_delay(self, model_name: str) -> float:
+        observed = self.latency.percentile(model_name, self.settings.hedge_percentile)
+        if observed is None:
+            return self.settings.hedge_default_delay
+        return max(self.settings.hedge_min_delay, observed)
+
+    async def _hedged_call(self, system_prompt: str, prompt: str, retries: int, temperature: float,
+                           endpoint: Optional[str] = None) -> Optional[dict]:
+        """
+        Recorre la lista de modelos. Si el modelo en curso supera su percentil de latencia,
+        lanza una petición de respaldo con el siguiente modelo y toma el primer resultado
+        válido; las peticiones perdedoras se cancelan.
+        """
+        pending_models = list(self.models)
+        running: dict = {}
+        last_launch = 0.0
+        invalid_result = None
+        loop = asyncio.get_running_loop()
+        dispatch = asyncio.Event()
+
+        def dispatched():
+            nonlocal last_launch
+            last_launch = loop.time()
+            dispatch.set()
+
+        def launch() -> bool:
+            """
+            Lanza el siguiente modelo disponible; los de circuito abierto se omiten al instante.
+            El temporizador de hedging arranca cuando la petición sale de la cola de cuota.
+            """
+            nonlocal last_launch
+            while pending_models:
+                model_name = pending_models.pop(0)
+                if not self.breaker(model_name).available():
+                    logger.info(f"Circuito abierto para {model_name}; se omite.")
+                    continue
+                task = asyncio.create_task(
+                    self._try_model(model_name, system_prompt, prompt, retries, temperature, endpoint, dispatched)
+                )
+                running[task] = model_name
+                last_launch = float("inf")
+                dispatch.clear()
+                return True
+            return False
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                waiters = set(running)
+                dispatch_waiter = None
+                if self.settings.hedge_enabled and pending_models:
+                    if last_launch == float("inf"):
+                        # Aún en la cola de cuota: se espera a que salga para arrancar el temporizador
+                        dispatch_waiter = asyncio.ensure_future(dispatch.wait())
+                        waiters.add(dispatch_waiter)
+                    else:
+                        newest = list(running.values())[-1]
+                        timeout = max(0.0, last_launch + self._hedge_delay(newest) - loop.time())
+
+                done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if dispatch_waiter is not None:
+                    dispatch_waiter.cancel()
+                    done.discard(dispatch_waiter)
+                    if not done:
                         continue
+                if not done:
+                    logger.info(f"Hedging: {list(running.values())[-1]} supera su latencia esperada, lanzando respaldo.")
+                    if not launch():
+                        last_launch = float("inf")  # Sin modelos disponibles: solo esperar a los activos
+                    continue
 
-                    return self._parse_json_safely(res_text)
+                for task in done:
+                    running.pop(task)
+                    result = task.result()
+                    if result is None:
+                        continue
+                    if "error" not in result:
+                        return result
+                    invalid_result = invalid_result or result
 
-                except Exception as e:
-                    logger.warning(f"Falla en {model_name} (intento {attempt+1}): {str(e)[:100]}")
-                    if attempt == retries:
-                        continue # Probar siguiente modelo
-        
-        return self._get_emergency_fallback(prompt)
+                # Un modelo agotó sus intentos: se pasa al siguiente de inmediato
+                if not running and pending_models:
+                    launch()
+            return invalid_result
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _try_model(self, model_name: str, system_prompt: str, prompt: str, retries: int,
+                         temperature: float, endpoint: Optional[str] = None,
+                         on_dispatch: Optional[Callable[[], None]] = None) -> Optional[dict]:
+        """
+        Intentos con backoff exponencial sobre un único modelo; None si se agotan.
+        `on_dispatch` se invoca cuando el primer intento obtiene cupo en la cola de cuota.
+        """
+        breaker = self.breaker(model_name)
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                wait_time = 2 ** attempt
+                LLM_RETRIES.inc(model_name)
+                logger.info(f"Reintentando en {model_name} (intento {attempt+1}) tras {wait_time}s...")
+                await asyncio.sleep(wait_time)
+
+            # La espera en cola de cuota se mide aparte de la latencia del modelo
+            estimated_tokens = self._estimate_tokens(system_prompt, prompt)
+            await self._acquire_quota(endpoint, estimated_tokens)
+            if attempt == 0 and on_dispatch is not None:
+                on_dispatch()
+
+            if not breaker.allow():
+                self._refund_quota(estimated_tokens)
+                logger.info(f"Circuito abierto para {model_name}; se abandonan los reintentos.")
+                return None
+
+            try:
+                start = time.perf_counter()
+                completion = await self.client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=temperature, # Mayor temperatura para naturalidad (dentro de lo seguro)
+                    max_tokens=2048
+                )
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start, model_name, "error")
+                if is_breaker_failure(e):
+                    breaker.record_failure(str(e))
+                else:
+                    breaker.release()
+                logger.warning(f"Falla en {model_name} (intento {attempt+1}): {str(e)[:100]}")
+                if not breaker.available():
+                    # El circuito se abrió: no tiene sentido esperar el backoff
+                    return None
+                continue
+
+            elapsed = time.perf_counter() - start
+            breaker.record_success()
+            self.latency.record(model_name, elapsed)
+            UPSTREAM_LATENCY.observe(elapsed, model_name, "ok")
+            usage = getattr(completion, "usage", None)
+            record_usage(model_name, usage)
+            self._settle_quota(estimated_tokens, usage)
+
+            res_text = completion.choices[0].message.content
+            if not res_text:
+                continue
+
+            return self._parse_json_safely(res_text, model_name)
+
+        return None
+
+    @staticmethod
+    def _estimate_tokens(system_prompt: str, prompt: str) -> int:
+        """Estimación conservadora (~4 caracteres por token) más la reserva de respuesta."""
+        return estimate_tokens(system_prompt) + estimate_tokens(prompt) + COMPLETION_TOKEN_RESERVE
+
+    async def _acquire_quota(self, endpoint: Optional[str], estimated_tokens: int) -> float:
+        if not self.settings.rate_limit_enabled:
+            return 0.0
+        return await self.limiter.acquire(endpoint, estimated_tokens)
+
+    def _refund_quota(self, estimated_tokens: int):
+        """Devuelve el cupo reservado cuando el circuit breaker rechaza la llamada."""
+        if self.settings.rate_limit_enabled:
+            self.limiter.refund(estimated_tokens)
+
+    def _settle_quota(self, estimated_tokens: int, usage):
+        """Ajusta el bucket de tokens con el consumo real (`usage` de Groq), si se conoce."""
+        if self.settings.rate_limit_enabled and usage is not None and usage.total_tokens:
+            self.limiter.adjust(usage.total_tokens - estimated_tokens)
+
+    def breaker(self, model_name: str) -> CircuitBreaker:
+        """Circuit breaker del modelo (creado bajo demanda con la configuración vigente)."""
+        breaker = self.breakers.get(model_name)
+        if breaker is None:
+            breaker = self.breakers[model_name] = CircuitBreaker(model_name, **self._breaker_options())
+        return breaker
 
-    def _parse_json_safely(self, text: str) -> dict:
+    def _breaker_options(self) -> dict:
+        return {
+            "failure_threshold": self.settings.breaker_failure_threshold,
+            "error_rate_threshold": self.settings.breaker_error_rate_threshold,
+            "window": self.settings.breaker_window,
+            "min_requests": self.settings.breaker_min_requests,
+            "cooldown": self.settings.breaker_cooldown,
+        }
+
+    def breaker_snapshot(self) -> dict:
+        return {model: self.breaker(model).snapshot() for model in self.models}
+
+    def _parse_json_safely(self, text: str, model_name: str = "unknown") -> dict:
         try:
             return json.loads(text)
         except json.JSONDecodeError:
@@ -111,6 +490,7 @@ class GroqService:
                     return json.loads(match.group())
                 except:
                     pass
+        JSON_PARSE_FAILURES.inc(model_name)
         return {"error": "JSON_PARSE_FAILED", "raw": text}
 
     def _get_emergency_fallback(self, prompt: str) -> dict:
@@ -118,6 +498,7 @@ class GroqService:
         Sistema de respaldo local de EdiCarex ante caída total de APIs externas.
         """
         logger.error("MODO CRÍTICO: Activando protocolo de respaldo local EdiCarex AI.")
+        FALLBACKS.inc("groq")
         return {
             "response": (
                 "### 🏥 Nota de EdiCarex AI\n\n"
@@ -127,39 +508,40 @@ class GroqService:
             ),
             "confidence": 0.5,
             "suggestions": ["Reintentar pronto", "Ver ayuda local"],
-            "model": "Respaldo EdiCarex"
+            "model": "Respaldo EdiCarex",
+            "fallback": True
         }
 
-    async def generate_response(self, message: str) -> Optional[ChatOutput]:
-        """
-        Genera una respuesta médica balanceada entre profesionalismo y calidez.
+    def _chat_prompt(self, message: str, task: str, context: str = "", summary: str = "",
+                     history: Optional[List[dict]] = None) -> str:
         """
-        system_persona = (
-            "Eres un asistente médico inteligente que habla como un experto cercano. "
-            "No seas redundante ni analices en exceso cada palabra del usuario. "
-            "Responde de forma directa, útil y amigable."
-        )
-        
-        prompt = f"""
-        El usuario dice: "{message}"
-        
-        TAREA:
-        - Responde de forma natural y profesional.
-        - Si es una duda médica, mantén el rigor pero sé empático.
-        - Usa markdown (listas, negritas) para que se lea bien.
-        - Solo incluye una advertencia legal breve al final si es necesario.
-        
-        FORMATO JSON:
-        {{
-            "response": "Tu respuesta directa aquí",
-            "confidence": 0.XX,
-            "suggestions": ["preg 1", "preg 2", "preg 3"]
-        }}
+        Prompt de chat de tamaño acotado: resumen acumulado de la sesión, contexto y los
+        mensajes recientes (ya limitados por la sesión) antes del mensaje actual.
         """
+        builder = self.prompt_builder("chat")
+        if summary:
+            builder.text("RESUMEN DE LA CONVERSACIÓN", summary)
+        if context:
+            builder.text("CONTEXTO ADICIONAL", context)
+        if history:
+            builder.text("MENSAJES RECIENTES", "\n".join(
+                f"{'Usuario' if m.get('role') == 'user' else 'Asistente'}: {m.get('content', '')}" for m in history
+            ))
+        builder.section(None, f'El usuario dice: "{message}"')
+        builder.section("TAREA", task)
+        return builder.build()
 
-        result = await self.execute_prompt(prompt, system_persona)
+    async def generate_response(self, message: str, context: str = "", summary: str = "",
+                                history: Optional[List[dict]] = None) -> Optional[ChatOutput]:
+        """
+        Genera una respuesta médica balanceada entre profesionalismo y calidez.
+        `summary` e `history` dan continuidad a la conversación de la sesión.
+        """
+        prompt = self._chat_prompt(message, CHAT_TASK, context, summary, history)
+        result = await self.execute_prompt(prompt, CHAT_PERSONA, endpoint="chat")
         
-        if result:
+        # El respaldo de emergencia y el JSON ilegible no son respuestas: el chat usa sus plantillas locales
+        if result and not result.get("fallback") and "error" not in result:
             return ChatOutput(
                 response=result.get("response", "Lo siento, tuve un problema interno. ¿Me repites eso?"),
                 confidence=result.get("confidence", 0.95),
@@ -168,3 +550,49 @@ class GroqService:
                 model=result.get("model", self.model_name)
             )
         return None
+
+    async def stream_response(self, message: str, context: str = "", summary: str = "",
+                              history: Optional[List[dict]] = None) -> AsyncIterator[dict]:
+        """
+        Variante en streaming de generate_response.
+        Emite eventos {"event": "token", "text": ...} y un evento final "done" con
+        confianza, sugerencias y modelo. Si ningún modelo responde no emite nada.
+        """
+        prompt = self._chat_prompt(message, CHAT_STREAM_TASK, context, summary, history)
+
+        model_used = None
+        pending = ""
+        meta_raw = None
+        holdback = len(STREAM_META_DELIMITER) - 1
+
+        async for model_name, delta in self.stream_prompt(prompt, CHAT_PERSONA):
+            model_used = model_name
+            if meta_raw is not None:
+                meta_raw += delta
+                continue
+
+            pending += delta
+            idx = pending.find(STREAM_META_DELIMITER)
+            if idx >= 0:
+                text, meta_raw = pending[:idx], pending[idx + len(STREAM_META_DELIMITER):]
+                pending = ""
+            else:
+                # Retiene un posible prefijo parcial del delimitador
+                cut = len(pending) - holdback
+                text, pending = (pending[:cut], pending[cut:]) if cut > 0 else ("", pending)
+            if text:
+                yield {"event": "token", "text": text}
+
+        if model_used is None:
+            return
+        if pending:
+            yield {"event": "token", "text": pending}
+
+        meta = self._parse_json_safely(meta_raw, model_used) if meta_raw else {}
+        yield {
+            "event": "done",
+            "confidence": meta.get("confidence", 0.95),
+            "suggestions": meta.get("suggestions", []),
+            "source": "groq",
+            "model": model_used
+        }
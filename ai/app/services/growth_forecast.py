@@ -0,0 +1,202 @@
+"""
+Motor local de proyección financiera de EdiCarex.
+Holt-Winters aditivo, tendencia lineal con estacionalidad y tendencia lineal simple
+sobre el histórico mensual; el modelo se elige por backtesting en los últimos meses.
+"""
+from datetime import date
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+import itertools
+import numpy as np
+
+SEASON_LENGTH = 12
+# Rejilla de parámetros de Holt-Winters (alfa, beta, gamma), evaluada vectorizada
+HW_GRID = np.array(list(itertools.product((0.1, 0.3, 0.5, 0.8), (0.01, 0.1, 0.3), (0.05, 0.2, 0.5))))
+MAX_BACKTEST = 6
+
+METHOD_HOLT_WINTERS = "holt_winters"
+METHOD_SEASONAL_LINEAR = "tendencia_lineal_estacional"
+METHOD_LINEAR = "tendencia_lineal"
+METHOD_NAIVE = "ingenuo"
+
+MONTHS_ES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+             "septiembre", "octubre", "noviembre", "diciembre"]
+MONTHS_EN = ["january", "february", "march", "april", "may", "june", "july", "august",
+             "september", "october", "november", "december"]
+LABEL_FIELDS = ("month", "period", "date", "label", "name")
+
+
+def extract_series(history: list, metric: Optional[str] = None) -> Tuple[List[str], np.ndarray, Optional[str]]:
+    """Etiquetas y valores de la métrica (por defecto `revenue` o la primera numérica)."""
+    rows = [r for r in history if isinstance(r, dict)]
+    if not rows:
+        return [], np.array([]), None
+    if metric is None:
+        numeric = [k for k, v in rows[0].items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        metric = "revenue" if "revenue" in rows[0] else (numeric[0] if numeric else None)
+    if metric is None:
+        return [], np.array([]), None
+    label_key = next((k for k in LABEL_FIELDS if k in rows[0]), None)
+    pairs = [(str(r.get(label_key, i + 1)) if label_key else str(i + 1), r.get(metric)) for i, r in enumerate(rows)]
+    pairs = [(label, float(v)) for label, v in pairs if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return [p[0] for p in pairs], np.array([p[1] for p in pairs], dtype=float), metric
+
+
+def future_labels(last_label: Optional[str], n_history: int, horizon: int) -> List[str]:
+    """Continúa etiquetas AAAA-MM, fechas ISO o nombres de mes; si no, 'Mes N'."""
+    if last_label:
+        text = last_label.strip()
+        try:
+            last = date.fromisoformat(text[:7] + "-01")
+            labels = []
+            year, month = last.year, last.month
+            for _ in range(horizon):
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                labels.append(f"{year:04d}-{month:02d}")
+            return labels
+        except ValueError:
+            pass
+        lowered = text.lower()
+        for names in (MONTHS_ES, MONTHS_EN):
+            matches = [i for i, name in enumerate(names) if lowered.startswith(name[:3])]
+            if matches:
+                start = matches[0]
+                capitalize = text[:1].isupper()
+                return [
+                    names[(start + k) % 12].capitalize() if capitalize else names[(start + k) % 12]
+                    for k in range(1, horizon + 1)
+                ]
+    return [f"Mes {n_history + k}" for k in range(1, horizon + 1)]
+
+
+def holt_winters(y: np.ndarray, horizon: int, m: int = SEASON_LENGTH) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Holt-Winters aditivo con parámetros elegidos por mínimo error cuadrático a un paso
+    (toda la rejilla en paralelo). Retorna (pronóstico, desviación por horizonte).
+    """
+    alpha, beta, gamma = HW_GRID[:, 0], HW_GRID[:, 1], HW_GRID[:, 2]
+    g, n = len(HW_GRID), len(y)
+    level = np.full(g, y[:m].mean())
+    trend = np.full(g, (y[m:2 * m].mean() - y[:m].mean()) / m)
+    season = np.zeros((g, n))
+    season[:, :m] = y[:m] - y[:m].mean()
+    sse = np.zeros(g)
+    for t in range(m, n):
+        s_prev = season[:, t - m]
+        err = y[t] - (level + trend + s_prev)
+        sse += err ** 2
+        new_level = alpha * (y[t] - s_prev) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+        season[:, t] = gamma * (y[t] - level) + (1 - gamma) * s_prev
+
+    best = int(np.argmin(sse))
+    steps = np.arange(1, horizon + 1)
+    last_season = season[best, n - m:]
+    forecast = level[best] + steps * trend[best] + last_season[(steps - 1) % m]
+    sigma = np.sqrt(sse[best] / max(n - m, 1))
+    # Varianza aproximada del error a h pasos de Holt-Winters aditivo
+    a, b = alpha[best], beta[best]
+    growth = 1 + np.concatenate([[0.0], np.cumsum((a * (1 + (steps[:-1]) * b)) ** 2)])
+    return forecast, sigma * np.sqrt(growth)
+
+
+def linear_trend(y: np.ndarray, horizon: int, m: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Regresión por mínimos cuadrados sobre la tendencia (y dummies de mes si `m`).
+    Retorna (pronóstico, desviación de predicción por horizonte).
+    """
+    n = len(y)
+
+    def design(t: np.ndarray) -> np.ndarray:
+        cols = [np.ones_like(t, dtype=float), t.astype(float)]
+        if m:
+            cols += [((t % m) == k).astype(float) for k in range(1, m)]
+        return np.column_stack(cols)
+
+    X = design(np.arange(n))
+    coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+    dof = max(n - X.shape[1], 1)
+    sigma2 = float(np.sum((y - X @ coef) ** 2) / dof)
+    X_future = design(np.arange(n, n + horizon))
+    leverage = np.einsum("ij,jk,ik->i", X_future, np.linalg.pinv(X.T @ X), X_future)
+    return X_future @ coef, np.sqrt(sigma2 * (1 + leverage))
+
+
+def naive(y: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+    diffs = np.diff(y)
+    sigma = float(np.sqrt(np.mean(diffs ** 2))) if len(diffs) else abs(float(y[-1])) * 0.1
+    return np.full(horizon, y[-1]), sigma * np.sqrt(np.arange(1, horizon + 1))
+
+
+def _candidates(n: int, m: int) -> Dict[str, callable]:
+    models = {METHOD_NAIVE: lambda y, h: naive(y, h)}
+    if n >= 3:
+        models[METHOD_LINEAR] = lambda y, h: linear_trend(y, h)
+    if n >= m + 4:
+        models[METHOD_SEASONAL_LINEAR] = lambda y, h: linear_trend(y, h, m)
+    if n >= 2 * m + 2:
+        models[METHOD_HOLT_WINTERS] = lambda y, h: holt_winters(y, h, m)
+    return models
+
+
+def _mape(actual: np.ndarray, predicted: np.ndarray) -> float:
+    scale = np.where(np.abs(actual) > 0, np.abs(actual), max(np.mean(np.abs(actual)), 1.0))
+    return float(np.mean(np.abs(actual - predicted) / scale))
+
+
+def forecast_growth(labels: Sequence[str], y: np.ndarray, horizon: int = 6, season_length: int = SEASON_LENGTH,
+                    interval_level: float = 0.9) -> Optional[dict]:
+    """
+    Proyecta `horizon` meses con el modelo de menor error en un backtest sobre los
+    últimos meses (entrenado sin ellos). Retorna None si hay menos de dos observaciones.
+    """
+    n = len(y)
+    if n < 2:
+        return None
+    holdout = max(1, min(MAX_BACKTEST, n // 4))
+    train = y[:-holdout]
+
+    scores = {}
+    for name, model in _candidates(len(train), season_length).items():
+        if len(train) < 2:
+            break
+        predicted, _ = model(train, holdout)
+        scores[name] = _mape(y[-holdout:], predicted)
+    method = min(scores, key=scores.get) if scores else METHOD_NAIVE
+    mape = scores.get(method)
+
+    # Se proyecta al menos un año para medir el crecimiento interanual aunque horizon < 12
+    forecast, sigma = _candidates(n, season_length)[method](y, max(horizon, SEASON_LENGTH))
+    # Crecimiento interanual: los últimos `window` meses observados frente a los mismos
+    # meses del año siguiente (ventanas de 12 meses si hay al menos un año de histórico)
+    window = min(SEASON_LENGTH, n)
+    recent = y[-window:]
+    year_ahead = forecast[SEASON_LENGTH - window:SEASON_LENGTH]
+    annual_growth = (year_ahead.sum() / recent.sum() - 1) * 100 if recent.sum() else 0.0
+    forecast, sigma = forecast[:horizon], sigma[:horizon]
+    z = NormalDist().inv_cdf(0.5 + interval_level / 2)
+    lower, upper = forecast - z * sigma, forecast + z * sigma
+    relative = (upper - lower) / (2 * np.maximum(np.abs(forecast), 1.0))
+    confidence = np.clip(1 - relative, 0.05, 0.99)
+
+    return {
+        "method": method,
+        "predictions": [
+            {"month": label, "predicted": round(float(p), 2), "lower": round(float(lo), 2),
+             "upper": round(float(hi), 2), "confidence": round(float(c), 3)}
+            for label, p, lo, hi, c in zip(future_labels(labels[-1] if labels else None, n, horizon),
+                                           forecast, lower, upper, confidence)
+        ],
+        "projected_annual_growth": round(float(annual_growth), 2),
+        "accuracy_score": round(float(np.clip(1 - mape, 0, 1)), 3) if mape is not None else 0.0,
+        "backtest": {
+            "holdout_months": holdout,
+            "mape": round(mape, 4) if mape is not None else None,
+            "candidates": {k: round(v, 4) for k, v in scores.items()},
+        },
+        "stats": {
+            "n": n, "mean": round(float(y.mean()), 2), "std": round(float(y.std()), 2),
+            "last": round(float(y[-1]), 2),
+        },
+    }
@@ -0,0 +1,85 @@
+from app.services.groq_service import GroqService
+from typing import Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("EdiCarexAI.Health")
+
+
+class HealthMonitor:
+    """
+    Monitor de conectividad de EdiCarex.
+    Sondea cada modelo configurado en segundo plano y guarda latencia y último error,
+    de modo que /health responde desde memoria sin tocar Groq.
+    """
+
+    def __init__(self, groq: GroqService, interval: float = 30.0, timeout: float = 5.0):
+        self.groq = groq
+        self.interval = interval
+        self.timeout = timeout
+        self.models: Dict[str, dict] = {}
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="edicarex-health-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.warning(f"Error en ciclo de monitoreo EdiCarex: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self):
+        """Sondea todos los modelos de forma concurrente."""
+        models = list(self.groq.models)
+        await asyncio.gather(*(self._check_model(m) for m in models))
+        # Descarta modelos retirados tras una recarga de configuración
+        for stale in set(self.models) - set(models):
+            self.models.pop(stale, None)
+        self.last_run = time.time()
+
+    async def _check_model(self, model_name: str):
+        state = self.models.setdefault(model_name, {
+            "healthy": False, "latency_ms": None, "last_error": None, "last_checked": None, "last_ok": None,
+        })
+        start = time.perf_counter()
+        try:
+            await self.groq.probe_model(model_name, timeout=self.timeout)
+            state["healthy"] = True
+            state["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            state["last_error"] = None
+            state["last_ok"] = time.time()
+        except Exception as e:
+            if state["healthy"]:
+                logger.warning(f"Modelo {model_name} no disponible: {str(e)[:100]}")
+            state["healthy"] = False
+            state["latency_ms"] = None
+            state["last_error"] = str(e)[:200]
+        state["last_checked"] = time.time()
+
+    @property
+    def ready(self) -> bool:
+        """Listo si al menos un modelo respondió en la última ronda."""
+        return any(m["healthy"] for m in self.models.values())
+
+    def snapshot(self) -> dict:
+        return {
+            "checked": self.last_run is not None,
+            "last_run": self.last_run,
+            "interval_s": self.interval,
+            "models": self.models,
+        }
@@ -1,31 +1,59 @@
-from app.models.schemas import PharmacyDemandInput, PharmacyDemandOutput
+from typing import List, Optional
+from app.models.schemas import (
+    PharmacyDemandInput, PharmacyDemandOutput, PharmacyBatchInput, PharmacyBatchOutput, PharmacyForecast,
+    ConsumptionIngestInput, ConsumptionIngestOutput, PharmacyStateForecastInput
+)
 from app.services.groq_service import GroqService
-import json
+from app.services.demand_forecast import forecast_catalog, flag_items
+from app.services.demand_state import DemandStateStore
+from app.utils.metrics import FALLBACKS
+import asyncio
 import numpy as np
 import logging
+import time
 
 logger = logging.getLogger("EdiCarexAI.Pharmacy")
 
+# Narrativas LLM simultáneas por lote
+NARRATIVE_CONCURRENCY = 4
+
+PHARMACY_PERSONA = (
+    "Eres el Jefe de Logística y Farmacia de EdiCarex Enterprise. "
+    "Experto en gestión de inventarios hospitalarios y previsión de demanda crítica. "
+    "Tu objetivo es el desperdicio cero y la disponibilidad total."
+)
+
+NARRATIVE_PERSONA = (
+    "Eres el Jefe de Logística y Farmacia de EdiCarex Enterprise. "
+    "Redactas recomendaciones de reabastecimiento breves y accionables."
+)
+
+DEMAND_TASK = """
+TAREA LOGÍSTICA:
+1. Proyecta la cantidad exacta para los próximos %d días.
+2. Determina el nivel de confianza basado en la estabilidad de la serie temporal.
+3. Genera una recomendación ejecutiva de stock (ej. Just-in-Time, Stock de Seguridad, Rotación).
+
+FORMATO JSON REQUERIDO:
+{"predicted_demand": int, "confidence": float, "recommendation": "Plan de acción logístico detallado en español para el farmacéutico jefe."}
+"""
+
 class PharmacyService:
     """
     Servicio de Predicción de Demanda Farmacéutica de EdiCarex.
     Optimiza el stock hospitalario mediante análisis de series temporales con IA.
     """
-    def __init__(self):
-        self.groq = GroqService()
+    def __init__(self, groq: GroqService, demand_state: Optional[DemandStateStore] = None):
+        self.groq = groq
+        self.demand_state = demand_state if demand_state is not None else DemandStateStore()
 
     async def predict_demand(self, data: PharmacyDemandInput) -> PharmacyDemandOutput:
         """
         Predice la demanda de medicamentos utilizando el motor de EdiCarex.
         """
-        system_persona = (
-            "Eres el Jefe de Logística y Farmacia de EdiCarex Enterprise. "
-            "Experto en gestión de inventarios hospitalarios y previsión de demanda crítica. "
-            "Tu objetivo es el desperdicio cero y la disponibilidad total."
-        )
-        
         # Análisis estadístico local con Numpy (Hybrid Intelligence)
         stats_summary = "Motor estadístico local: Sin datos suficientes para análisis de varianza."
+        local_demand = None
         if data.historical_data:
             try:
                 arr = np.array(data.historical_data)
@@ -33,44 +61,173 @@ class PharmacyService:
                 volatility = np.std(arr) / mean_vol if mean_vol > 0 else 0
                 max_val = np.max(arr)
                 stats_summary = f"Volumen promedio: {mean_vol:.2f} uni, Coeficiente de Variación: {volatility:.2f}, Pico Histórico: {max_val} uni."
+                fc = forecast_catalog([data.historical_data], data.days_ahead or 30)
+                local_demand = int(round(fc["point"][0]))
+                stats_summary += (
+                    f" Pronóstico local a {data.days_ahead} días ({fc['method'][0]}): {local_demand} uni"
+                    f" [{fc['lower'][0]:.0f} - {fc['upper'][0]:.0f}]."
+                )
             except Exception as e:
                 logger.warning(f"Error en procesamiento estadístico Numpy: {e}")
+        elif data.medication_id in self.demand_state.index:
+            # Sin historial en la petición: se usa el estado incremental ingerido
+            fc = self.demand_state.forecast([data.medication_id], data.days_ahead or 30)
+            local_demand = int(round(fc["point"][0]))
+            stats_summary = (
+                f"Estado incremental ({int(fc['observations'][0])} días ingeridos). "
+                f"Pronóstico local a {data.days_ahead} días ({fc['method'][0]}): {local_demand} uni"
+                f" [{fc['lower'][0]:.0f} - {fc['upper'][0]:.0f}]."
+            )
 
-        prompt = f"""
-        REQUERIMIENTO DE PREVISIÓN DE INVENTARIO (EdiCarex Pharma Core)
-        
-        IDENTIFICADOR DE MEDICAMENTO: {data.medication_id}
-        DATOS BRUTOS DE CONSUMO (Histórico): {data.historical_data}
-        ANÁLISIS ESTADÍSTICO DE SOPORTE (Numpy): {stats_summary}
-        
-        TAREA LOGÍSTICA:
-        1. Proyecta la cantidad exacta para el siguiente ciclo de reabastecimiento.
-        2. Determina el nivel de confianza basado en la estabilidad de la serie temporal.
-        3. Genera una recomendación ejecutiva de stock (ej. Just-in-Time, Stock de Seguridad, Rotación).
-        
-        FORMATO JSON REQUERIDO:
-        {{
-            "predicted_demand": int,
-            "confidence": float,
-            "recommendation": "Plan de acción logístico detallado en español para el farmacéutico jefe."
-        }}
-        """
+        prompt = (
+            self.groq.prompt_builder("pharmacy")
+            .section("REQUERIMIENTO DE PREVISIÓN DE INVENTARIO (EdiCarex Pharma Core)",
+                     f"IDENTIFICADOR DE MEDICAMENTO: {data.medication_id}")
+            .series("CONSUMO HISTÓRICO", data.historical_data or [])
+            .section("ANÁLISIS ESTADÍSTICO DE SOPORTE (Numpy)", stats_summary)
+            .section(None, DEMAND_TASK % (data.days_ahead or 30))
+            .build()
+        )
 
         try:
-            result = await self.groq.execute_prompt(prompt, system_persona)
-            if result:
+            result = await self.groq.execute_prompt(prompt, PHARMACY_PERSONA, endpoint="pharmacy")
+            # Un respaldo del gateway o un JSON fallido no debe sustituir al pronóstico local
+            if result and not result.get("fallback") and "error" not in result:
                 return PharmacyDemandOutput(
                     medication_id=data.medication_id,
-                    predicted_demand=result.get("predicted_demand", int(np.mean(data.historical_data)) if data.historical_data else 100),
+                    predicted_demand=result.get("predicted_demand", local_demand if local_demand is not None else 100),
                     confidence=result.get("confidence", 0.85),
                     recommendation=result.get("recommendation", "Análisis completado por EdiCarex AI.")
                 )
-            return self._fallback_pharmacy(data.medication_id)
+            return self._fallback_pharmacy(data.medication_id, local_demand)
         except Exception as e:
             logger.error(f"Error en farmacia EdiCarex: {e}")
-            return self._fallback_pharmacy(data.medication_id)
+            return self._fallback_pharmacy(data.medication_id, local_demand)
+
+    async def predict_demand_batch(self, data: PharmacyBatchInput) -> PharmacyBatchOutput:
+        """
+        Pronostica todo el catálogo con el motor local vectorizado.
+        El LLM solo interviene (opcionalmente) para redactar la recomendación de los señalados.
+        """
+        start = time.perf_counter()
+        histories = [item.historical_data for item in data.items]
+        stocks = [item.current_stock for item in data.items]
+        # El cálculo es CPU puro sobre el catálogo completo: fuera del event loop
+        fc = await asyncio.to_thread(
+            forecast_catalog, histories, data.days_ahead, data.season_length, data.interval_level
+        )
+        return await self._batch_output(
+            [item.medication_id for item in data.items], stocks, fc, data.days_ahead, data.interval_level,
+            data.include_narratives, data.max_narratives, start,
+        )
+
+    async def ingest_consumption(self, data: ConsumptionIngestInput) -> ConsumptionIngestOutput:
+        """Añade consumos diarios al estado incremental de cada medicamento."""
+        result = await self.demand_state.ingest(
+            [(r.medication_id, r.date, r.quantity) for r in data.records]
+        )
+        return ConsumptionIngestOutput(**result, tracked=len(self.demand_state))
+
+    async def forecast_from_state(self, data: PharmacyStateForecastInput) -> PharmacyBatchOutput:
+        """
+        Pronóstico O(1) por medicamento a partir del estado ingerido, sin historial en la petición.
+        """
+        start = time.perf_counter()
+        fc = self.demand_state.forecast(data.medication_ids, data.days_ahead, data.interval_level)
+        stocks = [data.current_stock.get(m) for m in data.medication_ids]
+        return await self._batch_output(
+            data.medication_ids, stocks, fc, data.days_ahead, data.interval_level,
+            data.include_narratives, data.max_narratives, start,
+        )
+
+    async def _batch_output(self, medication_ids: List[str], stocks: List[Optional[int]], fc: dict,
+                            days_ahead: int, interval_level: float, include_narratives: bool,
+                            max_narratives: int, start: float) -> PharmacyBatchOutput:
+        flags = flag_items(fc, stocks)
+
+        forecasts = []
+        for i, medication_id in enumerate(medication_ids):
+            forecasts.append(PharmacyForecast(
+                medication_id=medication_id,
+                predicted_demand=int(round(fc["point"][i])),
+                lower_bound=int(np.floor(fc["lower"][i])),
+                upper_bound=int(np.ceil(fc["upper"][i])),
+                daily_demand=round(float(fc["daily"][i]), 3),
+                method=fc["method"][i],
+                confidence=round(float(fc["confidence"][i]), 3),
+                flags=flags[i],
+                recommendation=self._local_recommendation(
+                    fc["point"][i], fc["upper"][i], stocks[i], flags[i], days_ahead
+                ),
+            ))
+
+        narratives = 0
+        flagged = [f for f in forecasts if f.flags]
+        if include_narratives and max_narratives and flagged:
+            narratives = await self._add_narratives(flagged[:max_narratives], days_ahead)
+
+        return PharmacyBatchOutput(
+            days_ahead=days_ahead,
+            interval_level=interval_level,
+            forecasts=forecasts,
+            flagged=len(flagged),
+            narratives_generated=narratives,
+            processing_ms=round((time.perf_counter() - start) * 1000, 1),
+        )
+
+    def _local_recommendation(self, point: float, upper: float, stock: Optional[int], flags: List[str],
+                              days_ahead: int) -> str:
+        if "datos_insuficientes" in flags:
+            return "Historial insuficiente: mantener stock actual y revisar manualmente."
+        if stock is None:
+            return f"Asegurar {int(np.ceil(upper))} uni para cubrir {days_ahead} días con el nivel de servicio solicitado."
+        if stock < upper:
+            reorder = int(np.ceil(upper - stock))
+            urgency = "Reposición urgente" if stock < point else "Reponer"
+            return f"{urgency}: pedir {reorder} uni (stock {stock}, demanda máxima esperada {int(np.ceil(upper))})."
+        return f"Stock suficiente para {days_ahead} días (stock {stock}, demanda máxima esperada {int(np.ceil(upper))})."
+
+    async def _add_narratives(self, forecasts: List[PharmacyForecast], days_ahead: int) -> int:
+        """Sustituye la recomendación local por una narrativa LLM; retorna cuántas se generaron."""
+        semaphore = asyncio.Semaphore(NARRATIVE_CONCURRENCY)
+
+        async def narrate(f: PharmacyForecast) -> bool:
+            prompt = (
+                self.groq.prompt_builder("pharmacy")
+                .data("PRONÓSTICO LOCAL", {
+                    "medicamento": f.medication_id, "dias": days_ahead, "metodo": f.method,
+                    "demanda": f.predicted_demand, "intervalo": [f.lower_bound, f.upper_bound],
+                    "alertas": f.flags,
+                })
+                .section("RECOMENDACIÓN BASE", f.recommendation)
+                .section(None, 'Responde en JSON: {"recommendation": "plan de acción en español, máximo 2 frases"}')
+                .build()
+            )
+            async with semaphore:
+                try:
+                    result = await self.groq.execute_prompt(prompt, NARRATIVE_PERSONA, endpoint="pharmacy")
+                except Exception as e:
+                    logger.warning(f"Narrativa de farmacia no disponible para {f.medication_id}: {e}")
+                    return False
+            if result and not result.get("fallback") and result.get("recommendation"):
+                f.recommendation = result["recommendation"]
+                f.narrative_source = "groq"
+                return True
+            return False
+
+        results = await asyncio.gather(*(narrate(f) for f in forecasts))
+        return sum(results)
 
-    def _fallback_pharmacy(self, med_id: str) -> PharmacyDemandOutput:
+    def _fallback_pharmacy(self, med_id: str, local_demand: Optional[int] = None) -> PharmacyDemandOutput:
+        """Respaldo sin LLM: conserva el pronóstico del motor local si lo hay."""
+        FALLBACKS.inc("pharmacy")
+        if local_demand is not None:
+            return PharmacyDemandOutput(
+                medication_id=med_id,
+                predicted_demand=local_demand,
+                confidence=0.7,
+                recommendation="Modo backup EdiCarex: demanda según el pronóstico estadístico local; se sugiere revisión manual del inventario."
+            )
         return PharmacyDemandOutput(
             medication_id=med_id,
             predicted_demand=100,
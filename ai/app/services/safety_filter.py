@@ -0,0 +1,78 @@
+"""
+Filtro de seguridad del chat de EdiCarex.
+Clasifica mensajes contra un léxico versionado de términos de emergencia (multilingüe,
+con variantes ortográficas) compilado una vez en el arranque, y descarta los términos
+negados ("no tengo dolor de pecho") salvo en categorías donde la negación no aplica.
+Una negación solo cuenta si rige al término: entre ambas solo caben palabras de enlace
+del léxico, de modo que "no aguanto el dolor de pecho" sigue siendo una emergencia.
+"""
+from typing import List, Optional
+import json
+import logging
+
+from app.utils.term_matcher import TermMatcher, normalize
+
+logger = logging.getLogger("EdiCarexAI.Safety")
+
+
+class EmergencyClassifier:
+    """Clasificador de emergencias de una sola pasada sobre el mensaje normalizado."""
+
+    def __init__(self, lexicon: dict):
+        self.version = lexicon.get("version")
+        entries = {}
+        for category, spec in lexicon.get("categories", {}).items():
+            for term in spec.get("terms", []):
+                entries.setdefault(term, {
+                    "term": term,
+                    "category": category,
+                    "severity": spec.get("severity", 1),
+                    "negatable": spec.get("negatable", True),
+                })
+        self.matcher = TermMatcher(entries)
+        negation = lexicon.get("negation", {})
+        self.negation_window = negation.get("window", 4)
+        self.negations = TermMatcher({cue: True for cue in negation.get("cues", [])})
+        self.negation_bridges = frozenset(normalize(word) for word in negation.get("bridges", []))
+
+    @classmethod
+    def load(cls, path: str) -> "EmergencyClassifier":
+        with open(path, encoding="utf-8") as f:
+            classifier = cls(json.load(f))
+        logger.info(f"Léxico de emergencias v{classifier.version} compilado: {len(classifier.matcher)} términos.")
+        return classifier
+
+    def _negated(self, normalized: str, start: int) -> bool:
+        """
+        Hay una negación entre las `negation_window` palabras previas de la misma cláusula
+        y entre ella y el término solo hay palabras de enlace ("no tengo", "sin", "niega un").
+        """
+        clause = normalized[:start].rsplit(" . ", 1)[-1]
+        window = " ".join(clause.split()[-self.negation_window:])
+        return any(
+            all(word in self.negation_bridges for word in window[end:].split())
+            for _, _, _, end in self.negations.finditer(window)
+        )
+
+    def scan(self, message: str) -> List[dict]:
+        """Todos los términos encontrados, marcando los negados."""
+        normalized = normalize(message)
+        matches = []
+        for _, entry, start, _ in self.matcher.finditer(normalized):
+            negated = entry["negatable"] and self._negated(normalized, start)
+            matches.append({
+                "term": entry["term"], "category": entry["category"], "severity": entry["severity"],
+                "negated": negated,
+            })
+        return matches
+
+    def classify(self, message: str) -> Optional[dict]:
+        """Término no negado de mayor severidad (el primero en el mensaje ante empate) o None."""
+        matches = [m for m in self.scan(message) if not m["negated"]]
+        if not matches:
+            return None
+        best = max(matches, key=lambda m: m["severity"])
+        return {
+            "term": best["term"], "category": best["category"], "severity": best["severity"],
+            "lexicon_version": self.version,
+        }
@@ -0,0 +1,51 @@
+from typing import Optional
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger("EdiCarexAI.Severity")
+
+
+class SeverityModel:
+    """
+    Modelo local de severidad clínica de EdiCarex (regresión logística entrenada offline).
+    Se carga una vez en el arranque desde el artefacto versionado (memory-mapped) y
+    puntúa lotes completos con una única operación vectorizada.
+    """
+
+    def __init__(self, params: np.ndarray, meta: dict):
+        self.meta = meta
+        self.version = meta["version"]
+        self.features = meta["features"]
+        self.centers = np.asarray(meta["centers"], dtype=np.float64)
+        self.defaults = np.asarray(meta["defaults"], dtype=np.float64)
+
+        # Se pliega el escalador en los coeficientes: z·w + b == x·w' + b'
+        mean, scale, coef = params[0], params[1], params[2]
+        self.weights = np.ascontiguousarray(coef / scale)
+        self.intercept = float(meta["intercept"] - np.dot(mean, self.weights))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SeverityModel"]:
+        """Carga `<ruta>.npy` + `<ruta>.json`; retorna None si el artefacto no existe."""
+        base = path[:-4] if path.endswith(".npy") else path
+        if not os.path.exists(base + ".npy") or not os.path.exists(base + ".json"):
+            logger.warning(f"Artefacto de severidad no encontrado en {base}.npy; se usará severidad neutra.")
+            return None
+        params = np.load(base + ".npy", mmap_mode="r")
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        model = cls(params, meta)
+        logger.info(f"Modelo de severidad v{model.version} cargado (AUC ref. {meta.get('metrics', {}).get('auc')}).")
+        return model
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilidad de alta severidad para cada fila de X (n, len(features)).
+        Los valores NaN se imputan con el valor normal de referencia.
+        """
+        X = np.where(np.isnan(X), self.defaults, X)
+        phi = np.hstack([X, (X - self.centers) ** 2])
+        logits = phi @ self.weights + self.intercept
+        return 1.0 / (1.0 + np.exp(-logits))
@@ -1,16 +1,77 @@
 from app.models.schemas import SummarizationInput, SummarizationOutput
 from app.services.groq_service import GroqService
+from app.services.clinical_text import chunk_text
+from app.services.extractive_summary import extract
+from app.utils.prompt_builder import CHARS_PER_TOKEN, estimate_tokens
+from app.utils.metrics import FALLBACKS
+from typing import List, Optional, Tuple
 import re
 import asyncio
+import logging
+import time
+import unicodedata
+
+logger = logging.getLogger("EdiCarexAI.Summarization")
+
+DOCUMENTATION_PERSONA = (
+    "Eres un Especialista en Documentación Médica de EdiCarex. "
+    "Tu tarea es destilar notas clínicas densas en resúmenes profesionales, "
+    "priorizando diagnósticos, planes de tratamiento y medicamentos."
+)
+
+SUMMARY_TASK = """
+REQUISITOS ESTRÍCTOS:
+1. Estructura: S: Subjetivo, O: Objetivo, A: Análisis, P: Plan.
+2. Tono: Académico-Clínico.
+3. Longitud máxima: %s caracteres.
+
+FORMATO JSON REQUERIDO:
+{"summary": "Texto del resumen estructurado con markdown", "clinical_entities": ["entidad 1", "entidad 2"]}
+"""
+
+MAP_TASK = """
+Es el fragmento %d de %d de un expediente clínico extenso.
+Extrae en viñetas breves los hallazgos relevantes (síntomas, signos, resultados, diagnósticos, tratamientos, medicamentos con dosis).
+No inventes datos ni completes información de otros fragmentos.
+
+FORMATO JSON REQUERIDO:
+{"summary": "viñetas con los hallazgos del fragmento", "clinical_entities": ["entidad 1", "entidad 2"]}
+"""
+
+REDUCE_TASK = """
+Los puntos anteriores resumen, en orden, los fragmentos de un mismo expediente clínico.
+Intégralos en un único resumen sin repetir información.
+""" + SUMMARY_TASK
+
+
+def normalize_entity(entity: str) -> str:
+    """Clave de comparación sin acentos, mayúsculas ni espacios extra."""
+    decomposed = unicodedata.normalize("NFKD", entity)
+    return re.sub(r"\s+", " ", "".join(c for c in decomposed if not unicodedata.combining(c))).strip().lower()
+
+
+def merge_entities(*groups: List[str]) -> List[str]:
+    """Une listas de entidades conservando la primera forma escrita de cada una."""
+    seen = {}
+    for group in groups:
+        for entity in group or []:
+            if isinstance(entity, str) and entity.strip():
+                seen.setdefault(normalize_entity(entity), entity.strip())
+    return list(seen.values())
 
 
 class SummarizationService:
     """
     Clinical text summarization service using Groq.
+    Las notas largas se resumen por fragmentos en paralelo (map) y se integran en SOAP
+    (reduce); cada fragmento pasa antes por un pre-resumen extractivo local. Una nota de un
+    solo paso solo se recorta si supera el presupuesto extractivo.
     """
 
-    def __init__(self):
-        self.groq = GroqService()
+    def __init__(self, groq: GroqService):
+        self.groq = groq
+        # Milisegundos de LLM por token de entrada observados (media exponencial)
+        self.ms_per_token = groq.settings.summarization_ms_per_token
 
     async def summarize(self, data: SummarizationInput) -> SummarizationOutput:
         """
@@ -18,41 +79,136 @@ class SummarizationService:
         """
         text = data.text
         max_length = data.max_length
+        settings = self.groq.settings
+        chunk_tokens = settings.summarization_chunk_tokens
+        original_tokens = estimate_tokens(text)
+
+        mode = data.mode
+        if mode == "extractive":
+            target = data.target_tokens or max(64, (max_length or 200) // CHARS_PER_TOKEN)
+            summary = await self._reduce(text, target)
+            summary_tokens = estimate_tokens(summary)
+            return SummarizationOutput(
+                summary=summary,
+                original_length=len(text),
+                summary_length=len(summary),
+                mode=mode,
+                chunks=0,
+                compression_ratio=round(summary_tokens / max(original_tokens, 1), 3),
+                llm_time_saved_ms=round(original_tokens * self.ms_per_token, 1),
+            )
 
-        system_persona = (
-            "Eres un Especialista en Documentación Médica de EdiCarex. "
-            "Tu tarea es destilar notas clínicas densas en resúmenes profesionales, "
-            "priorizando diagnósticos, planes de tratamiento y medicamentos."
+        if mode == "auto":
+            mode = "chunked" if original_tokens > 2 * chunk_tokens else "single"
+
+        chunks = 1
+        if mode == "chunked":
+            # Sin recorte global: cada fragmento se reduce por separado y nada del historial se omite
+            pieces = chunk_text(text, chunk_tokens)
+            chunks = len(pieces)
+            concurrency = data.max_concurrency or settings.summarization_max_concurrency
+            summary, entities, llm_tokens = await self._map_reduce(pieces, max_length, concurrency)
+        else:
+            llm_text = await self._reduce(text, data.target_tokens or settings.summarization_extractive_target_tokens)
+            llm_tokens = estimate_tokens(llm_text)
+            summary, entities = await self._summarize_single(llm_text, max_length)
+
+        return SummarizationOutput(
+            summary=summary,
+            original_length=len(text),
+            summary_length=len(summary),
+            clinical_entities=entities,
+            mode=mode,
+            chunks=chunks,
+            compression_ratio=round(llm_tokens / max(original_tokens, 1), 3),
+            llm_time_saved_ms=round((original_tokens - llm_tokens) * self.ms_per_token, 1),
         )
 
-        prompt = f"""
-        SINTETIZA LA SIGUIENTE NOTA CLÍNICA (Protocolo EdiCarex):
-        "{text}"
-        
-        REQUISITOS ESTRÍCTOS:
-        1. Estructura: S: Subjetivo, O: Objetivo, A: Análisis, P: Plan.
-        2. Tono: Académico-Clínico.
-        3. Longitud máxima: {max_length} caracteres.
-        
-        FORMATO JSON REQUERIDO:
-        {{
-            "summary": "Texto del resumen estructurado con markdown",
-            "clinical_entities": ["entidad 1", "entidad 2"]
-        }}
-        """
+    async def _reduce(self, text: str, target_tokens: int) -> str:
+        """Pre-resumen extractivo (CPU, fuera del event loop); el texto queda intacto si ya cabe."""
+        if estimate_tokens(text) <= target_tokens:
+            return text
+        reduced = await asyncio.to_thread(extract, text, target_tokens)
+        return reduced["text"] if reduced["tokens"] < estimate_tokens(text) else text
+
+    async def _execute(self, prompt: str) -> Optional[dict]:
+        """Llamada LLM que además actualiza la estimación de ms por token de entrada."""
+        start = time.perf_counter()
+        result = await self.groq.execute_prompt(prompt, DOCUMENTATION_PERSONA, endpoint="summarization")
+        if result and not result.get("fallback"):
+            observed = (time.perf_counter() - start) * 1000 / max(estimate_tokens(prompt), 1)
+            self.ms_per_token = 0.9 * self.ms_per_token + 0.1 * observed
+        return result
+
+    async def _summarize_single(self, text: str, max_length: int) -> Tuple[str, List[str]]:
+        prompt = (
+            self.groq.prompt_builder("summarization")
+            .text("SINTETIZA LA SIGUIENTE NOTA CLÍNICA (Protocolo EdiCarex)", text, min_tokens=256)
+            .section(None, SUMMARY_TASK % max_length)
+            .build()
+        )
 
         try:
-            result = await self.groq.execute_prompt(prompt, system_persona)
-            if result:
-                summary = result.get("summary", "Error en síntesis clínica.")
-            else:
-                summary = "### [RESUMEN DE EMERGENCIA]\n" + text[:max_length-30] + "..."
+            result = await self._execute(prompt)
+            if result and not result.get("fallback"):
+                return result.get("summary", "Error en síntesis clínica."), merge_entities(result.get("clinical_entities"))
+            return self._emergency_summary(text, max_length), []
         except Exception as e:
             logger.error(f"Error en resumen EdiCarex: {e}")
-            summary = "### [ERROR DE SISTEMA]\nNo se pudo procesar la nota clínica."
+            return "### [ERROR DE SISTEMA]\nNo se pudo procesar la nota clínica.", []
 
-        return SummarizationOutput(
-            summary=summary,
-            original_length=len(text),
-            summary_length=len(summary)
+    async def _map_reduce(self, pieces: List[str], max_length: int,
+                          concurrency: int) -> Tuple[str, List[str], int]:
+        """
+        Resume cada fragmento en paralelo (acotado por `concurrency`) y luego integra los
+        resultados: la latencia queda acotada por el fragmento más lento más el reduce.
+        Retorna además los tokens de los fragmentos enviados al LLM tras la etapa extractiva.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        ratio = self.groq.settings.summarization_chunk_extractive_ratio
+        sent_tokens = [0] * len(pieces)
+
+        async def summarize_chunk(index: int, piece: str) -> Tuple[str, List[str]]:
+            piece = await self._reduce(piece, max(64, int(estimate_tokens(piece) * ratio)))
+            sent_tokens[index] = estimate_tokens(piece)
+            prompt = (
+                self.groq.prompt_builder("summarization")
+                .text("FRAGMENTO DEL EXPEDIENTE", piece, min_tokens=256)
+                .section(None, MAP_TASK % (index + 1, len(pieces)))
+                .build()
+            )
+            async with semaphore:
+                try:
+                    result = await self._execute(prompt)
+                except Exception as e:
+                    logger.warning(f"Fragmento {index + 1}/{len(pieces)} sin resumen LLM: {e}")
+                    result = None
+            if result and not result.get("fallback") and result.get("summary"):
+                return str(result["summary"]), result.get("clinical_entities") or []
+            # Sin LLM se conserva el inicio del fragmento para no perderlo en el reduce
+            return piece[:600], []
+
+        partials = await asyncio.gather(*(summarize_chunk(i, p) for i, p in enumerate(pieces)))
+        map_entities = merge_entities(*(entities for _, entities in partials))
+        notes = "\n\n".join(f"[Fragmento {i + 1}]\n{summary}" for i, (summary, _) in enumerate(partials))
+
+        prompt = (
+            self.groq.prompt_builder("summarization")
+            .text("RESÚMENES PARCIALES DEL EXPEDIENTE", notes, min_tokens=512)
+            .data("ENTIDADES CLÍNICAS DETECTADAS", map_entities)
+            .section(None, REDUCE_TASK % max_length)
+            .build()
         )
+        try:
+            result = await self._execute(prompt)
+        except Exception as e:
+            logger.error(f"Error en la integración del resumen EdiCarex: {e}")
+            result = None
+        if result and not result.get("fallback") and result.get("summary"):
+            return result["summary"], merge_entities(map_entities, result.get("clinical_entities")), sum(sent_tokens)
+        return self._emergency_summary(notes, max_length), map_entities, sum(sent_tokens)
+
+    def _emergency_summary(self, text: str, max_length: Optional[int]) -> str:
+        FALLBACKS.inc("summarization")
+        max_length = max_length or 200
+        return "### [RESUMEN DE EMERGENCIA]\n" + text[:max_length - 30] + "..."
@@ -1,68 +1,208 @@
 from app.models.schemas import TriageInput, TriageOutput
 from app.services.groq_service import GroqService
+from app.services.severity_model import SeverityModel
+from app.utils.metrics import FALLBACKS
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
 import re
-import json
+import time
+import uuid
+import asyncio
 import logging
 import numpy as np
-from sklearn.preprocessing import StandardScaler
 
 logger = logging.getLogger("EdiCarexAI.Triage")
 
+TRIAGE_PERSONA = (
+    "Eres el Jefe de Triaje de EdiCarex Enterprise. Experto certificado en el Protocolo Manchester. "
+    "Tu análisis debe ser exhaustivo, citando signos vitales y gravedad potencial. "
+    "Usa un lenguaje clínico preciso y estructura tu respuesta para ser revisada por un médico senior."
+)
+
+TRIAGE_TASK = """
+TAREA:
+1. Clasificación Manchester: ROJO (Emergencia, inmediata), NARANJA (Muy Urgente, <10-15 min), AMARILLO (Urgente, <60 min), VERDE (Estándar, <120 min), AZUL (No urgente).
+2. Proporciona una 'Justificación Clínica Senior' detallada.
+
+FORMATO JSON REQUERIDO:
+{"score": %d, "priority": "COLOR (Nivel)", "notes": "Análisis clínico detallado y estructurado con diagnósticos diferenciales potenciales.", "confidence": 0.XX}
+"""
+
+
+class TriageEnrichmentStore:
+    """
+    Almacén en memoria (acotado y con TTL) de las justificaciones LLM que se generan
+    en segundo plano tras un triaje por vía rápida.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def create(self, triage: TriageOutput) -> str:
+        triage_id = uuid.uuid4().hex
+        self._entries[triage_id] = {
+            "triage_id": triage_id,
+            "status": "pending",
+            "priority": triage.priority,
+            "score": triage.score,
+            "confidence": triage.confidence,
+            "notes": triage.notes,
+            "llm_priority": None,
+            "created_at": time.time(),
+        }
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return triage_id
+
+    def complete(self, triage_id: str, status: str, notes: Optional[str] = None, llm_priority: Optional[str] = None):
+        entry = self._entries.get(triage_id)
+        if entry is not None:
+            entry["status"] = status
+            if notes:
+                entry["notes"] = notes
+            entry["llm_priority"] = llm_priority
+
+    def get(self, triage_id: str) -> Optional[dict]:
+        entry = self._entries.get(triage_id)
+        if entry is None:
+            return None
+        if time.time() - entry["created_at"] > self.ttl:
+            del self._entries[triage_id]
+            return None
+        return entry
+
+
 class TriageService:
     """
     Servicio de Triaje Clínico de EdiCarex.
     Clasifica emergencias basándose en el Protocolo Manchester con soporte de IA.
     """
 
-    def __init__(self):
-        self.groq = GroqService()
+    def __init__(self, groq: GroqService, severity_model: Optional[SeverityModel] = None):
+        self.groq = groq
+        self.severity_model = severity_model
+        self.enrichments = TriageEnrichmentStore()
+        self._background: set = set()
+
+    async def close(self):
+        """Cancela los enriquecimientos LLM pendientes (apagado del servicio)."""
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
 
     async def predict(self, data: TriageInput) -> TriageOutput:
         """
         Calcula la prioridad de triaje utilizando la lógica avanzada de EdiCarex.
-        Integra un modelo local de severidad (Scikit-Learn) + Razonamiento LLM.
+        Integra un modelo local de severidad (entrenado offline) + Razonamiento LLM.
         """
         vital_score, vital_warnings = self._analyze_vital_signs(data.vitalSigns or {})
         
         # Clasificación Local de Severidad (Digital Phenotyping / Hybrid AI)
         severity_index = self._calculate_local_severity(data)
+
+        # Vía rápida: reglas y modelo local coinciden en un caso crítico inequívoco
+        if self._is_fast_path(vital_score, severity_index):
+            return self._fast_path_triage(data, vital_score, vital_warnings, severity_index)
         
-        system_persona = (
-            "Eres el Jefe de Triaje de EdiCarex Enterprise. Experto certificado en el Protocolo Manchester. "
-            "Tu análisis debe ser exhaustivo, citando signos vitales y gravedad potencial. "
-            "Usa un lenguaje clínico preciso y estructura tu respuesta para ser revisada por un médico senior."
+        result, _ = await self._llm_triage(data, vital_score, vital_warnings, severity_index)
+        return result
+
+    def _is_fast_path(self, vital_score: int, severity_index: float) -> bool:
+        settings = self.groq.settings
+        return (
+            settings.triage_fast_path_enabled
+            and vital_score >= settings.triage_fast_path_min_score
+            and severity_index >= settings.triage_fast_path_min_severity
         )
-        
-        prompt = f"""
-        ANÁLISIS DE TRIAJE REQUERIDO:
-        - Paciente de {data.age} años.
-        - Motivo de Consulta: "{data.symptoms}"
-        - Signos Vitales: {json.dumps(data.vitalSigns)}
-        - Alertas Automáticas (Motor Local): {", ".join(vital_warnings)}
-        - Índice de Desviación Estadística: {severity_index:.2f}
-        
-        TAREA:
-        1. Clasificación Manchester:
-           - ROJO: Emergencia (Atención inmediata).
-           - NARANJA: Muy Urgente (Atención < 10-15 min).
-           - AMARILLO: Urgente (Atención < 60 min).
-           - VERDE: Estándar (Atención < 120 min).
-           - AZUL: No urgente.
-        
-        2. Proporciona una 'Justificación Clínica Senior' detallada.
-        
-        FORMATO JSON REQUERIDO:
-        {{
-            "score": {vital_score},
-            "priority": "COLOR (Nivel)",
-            "notes": "Análisis clínico detallado y estructurado con diagnósticos diferenciales potenciales.",
-            "confidence": 0.XX
-        }}
+
+    def _fast_path_triage(self, data: TriageInput, vital_score: int, vital_warnings: list,
+                          severity_index: float) -> TriageOutput:
+        """
+        Retorna de inmediato la prioridad por reglas y programa la justificación LLM
+        en segundo plano; se consulta después con GET /predict/triage/{triage_id}.
+        """
+        result = self._get_rules_triage(vital_score, vital_warnings, severity_index)
+        result.confidence = round(min(0.99, max(result.confidence, severity_index)), 2)
+        triage_id = self.enrichments.create(result)
+        result.triage_id = triage_id
+        result.enrichment = "pending"
+
+        task = asyncio.create_task(self._enrich(triage_id, data, vital_score, vital_warnings, severity_index))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        logger.info(f"Triaje por vía rápida {triage_id}: {result.priority} (severidad local {severity_index:.2f}).")
+        return result
+
+    async def _enrich(self, triage_id: str, data: TriageInput, vital_score: int, vital_warnings: list,
+                      severity_index: float):
+        try:
+            result, source = await self._llm_triage(data, vital_score, vital_warnings, severity_index)
+            if source == "groq":
+                self.enrichments.complete(triage_id, "completed", result.notes, result.priority)
+            else:
+                self.enrichments.complete(triage_id, "failed")
+        except Exception as e:
+            logger.warning(f"Fallo en el enriquecimiento LLM del triaje {triage_id}: {e}")
+            self.enrichments.complete(triage_id, "failed")
+
+    async def predict_batch(self, patients: List[TriageInput], max_concurrency: int = 8) -> AsyncIterator[Tuple[int, TriageOutput, str]]:
+        """
+        Triaje masivo (simulacros / víctimas múltiples).
+        La parte determinística se calcula para todo el lote en una sola pasada NumPy.
+        Cada paciente sigue la misma decisión que `predict`: los que cumplen la vía rápida
+        se emiten de inmediato por reglas (con `triage_id` y justificación LLM diferida,
+        igual que en el triaje individual) y el resto pasa por el LLM con concurrencia
+        acotada, emitiéndose a medida que terminan.
+        Produce tuplas (índice, resultado, fuente).
+        """
+        scores, warnings = self._analyze_vital_signs_batch([p.vitalSigns or {} for p in patients])
+        severities = self._calculate_local_severity_batch(patients)
+
+        pending = []
+        for i in range(len(patients)):
+            if self._is_fast_path(int(scores[i]), float(severities[i])):
+                yield i, self._fast_path_triage(patients[i], int(scores[i]), warnings[i], float(severities[i])), "rules"
+            else:
+                pending.append(i)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(i: int):
+            async with semaphore:
+                result, source = await self._llm_triage(patients[i], int(scores[i]), warnings[i], float(severities[i]))
+                return i, result, source
+
+        tasks = [asyncio.create_task(run(i)) for i in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _llm_triage(self, data: TriageInput, vital_score: int, vital_warnings: list,
+                          severity_index: float) -> Tuple[TriageOutput, str]:
+        """
+        Razonamiento clínico LLM sobre los indicadores locales ya calculados.
+        Retorna el resultado y su fuente ("groq" o "fallback").
         """
+        prompt = (
+            self.groq.prompt_builder("triage")
+            .section("ANÁLISIS DE TRIAJE REQUERIDO", f"Paciente de {data.age} años.")
+            .text("MOTIVO DE CONSULTA", data.symptoms)
+            .data("SIGNOS VITALES", {k: v for k, v in (data.vitalSigns or {}).items() if v not in (None, "")})
+            .section("ALERTAS AUTOMÁTICAS (MOTOR LOCAL)", ", ".join(vital_warnings) or "Ninguna")
+            .section("PROBABILIDAD DE ALTA SEVERIDAD (MODELO LOCAL)", f"{severity_index:.2f}")
+            .section(None, TRIAGE_TASK % vital_score)
+            .build()
+        )
 
         try:
-            result = await self.groq.execute_prompt(prompt, system_persona)
-            if result:
+            result = await self.groq.execute_prompt(prompt, TRIAGE_PERSONA, endpoint="triage")
+            # El respaldo genérico del gateway no contiene una clasificación válida
+            if result and not result.get("fallback"):
                 # Enriquecimiento del resultado si es muy simple
                 notes = result.get("notes", "")
                 if len(notes) < 50:
@@ -74,12 +214,27 @@ class TriageService:
                     priority=result.get("priority", "VERDE (Estándar)"),
                     notes=notes,
                     confidence=result.get("confidence", 0.95)
-                )
-            return self._get_fallback_triage(vital_score, vital_warnings)
+                ), "groq"
+            return self._get_fallback_triage(vital_score, vital_warnings), "fallback"
         except Exception as e:
             logger.error(f"Error en triaje EdiCarex: {e}")
-            return self._get_fallback_triage(vital_score, vital_warnings)
+            return self._get_fallback_triage(vital_score, vital_warnings), "fallback"
     
+    def _score_to_manchester(self, score: int) -> str:
+        if score >= 95: return "ROJO (Emergencia)"
+        if score >= 80: return "NARANJA (Muy Urgente)"
+        if score >= 50: return "AMARILLO (Urgente)"
+        if score >= 30: return "VERDE (Estándar)"
+        return "AZUL (No urgente)"
+
+    def _get_rules_triage(self, vital_score: int, warnings: list, severity_index: float) -> TriageOutput:
+        """Clasificación inmediata por reglas para pacientes críticos (sin esperar al LLM)."""
+        notes = (
+            f"[Motor Local EdiCarex] Criterios críticos en signos vitales: {', '.join(warnings)}. "
+            f"Severidad local: {severity_index:.2f}. Requiere valoración médica inmediata."
+        )
+        return TriageOutput(score=vital_score, priority=self._score_to_manchester(vital_score), notes=notes, confidence=0.9)
+
     def _score_to_priority(self, score: int) -> str:
         if score >= 90: return "URGENT"
         if score >= 70: return "HIGH"
@@ -87,65 +242,110 @@ class TriageService:
         return "LOW"
 
     def _get_fallback_triage(self, vital_score: int, warnings: list) -> TriageOutput:
+        FALLBACKS.inc("triage")
         priority = self._score_to_priority(vital_score)
         notes = f"⚠️ (Modo Backup) Evaluación basada en signos vitales. Alertas: {', '.join(warnings) if warnings else 'Ninguna'}."
         return TriageOutput(score=vital_score, priority=priority, notes=notes, confidence=0.6)
 
     def _analyze_vital_signs(self, vital_signs: dict) -> tuple[int, list]:
         """Análisis determinístico de signos vitales para soporte de IA."""
-        score = 0
-        notes = []
-        
-        # Temperatura (Fiebre alta o hipotermia)
-        if "temperature" in vital_signs:
-            temp = float(vital_signs["temperature"])
-            if temp >= 40.0 or temp <= 35.0:
-                score = max(score, 90); notes.append("Temperatura crítica")
-            elif temp >= 38.5:
-                score = max(score, 50); notes.append("Hipertermia moderada")
-        
-        # Presión Arterial (Sistólica crírtica)
-        if "bloodPressure" in vital_signs:
-            bp = str(vital_signs["bloodPressure"])
-            match = re.match(r"(\d+)/(\d+)", bp)
-            if match:
-                sys = int(match.group(1))
-                if sys >= 180 or sys <= 80:
-                    score = max(score, 95); notes.append("Inestabilidad hemodinámica")
-                elif sys >= 140:
-                    score = max(score, 40); notes.append("Hipertensión estadio 1")
-        
-        # Saturación de Oxígeno (Crítica)
-        if "oxygenSaturation" in vital_signs:
-            o2 = int(vital_signs["oxygenSaturation"])
-            if o2 <= 88:
-                score = max(score, 100); notes.append("Insuficiencia respiratoria inminente")
-            elif o2 <= 92:
-                score = max(score, 80); notes.append("Hipoxia moderada")
-        
-        return score, notes
+        scores, warnings = self._analyze_vital_signs_batch([vital_signs])
+        return int(scores[0]), warnings[0]
+
+    @staticmethod
+    def _vitals_matrix(vital_signs_list: List[dict]) -> np.ndarray:
+        """
+        Extrae [temperatura, sistólica, saturación] de cada paciente (NaN si falta o no es
+        numérico, para que un valor mal capturado no aborte el lote).
+        La saturación se trunca a entero como en la lectura clínica original.
+        """
+        def value(vs: dict, key: str) -> float:
+            try:
+                return float(vs[key]) if vs.get(key) is not None else np.nan
+            except (TypeError, ValueError):
+                return np.nan
+
+        def parse(vs: dict) -> Tuple[float, float, float]:
+            sys_bp = np.nan
+            if "bloodPressure" in vs:
+                match = re.match(r"(\d+)/(\d+)", str(vs["bloodPressure"]))
+                if match:
+                    sys_bp = float(match.group(1))
+            o2 = value(vs, "oxygenSaturation")
+            return value(vs, "temperature"), sys_bp, float(np.trunc(o2))
+
+        if not vital_signs_list:
+            return np.empty((0, 3))
+        return np.array([parse(vs) for vs in vital_signs_list], dtype=float)
+
+    def _analyze_vital_signs_batch(self, vital_signs_list: List[dict]) -> Tuple[np.ndarray, List[list]]:
+        """
+        Versión vectorizada del análisis de signos vitales para un lote completo.
+        Retorna el puntaje por paciente y sus alertas, en el orden de las reglas clínicas.
+        """
+        vitals = self._vitals_matrix(vital_signs_list)
+        temp, sys_bp, o2 = vitals[:, 0], vitals[:, 1], vitals[:, 2]
+
+        with np.errstate(invalid="ignore"):
+            # (máscara, puntaje, alerta); las comparaciones con NaN son falsas
+            temp_crit = (temp >= 40.0) | (temp <= 35.0)
+            rules = [
+                (temp_crit, 90, "Temperatura crítica"),
+                (~temp_crit & (temp >= 38.5), 50, "Hipertermia moderada"),
+                ((sys_bp >= 180) | (sys_bp <= 80), 95, "Inestabilidad hemodinámica"),
+                ((sys_bp >= 140) & (sys_bp < 180), 40, "Hipertensión estadio 1"),
+                (o2 <= 88, 100, "Insuficiencia respiratoria inminente"),
+                ((o2 > 88) & (o2 <= 92), 80, "Hipoxia moderada"),
+            ]
+
+        scores = np.zeros(len(vitals), dtype=int)
+        for mask, rule_score, _ in rules:
+            scores = np.where(mask, np.maximum(scores, rule_score), scores)
+
+        alerts = np.stack([mask for mask, _, _ in rules], axis=1) if len(vitals) else np.zeros((0, len(rules)), dtype=bool)
+        labels = [label for _, _, label in rules]
+        warnings = [[labels[j] for j in np.flatnonzero(row)] for row in alerts]
+        return scores, warnings
 
     def _calculate_local_severity(self, data: TriageInput) -> float:
         """
-        Utiliza Scikit-Learn para normalizar y calcular un vector de gravedad clínica.
-        En un entorno real, este vector se usaría en un clasificador entrenado (ej. Random Forest).
+        Probabilidad de alta severidad del paciente según el modelo local entrenado.
         """
-        try:
-            # Simulamos un vector de características: [edad, temp, sat, sys_bp]
+        return float(self._calculate_local_severity_batch([data])[0])
+
+    def _severity_features(self, patients: List[TriageInput]) -> np.ndarray:
+        """
+        Matriz [edad, temp, sat, sys_bp, frec. cardiaca, frec. respiratoria] (NaN si falta).
+        """
+        def value(vs: dict, key: str) -> float:
+            try:
+                return float(vs[key]) if vs.get(key) is not None else np.nan
+            except (TypeError, ValueError):
+                return np.nan
+
+        rows = []
+        for data in patients:
             vs = data.vitalSigns or {}
-            features = np.array([[
+            bp = re.search(r"(\d+)", str(vs.get("bloodPressure") or ""))
+            rows.append([
                 float(data.age),
-                float(vs.get("temperature", 37.0)),
-                float(vs.get("oxygenSaturation", 98)),
-                float(re.search(r"(\d+)", str(vs.get("bloodPressure", "120/80"))).group(1)) if vs.get("bloodPressure") else 120
-            ]])
-            
-            scaler = StandardScaler()
-            norm_features = scaler.fit_transform(features)
-            
-            # Cálculo de score de anomalía local (Mock de modelo predictivo)
-            severity = np.abs(norm_features).mean()
-            return float(severity)
+                value(vs, "temperature"),
+                value(vs, "oxygenSaturation"),
+                float(bp.group(1)) if bp else np.nan,
+                value(vs, "heartRate"),
+                value(vs, "respiratoryRate"),
+            ])
+        return np.array(rows, dtype=float).reshape(len(patients), 6)
+
+    def _calculate_local_severity_batch(self, patients: List[TriageInput]) -> np.ndarray:
+        """
+        Severidad del lote completo con una única predicción vectorizada.
+        Sin artefacto cargado retorna 0.0 (neutral) para todos los pacientes.
+        """
+        if self.severity_model is None:
+            return np.zeros(len(patients))
+        try:
+            return self.severity_model.predict(self._severity_features(patients))
         except Exception as e:
-            logger.warning(f"Error en clasificación Scikit-Learn: {e}")
-            return 0.0
+            logger.warning(f"Error en el modelo local de severidad: {e}")
+            return np.zeros(len(patients))
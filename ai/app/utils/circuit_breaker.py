@@ -0,0 +1,144 @@
+"""
+Circuit breaker por modelo de EdiCarex.
+Evita gastar reintentos y esperas contra modelos retirados o limitados por cuota.
+"""
+from collections import deque
+from typing import Optional
+import logging
+import time
+
+from app.utils.metrics import BREAKER_OPENS, BREAKER_STATE
+
+logger = logging.getLogger("EdiCarexAI.Breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Valor del estado en la métrica edicarex_circuit_breaker_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """
+    Determina si un error cuenta contra la salud del modelo: errores de conexión,
+    timeouts, 429 (cuota), 404 (modelo retirado) y 5xx. Los 4xx restantes son
+    errores de la petición y no del modelo.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        return True
+    return status in (404, 429) or status >= 500
+
+
+class CircuitBreaker:
+    """
+    Estados: cerrado (tráfico normal), abierto (modelo omitido) y semiabierto
+    (tras el enfriamiento se permiten peticiones de prueba).
+    Se abre por fallos consecutivos o por tasa de error en una ventana deslizante.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 window: int = 20, min_requests: int = 10, cooldown: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.half_open_max_calls = half_open_max_calls
+
+        self._set_state(CLOSED)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.last_error: Optional[str] = None
+        self._outcomes = deque(maxlen=window)
+        self._half_open_inflight = 0
+        self.configure(failure_threshold, error_rate_threshold, window, min_requests, cooldown)
+
+    def configure(self, failure_threshold: int, error_rate_threshold: float, window: int,
+                  min_requests: int, cooldown: float):
+        """Aplica nuevos umbrales conservando el estado y los resultados más recientes."""
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        if self._outcomes.maxlen != window:
+            self._outcomes = deque(self._outcomes, maxlen=window)
+
+    def available(self) -> bool:
+        """Consulta sin efectos: False si el circuito está abierto o sin turnos de prueba."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        if self.state == HALF_OPEN:
+            return self._half_open_inflight < self.half_open_max_calls
+        return True
+
+    def allow(self) -> bool:
+        """Indica si se puede enviar una petición; reserva un turno de prueba en semiabierto."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._set_state(HALF_OPEN)
+            self._half_open_inflight = 0
+            logger.info(f"Circuito {self.name}: semiabierto, enviando petición de prueba.")
+
+        if self.state == HALF_OPEN:
+            if self._half_open_inflight >= self.half_open_max_calls:
+                return False
+            self._half_open_inflight += 1
+        return True
+
+    def release(self):
+        """Libera un turno de prueba que terminó sin resultado (p. ej. cancelado por hedging)."""
+        if self.state == HALF_OPEN and self._half_open_inflight > 0:
+            self._half_open_inflight -= 1
+
+    def record_success(self):
+        self._outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            logger.info(f"Circuito {self.name}: cerrado tras prueba exitosa.")
+            self._set_state(CLOSED)
+            self._outcomes.clear()
+            self._half_open_inflight = 0
+
+    def record_failure(self, error: str = ""):
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+        self.last_error = error[:200] if error else self.last_error
+        if self.state == HALF_OPEN:
+            self._trip()
+        elif self.state == CLOSED and (
+            self.consecutive_failures >= self.failure_threshold
+            or (len(self._outcomes) >= self.min_requests and self.error_rate >= self.error_rate_threshold)
+        ):
+            self._trip()
+
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.set(STATE_VALUES[state], self.name)
+
+    def _trip(self):
+        self._set_state(OPEN)
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        BREAKER_OPENS.inc(self.name)
+        self._half_open_inflight = 0
+        logger.warning(f"Circuito {self.name}: abierto durante {self.cooldown}s. Último error: {self.last_error}")
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "error_rate": round(self.error_rate, 3),
+            "trips": self.trips,
+            "retry_in_s": retry_in,
+            "last_error": self.last_error,
+        }
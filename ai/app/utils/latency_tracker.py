@@ -0,0 +1,40 @@
+"""
+Seguimiento de latencia por modelo de EdiCarex.
+Ventana deslizante de latencias observadas para calcular percentiles (hedging).
+"""
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """Mantiene las últimas `window` latencias exitosas (segundos) de cada modelo."""
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, model: str, seconds: float):
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, model: str, pct: float) -> Optional[float]:
+        """Percentil observado, o None si aún no hay muestras suficientes."""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def snapshot(self) -> dict:
+        return {
+            model: {
+                "samples": len(samples),
+                "p50_ms": round(self.percentile(model, 50) * 1000, 1) if len(samples) >= self.min_samples else None,
+                "p95_ms": round(self.percentile(model, 95) * 1000, 1) if len(samples) >= self.min_samples else None,
+            }
+            for model, samples in self._samples.items()
+        }
@@ -0,0 +1,208 @@
+"""
+Métricas de EdiCarex AI en formato de texto de Prometheus (/metrics).
+Contadores e histogramas con cubetas fijas: registrar una observación es una búsqueda
+binaria y dos sumas sobre una lista ya creada, sin bloqueos (las actualizaciones
+ocurren en el hilo del event loop). Los acumulados por cubeta se calculan solo al
+exportar.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+QUEUE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Por serie: una cuenta por cubeta, la de +Inf y la suma al final
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for labels, series in list(self._series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "edicarex_http_request_duration_seconds", "Latencia de las peticiones HTTP hasta el último byte enviado.",
+    ("route", "method", "status"), REQUEST_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "edicarex_llm_request_duration_seconds", "Latencia de las llamadas a Groq por modelo y resultado.",
+    ("model", "outcome"), UPSTREAM_BUCKETS,
+)
+QUOTA_WAIT = Histogram(
+    "edicarex_rate_limiter_wait_seconds", "Espera en la cola de cuota Groq antes de cada llamada, por endpoint.",
+    ("endpoint",), QUEUE_BUCKETS,
+)
+LLM_RETRIES = Counter("edicarex_llm_retries_total", "Reintentos de llamadas a Groq por modelo.", ("model",))
+FALLBACKS = Counter("edicarex_fallbacks_total", "Respuestas servidas por un respaldo local en lugar del LLM.", ("service",))
+JSON_PARSE_FAILURES = Counter(
+    "edicarex_llm_json_parse_failures_total", "Respuestas del LLM que no se pudieron interpretar como JSON.", ("model",)
+)
+LLM_TOKENS = Counter("edicarex_llm_tokens_total", "Tokens consumidos en Groq por modelo y tipo.", ("model", "kind"))
+BREAKER_STATE = Gauge(
+    "edicarex_circuit_breaker_state", "Estado del circuit breaker por modelo (0 cerrado, 1 semiabierto, 2 abierto).",
+    ("model",),
+)
+BREAKER_OPENS = Counter(
+    "edicarex_circuit_breaker_open_transitions_total", "Aperturas del circuit breaker por modelo.", ("model",)
+)
+EVENT_LOOP_LAG = Histogram(
+    "edicarex_event_loop_lag_seconds", "Retraso del event loop respecto al intervalo de muestreo.", (), LAG_BUCKETS,
+)
+EVENT_LOOP_LAG_LAST = Gauge("edicarex_event_loop_lag_last_seconds", "Último retraso medido del event loop.")
+
+METRICS = (REQUEST_LATENCY, UPSTREAM_LATENCY, QUOTA_WAIT, LLM_RETRIES, FALLBACKS, JSON_PARSE_FAILURES, LLM_TOKENS,
+           BREAKER_STATE, BREAKER_OPENS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_LAST)
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def record_usage(model: str, usage) -> None:
+    """Suma los tokens de prompt y de respuesta informados por Groq (si los hay)."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens:
+        LLM_TOKENS.inc(model, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.inc(model, "completion", amount=completion_tokens)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin envolver la respuesta como BaseHTTPMiddleware) que mide cada
+    petición HTTP. La ruta es la plantilla registrada (p. ej. /ai/chat/sessions/{session_id})
+    para que la cardinalidad no dependa de los parámetros.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                getattr(route, "path", "unmatched"), scope["method"], str(status),
+            )
+
+
+class EventLoopMonitor:
+    """Tarea que duerme `interval` segundos y registra cuánto tarda de más en despertar."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="edicarex-event-loop-lag")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
@@ -0,0 +1,159 @@
+"""
+Construcción de prompts de EdiCarex con presupuesto de tokens por endpoint.
+Serialización compacta, agregados para series largas y registro de cada truncado.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+import logging
+import math
+import textwrap
+
+logger = logging.getLogger("EdiCarexAI.Prompt")
+
+# ~4 caracteres por token en español; estimación conservadora y sin dependencias
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = " [...] "
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(value: Any) -> str:
+    """JSON sin indentación ni espacios superfluos."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+@lru_cache(maxsize=64)
+def system_prompt(base: str, persona: str) -> str:
+    """Prefijo de sistema (base + persona) construido una sola vez por combinación."""
+    return f"{base} Contexto específico: {persona}" if persona else base
+
+
+def series_aggregates(values: Sequence[float]) -> Dict[str, float]:
+    """Resumen estadístico que sustituye a una serie demasiado larga."""
+    n = len(values)
+    if not n:
+        return {"n": 0}
+    mean = sum(values) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+    # Pendiente por mínimos cuadrados (unidades por periodo)
+    x_mean = (n - 1) / 2
+    denom = sum((i - x_mean) ** 2 for i in range(n)) or 1.0
+    slope = sum((i - x_mean) * (v - mean) for i, v in enumerate(values)) / denom
+    return {
+        "n": n, "media": round(mean, 2), "std": round(std, 2),
+        "min": round(min(values), 2), "max": round(max(values), 2), "pendiente": round(slope, 3),
+    }
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Conserva el inicio y el final del texto (70/30) dentro de `max_tokens`."""
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARK))
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * 0.7)
+    tail = max_chars - head
+    return text[:head].rstrip() + TRUNCATION_MARK + (text[-tail:].lstrip() if tail else "")
+
+
+class PromptBuilder:
+    """
+    Acumula secciones de un prompt y lo ajusta al presupuesto del endpoint.
+    Las secciones marcadas como recortables se reducen (la más grande primero) cuando
+    el total supera el presupuesto; cada recorte queda en `truncations` y se acumula
+    en `stats` (contadores por endpoint compartidos por el gateway).
+    """
+
+    def __init__(self, endpoint: str, budget: int, stats: Optional[Dict[str, Dict[str, int]]] = None):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.stats = stats if stats is not None else {}
+        self.truncations: List[dict] = []
+        self._sections: List[list] = []
+
+    def section(self, title: Optional[str], body: str, truncatable: bool = False, min_tokens: int = 32) -> "PromptBuilder":
+        body = textwrap.dedent(body).strip()
+        self._sections.append([title, body, truncatable, min_tokens])
+        return self
+
+    def text(self, title: str, body: str, min_tokens: int = 64) -> "PromptBuilder":
+        """Texto libre recortable (notas clínicas, síntomas)."""
+        return self.section(title, body, truncatable=True, min_tokens=min_tokens)
+
+    def data(self, title: str, value: Any, fields: Optional[Iterable[str]] = None) -> "PromptBuilder":
+        """Datos estructurados en JSON compacto, opcionalmente limitados a `fields`."""
+        if fields is not None and isinstance(value, dict):
+            keep = set(fields)
+            value = {k: v for k, v in value.items() if k in keep}
+        return self.section(title, compact_json(value))
+
+    def series(self, title: str, values: Sequence[float], max_points: int = 30) -> "PromptBuilder":
+        """Serie numérica; si es larga se envían agregados más los últimos puntos."""
+        values = [float(v) for v in values]
+        if len(values) <= max_points:
+            return self.section(title, compact_json(values))
+        tail = values[-(max_points // 2):]
+        self._record(title, len(values), len(tail), "agregados")
+        body = compact_json({"resumen": series_aggregates(values), "ultimos": tail})
+        return self.section(title, body)
+
+    def records(self, title: str, rows: List[dict], fields: Optional[Iterable[str]] = None,
+                max_rows: int = 24) -> "PromptBuilder":
+        """
+        Tabla de registros en formato columnar compacto. Solo se envían `fields` (o los
+        campos del primer registro); las filas antiguas que exceden `max_rows` se
+        sustituyen por agregados de sus columnas numéricas.
+        """
+        rows = [r for r in rows if isinstance(r, dict)]
+        if not rows:
+            return self.section(title, "[]")
+        columns = list(fields) if fields is not None else list(rows[0].keys())
+        payload: Dict[str, Any] = {"columnas": columns}
+        if len(rows) > max_rows:
+            older, rows = rows[:-max_rows], rows[-max_rows:]
+            payload["anteriores"] = {
+                col: series_aggregates([r[col] for r in older if isinstance(r.get(col), (int, float))])
+                for col in columns
+                if any(isinstance(r.get(col), (int, float)) for r in older)
+            }
+            self._record(title, len(older) + len(rows), len(rows), "agregados")
+        payload["filas"] = [[r.get(col) for col in columns] for r in rows]
+        return self.section(title, compact_json(payload))
+
+    def _record(self, section: str, original: int, kept: int, kind: str):
+        self.truncations.append({"section": section, "original": original, "kept": kept, "kind": kind})
+        stats = self.stats.setdefault(self.endpoint, {"prompts_truncated": 0, "sections_truncated": 0})
+        stats["sections_truncated"] += 1
+        logger.info(f"Prompt {self.endpoint}: sección '{section}' reducida ({kind}: {original} -> {kept}).")
+
+    def _render(self) -> str:
+        return "\n\n".join(f"{title}:\n{body}" if title else body for title, body, _, _ in self._sections)
+
+    def build(self) -> str:
+        prompt = self._render()
+        overflow = estimate_tokens(prompt) - self.budget
+        if overflow > 0:
+            truncatable = sorted(
+                (s for s in self._sections if s[2]), key=lambda s: len(s[1]), reverse=True
+            )
+            for section in truncatable:
+                if overflow <= 0:
+                    break
+                current = estimate_tokens(section[1])
+                target = max(section[3], current - overflow)
+                if target >= current:
+                    continue
+                section[1] = truncate_text(section[1], target)
+                overflow -= current - estimate_tokens(section[1])
+                self._record(section[0] or "texto", current, target, "tokens")
+            prompt = self._render()
+            if overflow > 0:
+                logger.warning(
+                    f"Prompt {self.endpoint}: {estimate_tokens(prompt)} tokens supera el presupuesto de {self.budget}."
+                )
+        if self.truncations:
+            self.stats.setdefault(self.endpoint, {"prompts_truncated": 0, "sections_truncated": 0})
+            self.stats[self.endpoint]["prompts_truncated"] += 1
+        return prompt
@@ -0,0 +1,160 @@
+"""
+Limitador de cuota Groq de EdiCarex (lado cliente).
+Dos token buckets (peticiones/min y tokens/min) con cola de admisión por prioridad.
+"""
+from typing import Dict, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from app.utils.metrics import QUOTA_WAIT
+
+logger = logging.getLogger("EdiCarexAI.RateLimiter")
+
+
+class TokenBucket:
+    """Bucket con capacidad `capacity` que se rellena a `rate` unidades por segundo."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Segundos hasta poder consumir `amount` (0 si ya es posible)."""
+        deficit = amount - self.level
+        return 0.0 if deficit <= 0 else deficit / self.rate
+
+
+class PriorityRateLimiter:
+    """
+    Admite trabajo respetando simultáneamente el presupuesto de peticiones y de tokens.
+    Cuando no hay cupo, las peticiones esperan en una cola ordenada por prioridad
+    (menor número = mayor prioridad) y, dentro de cada clase, por orden de llegada.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, priorities: Dict[str, int],
+                 default_priority: int = 9):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.priorities = priorities
+        self.default_priority = default_priority
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.stats: Dict[str, dict] = {}
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int, priorities: Dict[str, int]):
+        """
+        Aplica una nueva cuota y clases de prioridad en caliente. Conserva la cola y el
+        consumo reciente (el nivel de cada bucket se recorta a la nueva capacidad); las
+        peticiones ya encoladas mantienen su turno.
+        """
+        for bucket, per_minute in ((self.requests, requests_per_minute), (self.tokens, tokens_per_minute)):
+            bucket.refill()
+            bucket.capacity = per_minute
+            bucket.rate = per_minute / 60.0
+            bucket.level = min(bucket.level, per_minute)
+        self.priorities = priorities
+
+    def priority(self, endpoint: Optional[str]) -> int:
+        return self.priorities.get(endpoint or "", self.default_priority)
+
+    def _try_take(self, tokens: int) -> bool:
+        self.requests.refill()
+        self.tokens.refill()
+        if self.requests.level >= 1 and self.tokens.level >= tokens:
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            return True
+        return False
+
+    async def acquire(self, endpoint: Optional[str], estimated_tokens: int) -> float:
+        """
+        Espera turno para una llamada upstream; retorna el tiempo de espera en cola (segundos).
+        """
+        tokens = min(max(1, int(estimated_tokens)), int(self.tokens.capacity))
+        start = time.monotonic()
+        if not self._queue and self._try_take(tokens):
+            self._record(endpoint, 0.0, queued=False)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (self.priority(endpoint), next(self._seq), tokens, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch(), name="edicarex-rate-limiter")
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Fue admitido justo al cancelarse: se devuelve el cupo
+                self.requests.level += 1
+                self.tokens.level += tokens
+            raise
+        waited = time.monotonic() - start
+        self._record(endpoint, waited, queued=True)
+        return waited
+
+    async def _dispatch(self):
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            # Una recarga puede haber reducido la cuota por debajo de lo ya encolado
+            tokens = min(tokens, int(self.tokens.capacity))
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self._try_take(tokens):
+                heapq.heappop(self._queue)
+                future.set_result(None)
+                continue
+            wait = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+            await asyncio.sleep(max(wait, 0.01))
+
+    def refund(self, estimated_tokens: int):
+        """Devuelve el cupo de una llamada admitida que finalmente no se envió."""
+        tokens = min(max(1, int(estimated_tokens)), int(self.tokens.capacity))
+        self.requests.level = min(self.requests.capacity, self.requests.level + 1)
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens)
+
+    def adjust(self, delta_tokens: int):
+        """Corrige el bucket de tokens con el consumo real informado por la API."""
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level - delta_tokens)
+
+    def _record(self, endpoint: Optional[str], waited: float, queued: bool):
+        stats = self.stats.setdefault(endpoint or "default", {
+            "admitted": 0, "queued": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0,
+        })
+        waited_ms = waited * 1000
+        stats["admitted"] += 1
+        stats["queued"] += int(queued)
+        stats["wait_total_ms"] += waited_ms
+        stats["wait_max_ms"] = max(stats["wait_max_ms"], waited_ms)
+        QUOTA_WAIT.observe(waited, endpoint or "default")
+        if waited > 1.0:
+            logger.info(f"Cuota Groq: {endpoint} esperó {waited:.2f}s en cola.")
+
+    def snapshot(self) -> dict:
+        self.requests.refill()
+        self.tokens.refill()
+        return {
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level),
+            "queue_depth": sum(1 for *_, f in self._queue if not f.done()),
+            "endpoints": {
+                name: {
+                    **stats,
+                    "wait_total_ms": round(stats["wait_total_ms"], 1),
+                    "wait_max_ms": round(stats["wait_max_ms"], 1),
+                    "wait_avg_ms": round(stats["wait_total_ms"] / stats["admitted"], 1) if stats["admitted"] else 0.0,
+                }
+                for name, stats in self.stats.items()
+            },
+        }
@@ -0,0 +1,240 @@
+"""
+Caché de respuestas LLM de EdiCarex.
+Nivel en memoria (LRU + TTL) y nivel opcional en disco (SQLite), con política por endpoint.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("EdiCarexAI.Cache")
+
+
+def make_cache_key(model: str, system_prompt: str, prompt: str, temperature: float) -> str:
+    """Hash estable de (modelo, prompt de sistema, prompt de usuario, temperatura)."""
+    raw = json.dumps([model, system_prompt, prompt, round(float(temperature), 3)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CachePolicy:
+    """Política de caché de un endpoint (TTL y límites de tamaño de cada nivel)."""
+
+    def __init__(self, enabled: bool = True, ttl: float = 300.0, max_entries: int = 512,
+                 disk: bool = False, disk_ttl: Optional[float] = None, disk_max_entries: int = 5000):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self.disk_ttl = disk_ttl if disk_ttl is not None else ttl
+        self.disk_max_entries = disk_max_entries
+
+
+class MemoryTier:
+    """LRU en memoria con expiración por entrada."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: dict, ttl: float) -> int:
+        """Guarda la entrada y retorna cuántas se desalojaron."""
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        return self._evict()
+
+    def resize(self, max_entries: int) -> int:
+        """Cambia la capacidad y retorna cuántas entradas antiguas se desalojaron."""
+        self.max_entries = max_entries
+        return self._evict()
+
+    def _evict(self) -> int:
+        evicted = 0
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteTier:
+    """Nivel persistente en SQLite, compartido entre workers del mismo pod."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " endpoint TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (endpoint, key))"
+        )
+
+    def get(self, endpoint: str, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE endpoint = ? AND key = ?", (endpoint, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE endpoint = ? AND key = ?", (endpoint, key))
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE endpoint = ? AND key = ?", (now, endpoint, key)
+            )
+        return json.loads(row[0])
+
+    def set(self, endpoint: str, key: str, value: dict, ttl: float, max_entries: int) -> int:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (endpoint, key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE endpoint = ? AND expires_at < ?", (endpoint, now))
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE endpoint = ? AND key IN ("
+                " SELECT key FROM llm_cache WHERE endpoint = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (endpoint, endpoint, max_entries),
+            )
+            return cur.rowcount or 0
+
+    def clear(self, endpoint: Optional[str] = None):
+        with self._lock:
+            if endpoint:
+                self._conn.execute("DELETE FROM llm_cache WHERE endpoint = ?", (endpoint,))
+            else:
+                self._conn.execute("DELETE FROM llm_cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Caché de dos niveles para respuestas de execute_prompt.
+    Cada endpoint tiene su propia política; los que no figuran usan la política por defecto.
+    """
+
+    def __init__(self, policies: Dict[str, dict], sqlite_path: Optional[str] = None):
+        self._memory: Dict[str, MemoryTier] = {}
+        self.disk = SQLiteTier(sqlite_path) if sqlite_path else None
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.configure(policies)
+
+    def configure(self, policies: Dict[str, dict]):
+        """
+        Aplica nuevas políticas por endpoint. Los niveles en memoria existentes se
+        redimensionan (o se vacían si su endpoint queda deshabilitado); la ruta SQLite
+        no cambia en caliente.
+        """
+        self.default_policy = CachePolicy(**policies.get("default", {"enabled": False}))
+        self.policies = {name: CachePolicy(**cfg) for name, cfg in policies.items() if name != "default"}
+        for endpoint, tier in self._memory.items():
+            policy = self.policy(endpoint)
+            if not policy.enabled:
+                tier.clear()
+            self._count(endpoint, "evictions", tier.resize(policy.max_entries))
+
+    def policy(self, endpoint: str) -> CachePolicy:
+        return self.policies.get(endpoint, self.default_policy)
+
+    def enabled(self, endpoint: Optional[str]) -> bool:
+        return bool(endpoint) and self.policy(endpoint).enabled
+
+    def _memory_tier(self, endpoint: str) -> MemoryTier:
+        tier = self._memory.get(endpoint)
+        if tier is None:
+            tier = self._memory[endpoint] = MemoryTier(self.policy(endpoint).max_entries)
+        return tier
+
+    def _count(self, endpoint: str, counter: str, amount: int = 1):
+        stats = self.stats.setdefault(endpoint, {
+            "hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evictions": 0,
+        })
+        stats[counter] += amount
+
+    async def get(self, endpoint: str, key: str) -> Optional[dict]:
+        policy = self.policy(endpoint)
+        memory = self._memory_tier(endpoint)
+        value = memory.get(key)
+        if value is not None:
+            self._count(endpoint, "hits_memory")
+            # Copia para que los servicios puedan post-procesar sin alterar la caché
+            return copy.deepcopy(value)
+
+        if policy.disk and self.disk is not None:
+            try:
+                value = await asyncio.to_thread(self.disk.get, endpoint, key)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo leer la caché SQLite: {e}")
+                value = None
+            if value is not None:
+                self._count(endpoint, "hits_disk")
+                self._count(endpoint, "evictions", memory.set(key, copy.deepcopy(value), policy.ttl))
+                return value
+
+        self._count(endpoint, "misses")
+        return None
+
+    async def set(self, endpoint: str, key: str, value: dict):
+        policy = self.policy(endpoint)
+        self._count(endpoint, "stores")
+        self._count(endpoint, "evictions", self._memory_tier(endpoint).set(key, copy.deepcopy(value), policy.ttl))
+        if policy.disk and self.disk is not None:
+            try:
+                evicted = await asyncio.to_thread(
+                    self.disk.set, endpoint, key, value, policy.disk_ttl, policy.disk_max_entries
+                )
+                self._count(endpoint, "evictions", evicted)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo persistir en caché SQLite: {e}")
+
+    def clear(self, endpoint: Optional[str] = None):
+        for name, tier in self._memory.items():
+            if endpoint is None or name == endpoint:
+                tier.clear()
+        if self.disk is not None:
+            self.disk.clear(endpoint)
+
+    def snapshot(self) -> dict:
+        result = {}
+        for endpoint, stats in self.stats.items():
+            lookups = stats["hits_memory"] + stats["hits_disk"] + stats["misses"]
+            hits = stats["hits_memory"] + stats["hits_disk"]
+            result[endpoint] = {
+                **stats,
+                "entries_memory": len(self._memory.get(endpoint, ())),
+                "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            }
+        return {"disk_enabled": self.disk is not None, "endpoints": result}
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,214 @@
+"""
+Caché semántica de respuestas del chat de EdiCarex.
+Cada mensaje se proyecta localmente (feature hashing de n-gramas de caracteres, sin
+modelos externos) a un vector normalizado que se guarda en float16. Una consulta cuyo
+vecino más cercano supera el umbral de similitud coseno reutiliza la respuesta del LLM.
+Los mensajes con datos personales no se guardan ni se consultan. Números, dosis,
+unidades y negaciones deben coincidir exactamente: "5 años" frente a "2 años" o
+"tiene fiebre" frente a "no tiene fiebre" son vecinos muy cercanos en el espacio
+vectorial pero preguntas clínicamente distintas.
+"""
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import copy
+import math
+import re
+import threading
+import numpy as np
+
+from app.utils.term_matcher import normalize
+
+# Datos personales: correos, teléfonos/documentos, fechas, nombres y direcciones
+PERSONAL_DATA = re.compile(
+    r"[\w.+-]+@[\w-]+\.\w+"
+    r"|(?:\d[\s.-]?){7,}"
+    r"|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"
+    r"|\b(?:me llamo|mi nombre es|mi apellido|soy el paciente|soy la paciente)\b"
+    r"|\b(?:dni|carn[eé] de extranjer[ií]a|pasaporte|historia cl[ií]nica|n[uú]mero de seguro|ruc)\b"
+    r"|\b(?:vivo en|mi direcci[oó]n|calle|avenida|av\.|jr\.|jir[oó]n|urbanizaci[oó]n)\s",
+    re.IGNORECASE,
+)
+
+# Firma SimHash de 64 bits (signo de proyecciones aleatorias) que preselecciona candidatos
+# por distancia de Hamming antes de la comparación coseno completa
+SIGNATURE_BITS = 64
+MAX_CANDIDATES = 4096
+INITIAL_ROWS = 1024
+_POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+# Tokens que cambian el sentido clínico (sobre texto normalizado: sin tildes ni mayúsculas)
+GUARD_TOKENS = re.compile(
+    r"(?<![a-z0-9])(?:"
+    r"[a-z]*\d[a-z0-9]*"
+    r"|no|sin|nunca|jamas|ni|tampoco|nada|nadie|ningun|ninguna|ninguno"
+    r"|cero|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|quince|veinte|treinta|medio|media"
+    r"|mg|g|gr|gramos?|ml|mililitros?|mcg|ug|kg|kilos?|cc|ui|gotas?|tabletas?|pastillas?|capsulas?"
+    r"|comprimidos?|cucharadas?|cucharaditas?|anos?|mes|meses|semanas?|dias?|horas?|minutos?|grados?"
+    r")(?![a-z0-9])"
+)
+
+
+def contains_personal_data(text: str) -> bool:
+    return PERSONAL_DATA.search(text) is not None
+
+
+def guard_tokens(normalized: str) -> Tuple[str, ...]:
+    """Números, cantidades, unidades y negaciones del mensaje, en orden."""
+    return tuple(GUARD_TOKENS.findall(normalized))
+
+
+class SemanticCache:
+    """
+    Índice de vecino más cercano en memoria con inserción incremental y desalojo FIFO
+    al alcanzar `capacity`. Los vectores (float16) y sus firmas (uint64) viven en arrays
+    que crecen por duplicación; la búsqueda filtra por Hamming sobre las firmas y solo
+    convierte a float32 los candidatos.
+    """
+
+    def __init__(self, capacity: int = 100000, threshold: float = 0.88, dim: int = 256):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self._vectorizer = None
+        self._planes = np.random.default_rng(2025).standard_normal((dim, SIGNATURE_BITS)).astype(np.float32)
+        self._weights = np.left_shift(np.uint64(1), np.arange(SIGNATURE_BITS, dtype=np.uint64))
+        # Bits distintos esperados en el umbral (P = ángulo/π) más tres desviaciones
+        p = math.acos(max(-1.0, min(1.0, threshold))) / math.pi
+        self._radius = math.ceil(SIGNATURE_BITS * p + 3 * math.sqrt(SIGNATURE_BITS * p * (1 - p)))
+        self._vectors = np.zeros((0, dim), dtype=np.float16)
+        self._signatures = np.zeros(0, dtype=np.uint64)
+        self._payloads: List[Optional[dict]] = []
+        self._guards: List[Optional[Tuple[str, ...]]] = []
+        self._keys: Dict[str, int] = {}
+        self._slot_keys: List[Optional[str]] = []
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "skipped_personal_data": 0,
+                      "guard_rejections": 0}
+
+    def __len__(self):
+        return self._size
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer  # diferido: se precarga en el calentamiento
+
+            self._vectorizer = HashingVectorizer(
+                analyzer="char_wb", ngram_range=(3, 5), n_features=self.dim, alternate_sign=True, norm="l2"
+            )
+        return self._vectorizer.transform([normalized]).toarray()[0].astype(np.float32)
+
+    def _signature(self, vector: np.ndarray) -> np.uint64:
+        return np.bitwise_or.reduce(self._weights[vector @ self._planes > 0], initial=np.uint64(0))
+
+    def _grow(self):
+        rows = min(self.capacity, max(INITIAL_ROWS, 2 * len(self._vectors)))
+        for name in ("_vectors", "_signatures"):
+            old = getattr(self, name)
+            new = np.zeros((rows,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self._payloads.extend([None] * (rows - len(self._payloads)))
+        self._guards.extend([None] * (rows - len(self._guards)))
+        self._slot_keys.extend([None] * (rows - len(self._slot_keys)))
+
+    def _search(self, normalized: str) -> Tuple[Optional[dict], float]:
+        """
+        Vecino más similar por encima del umbral cuyos tokens de guarda (números, unidades,
+        negaciones) coinciden exactamente con los del mensaje; (None, 0.0) si no hay.
+        """
+        vector = self._embed(normalized)
+        guard = guard_tokens(normalized)
+        signature = self._signature(vector)
+        with self._lock:
+            slot = self._keys.get(normalized)
+            if slot is not None:
+                return self._payloads[slot], 1.0
+            n = self._size
+            if not n:
+                return None, 0.0
+            xor = np.bitwise_xor(self._signatures[:n], signature)
+            distance = _POPCOUNT[xor.view(np.uint16)].reshape(n, 4).sum(axis=1, dtype=np.uint16)
+            candidates = np.flatnonzero(distance <= self._radius)
+            if not len(candidates):
+                return None, 0.0
+            if len(candidates) > MAX_CANDIDATES:
+                nearest = np.argpartition(distance[candidates], MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+                candidates = candidates[nearest]
+            scores = self._vectors[candidates].astype(np.float32) @ vector
+            above = np.flatnonzero(scores >= self.threshold)
+            for i in above[np.argsort(-scores[above])]:
+                slot = candidates[i]
+                if self._guards[slot] == guard:
+                    return self._payloads[slot], float(scores[i])
+            if len(above):
+                self.stats["guard_rejections"] += 1
+            return None, 0.0
+
+    def _insert(self, normalized: str, payload: dict):
+        vector = self._embed(normalized)
+        signature = self._signature(vector)
+        with self._lock:
+            slot = self._keys.get(normalized)
+            if slot is None:
+                if self._size < self.capacity:
+                    if self._size == len(self._vectors):
+                        self._grow()
+                    slot = self._size
+                    self._size += 1
+                else:
+                    # Desalojo FIFO: se reutiliza la entrada más antigua
+                    slot = self._next
+                    self._next = (self._next + 1) % self.capacity
+                    del self._keys[self._slot_keys[slot]]
+                    self.stats["evictions"] += 1
+                self._keys[normalized] = slot
+                self._slot_keys[slot] = normalized
+            self._vectors[slot] = vector
+            self._signatures[slot] = signature
+            self._payloads[slot] = payload
+            self._guards[slot] = guard_tokens(normalized)
+            self.stats["stores"] += 1
+
+    async def get(self, message: str) -> Optional[dict]:
+        """Respuesta guardada para un mensaje equivalente (con su similitud) o None."""
+        if contains_personal_data(message):
+            self.stats["skipped_personal_data"] += 1
+            return None
+        normalized = normalize(message)
+        if not normalized:
+            return None
+        payload, score = await asyncio.to_thread(self._search, normalized)
+        if payload is None or score < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {**copy.deepcopy(payload), "similarity": round(score, 3)}
+
+    async def set(self, message: str, payload: dict):
+        if contains_personal_data(message):
+            return
+        normalized = normalize(message)
+        if normalized:
+            await asyncio.to_thread(self._insert, normalized, copy.deepcopy(payload))
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._size = self._next = 0
+            self._payloads = [None] * len(self._payloads)
+            self._slot_keys = [None] * len(self._slot_keys)
+            self._guards = [None] * len(self._guards)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "vector_bytes": self._vectors.nbytes + self._signatures.nbytes,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+        }
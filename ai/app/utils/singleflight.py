@@ -0,0 +1,39 @@
+"""
+Coalescencia single-flight de EdiCarex.
+Las llamadas concurrentes con la misma clave comparten una única ejecución upstream.
+"""
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas en curso: la primera lanza la tarea y el resto la espera.
+    La tarea compartida está protegida con `asyncio.shield`, de modo que cancelar a un
+    solicitante no cancela la llamada de los demás. Las excepciones se propagan a todos.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita el aviso "exception was never retrieved" si todos los solicitantes se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
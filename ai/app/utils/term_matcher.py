@@ -0,0 +1,74 @@
+"""
+Búsqueda de términos de EdiCarex en una sola pasada.
+El vocabulario se compila una vez en un trie expresado como una única expresión
+regular (prefijos compartidos, coincidencia más larga por posición), de modo que el
+costo por mensaje no crece con el número de términos.
+"""
+from typing import Any, Dict, Iterator, Tuple
+import re
+import unicodedata
+
+_CLAUSE_BREAK = re.compile(r"[.!?¿¡;:,\n]+")
+_NON_WORD = re.compile(r"[^a-z0-9. ]+")
+_REPEATED = re.compile(r"([a-z])\1+")
+
+
+def normalize(text: str) -> str:
+    """
+    Minúsculas sin tildes, signos de puntuación como límite de cláusula (" . ") y letras
+    repetidas colapsadas ("ayudaaa" -> "ayuda"). Se aplica igual a términos y mensajes.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", _CLAUSE_BREAK.sub(" . ", text))
+    return " ".join(_REPEATED.sub(r"\1", text).split())
+
+
+def _trie_pattern(terms) -> str:
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Cuantificador codicioso: se intenta primero el término más largo
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class TermMatcher:
+    """
+    Diccionario término -> dato compilado en un autómata. `finditer` recorre el texto
+    normalizado una vez y produce (término normalizado, dato, inicio, fin) respetando
+    límites de palabra.
+    """
+
+    def __init__(self, terms: Dict[str, Any]):
+        self.terms: Dict[str, Any] = {}
+        for term, payload in terms.items():
+            key = normalize(term)
+            if key:
+                self.terms.setdefault(key, payload)
+        pattern = _trie_pattern(self.terms) if self.terms else r"(?!x)x"
+        self._regex = re.compile(rf"(?<![a-z0-9])(?:{pattern})(?![a-z0-9])")
+
+    def __len__(self):
+        return len(self.terms)
+
+    def finditer(self, normalized: str) -> Iterator[Tuple[str, Any, int, int]]:
+        for match in self._regex.finditer(normalized):
+            term = match.group()
+            yield term, self.terms[term], match.start(), match.end()
+
+    def search(self, text: str) -> Any:
+        """Dato del primer término presente en `text` (sin normalizar) o None."""
+        for _, payload, _, _ in self.finditer(normalize(text)):
+            return payload
+        return None
@@ -0,0 +1,40 @@
+"""
+Escritura incremental de archivos zip para respuestas en streaming.
+El zip se escribe sobre un búfer no posicionable (zipfile usa entonces descriptores de
+datos): tras añadir cada documento se drenan los bytes ya comprimidos, de modo que en
+memoria solo queda el directorio central (unos pocos bytes por entrada).
+"""
+import zipfile
+
+
+class _Sink:
+    """Destino de solo escritura: sin seek/tell, zipfile lo trata como flujo."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class ZipStream:
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+
+    def add(self, name: str, text: str):
+        self._zip.writestr(name, text)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._sink.chunks)
+        self._sink.chunks.clear()
+        return data
+
+    def close(self) -> bytes:
+        """Escribe el directorio central y devuelve los últimos bytes del archivo."""
+        self._zip.close()
+        return self.drain()
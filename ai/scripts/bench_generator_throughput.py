@@ -0,0 +1,108 @@
+"""
+Benchmark de throughput del generador de documentación clínica.
+
+Genera N documentos sintéticos de tres formas a través de la app completa (transporte
+ASGI en proceso, sin red): una petición `/generator/text` por documento y un único
+lote `/generator/bulk` en NDJSON y en zip. Reporta documentos por segundo de cada una.
+
+Falla (código 1) si el lote NDJSON no alcanza el mínimo de documentos por segundo.
+
+Uso:
+    python scripts/bench_generator_throughput.py --documents 5000 --min-docs-per-s 5000
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx  # noqa: E402
+from app.main import app  # noqa: E402
+
+NAMES = ("Ana Quispe", "Luis Mamani", "Rosa Huamán", "Jorge Flores", "Carmen Rojas", "Pedro Chávez")
+NOTES = (
+    "Amoxicilina 500 mg cada 8 horas por 7 días.",
+    "Paracetamol 1 g cada 8 horas si hay dolor o fiebre. Control en una semana.",
+    "Evaluación por cardiología por soplo sistólico.",
+    "",
+)
+
+
+def build_records(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "template_type": rng.choice(("prescription", "referral", "discharge")),
+            "patient_data": {"name": rng.choice(NAMES), "age": rng.randint(1, 95)},
+            "additional_notes": rng.choice(NOTES),
+        }
+        for _ in range(n)
+    ]
+
+
+async def per_request(client: httpx.AsyncClient, records: list) -> float:
+    start = time.perf_counter()
+    for record in records:
+        response = await client.post("/generator/text", json=record)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def bulk(client: httpx.AsyncClient, records: list, fmt: str) -> tuple:
+    start = time.perf_counter()
+    documents = 0
+    async with client.stream("POST", "/generator/bulk", json={"records": records, "format": fmt}) as response:
+        response.raise_for_status()
+        if fmt == "ndjson":
+            async for line in response.aiter_lines():
+                documents += bool(line) and "generated_text" in json.loads(line)
+        else:
+            body = await response.aread()
+    elapsed = time.perf_counter() - start
+    if fmt == "zip":
+        documents = len(zipfile.ZipFile(io.BytesIO(body)).namelist())
+    return elapsed, documents
+
+
+async def run(args) -> float:
+    records = build_records(args.documents, args.seed)
+    async with app.router.lifespan_context(app):
+        await app.state.warmup
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            sample = records[:args.per_request_sample]
+            single_s = await per_request(client, sample)
+            print(f"Documentos: {args.documents}")
+            print(f"  /generator/text        {len(sample) / single_s:10.0f} docs/s  ({len(sample)} peticiones)")
+            results = {}
+            for fmt in ("ndjson", "zip"):
+                elapsed, documents = await bulk(client, records, fmt)
+                results[fmt] = documents / elapsed
+                print(f"  /generator/bulk {fmt:6s} {results[fmt]:10.0f} docs/s  ({documents} documentos)")
+    print(f"Aceleración del lote NDJSON: {results['ndjson'] / (len(sample) / single_s):.1f}x")
+    return results["ndjson"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--per-request-sample", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--min-docs-per-s", type=float, default=5000.0)
+    args = parser.parse_args()
+
+    throughput = asyncio.run(run(args))
+    if throughput < args.min_docs_per_s:
+        print(f"REGRESIÓN: {throughput:.0f} docs/s por debajo del mínimo de {args.min_docs_per_s:.0f}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
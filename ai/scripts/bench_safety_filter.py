@@ -0,0 +1,172 @@
+"""
+Microbenchmark del filtro de seguridad del chat.
+
+Compara, sobre un corpus sintético de mensajes de pacientes (consultas habituales,
+emergencias con y sin tildes, errores ortográficos y negaciones), el clasificador
+compilado contra el escaneo lineal de subcadenas sobre el mismo léxico.
+
+Antes de medir verifica el léxico: cada frase de EXPECTED_EMERGENCY (incluidas formas
+conjugadas como "me duele el pecho") debe señalarse y ninguna de EXPECTED_SAFE.
+
+Falla (código 1) si la verificación falla o si el p99 por mensaje supera el umbral.
+
+Uso:
+    python scripts/bench_safety_filter.py --messages 20000 --max-p99-us 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import Settings  # noqa: E402
+from app.services.safety_filter import EmergencyClassifier  # noqa: E402
+from app.utils.term_matcher import normalize  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+BENIGN = [
+    "Hola, quisiera agendar una cita con cardiología para la próxima semana",
+    "¿Cuál es el horario de atención del laboratorio los sábados?",
+    "Tengo tos seca desde hace tres días y un poco de dolor de garganta",
+    "Mi hijo tiene fiebre de 38 grados desde anoche, ¿qué le puedo dar?",
+    "Me duele la cabeza cuando paso mucho tiempo frente a la computadora",
+    "¿Necesito ayuno para el análisis de glucosa y colesterol?",
+    "Quiero saber si el seguro cubre la resonancia magnética de rodilla",
+    "Olvidé tomar mi pastilla de la presión esta mañana, ¿la tomo ahora?",
+    "Buenas tardes, ¿me pueden enviar los resultados de mi hemograma?",
+    "No tengo dolor de pecho, solo un poco de acidez después de comer",
+    "Hace una semana tuve diarrea y ya estoy mejor, ¿debo hacerme algún examen?",
+    "I would like to book an appointment with a dermatologist",
+]
+EMERGENCY = [
+    "Mi papá tiene un DOLOR DE PECHO muy fuerte que se va al brazo izquierdo",
+    "mi mama se desmayo y no responde que hago",
+    "creo que mi esposo esta teniendo un imfarto ayudaaa",
+    "Mi bebé está morado y no respira bien",
+    "ya no quiero vivir, todo me sale mal",
+    "Se tomó todas las pastillas del frasco hace media hora",
+    "Mi hija está convulsionando, por favor",
+    "tuve un accidente de tránsito y no para de sangrar la pierna",
+    "my father has chest pain and can't breathe",
+    "emergencia!! mi abuelo tiene la boca torcida y no puede hablar",
+]
+# Verificación de cobertura: formas conjugadas y coloquiales que deben señalarse (también
+# cuando una negación cercana no rige al término), y negaciones o consultas que no
+EXPECTED_EMERGENCY = [
+    "me duele el pecho",
+    "Me duele mucho el pecho desde hace una hora",
+    "a mi papá le duele el pecho y suda frío",
+    "siento que me aprieta el pecho",
+    "estoy sangrando mucho",
+    "mi hijo se cortó y está sangrando mucho",
+    "la herida no deja de sangrar",
+    "está perdiendo mucha sangre",
+    "my chest hurts",
+    "he is bleeding a lot",
+    # Negaciones que no rigen al término
+    "no puedo esperar es urgente",
+    "por favor no tarden es urgente",
+    "no aguanto el dolor de pecho",
+    "no soporto este dolor de pecho",
+    "no me deja de doler el pecho",
+]
+EXPECTED_SAFE = [
+    "no me duele el pecho, solo la espalda",
+    "no tengo dolor de pecho",
+    "mi mamá niega dolor torácico y está tranquila",
+    "nunca tuve un infarto",
+    "ya no estoy sangrando, ¿cuándo me quitan los puntos?",
+    "¿El paracetamol sirve para el dolor de espalda?",
+]
+FILLER = ("además", "también", "desde ayer", "por la mañana", "según el médico", "en casa", "bastante", "un poco")
+
+
+def build_corpus(n: int, emergency_ratio: float, seed: int) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        base = rng.choice(EMERGENCY if rng.random() < emergency_ratio else BENIGN)
+        extra = " ".join(rng.choice(FILLER) for _ in range(rng.randint(0, 12)))
+        corpus.append(f"{base} {extra}".strip())
+    return corpus
+
+
+def linear_scan(terms: list, message: str) -> bool:
+    """Línea base: subcadena por término (el enfoque previo escalado al léxico completo)."""
+    normalized = normalize(message)
+    return any(term in normalized for term in terms)
+
+
+def time_per_message(fn, corpus: list) -> list:
+    samples = []
+    for message in corpus:
+        start = time.perf_counter_ns()
+        fn(message)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def check_coverage(classifier: EmergencyClassifier) -> list:
+    """Mensajes de la verificación clasificados de forma incorrecta."""
+    missed = [m for m in EXPECTED_EMERGENCY if classifier.classify(m) is None]
+    flagged = [m for m in EXPECTED_SAFE if classifier.classify(m) is not None]
+    return [f"no señalado: {m}" for m in missed] + [f"señalado por error: {m}" for m in flagged]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--emergency-ratio", type=float, default=0.05)
+    parser.add_argument("--lexicon", default=os.path.join(ROOT, Settings().emergency_lexicon_path))
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--max-p99-us", type=float, default=200.0)
+    args = parser.parse_args()
+
+    with open(args.lexicon, encoding="utf-8") as f:
+        lexicon = json.load(f)
+    start = time.perf_counter()
+    classifier = EmergencyClassifier(lexicon)
+    build_ms = (time.perf_counter() - start) * 1000
+    terms = list(classifier.matcher.terms)
+    corpus = build_corpus(args.messages, args.emergency_ratio, args.seed)
+
+    compiled = time_per_message(classifier.classify, corpus)
+    baseline = time_per_message(lambda m: linear_scan(terms, m), corpus)
+    flagged = sum(classifier.classify(m) is not None for m in corpus)
+
+    print(f"Léxico v{classifier.version}: {len(terms)} términos, compilado en {build_ms:.1f} ms")
+    print(f"Corpus: {len(corpus)} mensajes, {flagged} señalados como emergencia")
+    for name, samples in (("compilado", compiled), ("lineal", baseline)):
+        total = sum(samples) / 1e6
+        print(f"  {name:10s} p50 {statistics.median(samples):7.1f} µs  p99 {percentile(samples, 99):7.1f} µs  "
+              f"{len(samples) / total:10.0f} mensajes/s")
+    print(f"Aceleración (p50): {statistics.median(baseline) / statistics.median(compiled):.1f}x")
+
+    errors = check_coverage(classifier)
+    print(f"Verificación: {len(EXPECTED_EMERGENCY) + len(EXPECTED_SAFE) - len(errors)}/"
+          f"{len(EXPECTED_EMERGENCY) + len(EXPECTED_SAFE)} mensajes clasificados correctamente")
+    if errors:
+        for error in errors:
+            print(f"  {error}")
+        print("REGRESIÓN: el léxico no cubre las emergencias esperadas")
+        sys.exit(1)
+
+    p99 = percentile(compiled, 99)
+    if p99 > args.max_p99_us:
+        print(f"REGRESIÓN: p99 {p99:.1f} µs supera el umbral de {args.max_p99_us:.0f} µs")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
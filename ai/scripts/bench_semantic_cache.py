@@ -0,0 +1,116 @@
+"""
+Benchmark de la caché semántica del chat a escala de pod.
+
+Llena la caché con N preguntas sintéticas y mide la latencia de consulta, la memoria
+de los vectores, la proporción de variantes (error de escritura + cortesía) que
+recuperan su pregunta original y la de preguntas nuevas que coinciden por error.
+Comprueba además que pares clínicamente distintos (otra edad, otra temperatura, una
+negación) nunca reutilicen la respuesta del otro.
+
+Falla (código 1) si el p99 de consulta supera el umbral o si algún par clínico coincide.
+
+Uso:
+    python scripts/bench_semantic_cache.py --entries 200000 --max-p99-ms 25
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import Settings  # noqa: E402
+from app.utils.semantic_cache import SemanticCache  # noqa: E402
+from app.utils.term_matcher import normalize  # noqa: E402
+
+# (pregunta guardada, pregunta distinta que no debe recibir su respuesta)
+CLINICAL_PAIRS = (
+    ("dosis de paracetamol niño de 5 años", "dosis de paracetamol niño de 2 años"),
+    ("mi hijo tiene 38 de fiebre", "mi hijo tiene 41 de fiebre"),
+    ("mi bebé tiene fiebre", "mi bebé no tiene fiebre"),
+    ("¿Puedo tomar 500 mg de ibuprofeno?", "¿Puedo tomar 500 ml de ibuprofeno?"),
+    ("¿Puedo tomar alcohol con antibióticos?", "¿Puedo tomar antibióticos sin alcohol?"),
+    ("tomo una pastilla cada 8 horas", "tomo una pastilla cada 4 horas"),
+)
+
+OPENINGS = ("¿Puedo", "¿Es normal", "¿Qué pasa si", "¿Cuánto tiempo debo", "¿Es peligroso", "¿Cómo puedo", "¿Por qué")
+
+
+def build_vocabulary(rng: random.Random, size: int) -> list:
+    return ["".join(rng.choice("abcdefgilmnoprstuz") for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def question(rng: random.Random, vocabulary: list) -> str:
+    return f"{rng.choice(OPENINGS)} {' '.join(rng.choice(vocabulary) for _ in range(rng.randint(4, 12)))}?"
+
+
+def variant(rng: random.Random, text: str) -> str:
+    words = text.rstrip("?").split()
+    i = rng.randrange(1, len(words))
+    if len(words[i]) > 4:
+        words[i] = words[i][:-1]
+    return " ".join(words) + " por favor?"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--max-p99-ms", type=float, default=25.0)
+    args = parser.parse_args()
+
+    settings = Settings()
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(rng, args.vocabulary)
+    cache = SemanticCache(args.entries, settings.chat_semantic_cache_threshold, settings.chat_semantic_cache_dim)
+
+    questions = [question(rng, vocabulary) for _ in range(args.entries)]
+    start = time.perf_counter()
+    for i, text in enumerate(questions):
+        cache._insert(normalize(text), {"id": i})
+    insert_s = time.perf_counter() - start
+
+    latencies, recovered, false_hits = [], 0, 0
+    for _ in range(args.queries):
+        i = rng.randrange(len(questions))
+        start = time.perf_counter()
+        payload, score = cache._search(normalize(variant(rng, questions[i])))
+        latencies.append((time.perf_counter() - start) * 1000)
+        recovered += payload is not None and payload["id"] == i and score >= cache.threshold
+        _, score = cache._search(normalize(question(rng, vocabulary)))
+        false_hits += score >= cache.threshold
+
+    unsafe = []
+    for stored, other in CLINICAL_PAIRS:
+        cache._insert(normalize(stored), {"id": stored})
+    for stored, other in CLINICAL_PAIRS:
+        payload, score = cache._search(normalize(other))
+        if payload is not None and score >= cache.threshold:
+            unsafe.append((other, payload["id"], score))
+
+    p99 = sorted(latencies)[int(0.99 * (len(latencies) - 1))]
+    snapshot = cache.snapshot()
+    print(f"Entradas: {snapshot['entries']} (dim {cache.dim}, umbral {cache.threshold})")
+    print(f"Inserción:  {args.entries / insert_s:8.0f} entradas/s")
+    print(f"Memoria de vectores y firmas: {snapshot['vector_bytes'] / 1e6:.1f} MB")
+    print(f"Consulta:   p50 {statistics.median(latencies):6.2f} ms  p99 {p99:6.2f} ms")
+    print(f"Variantes recuperadas: {recovered / args.queries:.1%}  coincidencias falsas: {false_hits / args.queries:.1%}")
+
+    print(f"Pares clínicos distintos: {len(CLINICAL_PAIRS) - len(unsafe)}/{len(CLINICAL_PAIRS)} sin coincidencia")
+    for other, stored, score in unsafe:
+        print(f"  INSEGURO: «{other}» recibiría la respuesta de «{stored}» (similitud {score:.3f})")
+
+    if unsafe:
+        sys.exit(1)
+    if p99 > args.max_p99_ms:
+        print(f"REGRESIÓN: p99 {p99:.2f} ms supera el umbral de {args.max_p99_ms:.0f} ms")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de arranque en frío de EdiCarex AI.
+
+Mide en procesos nuevos:
+  1. El tiempo de `import app.main` y el desglose por módulo (`python -X importtime`).
+  2. El tiempo hasta que uvicorn responde /health/live (pod vivo) y hasta que el
+     calentamiento del lifespan termina (servicios listos), según /health.
+
+Falla (código 1) si la mediana supera los umbrales, para detectar regresiones
+como volver a importar dependencias pesadas a nivel de módulo.
+
+Uso:
+    python scripts/bench_startup.py --runs 3 --max-import-ms 1500 --max-ready-ms 4000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# No deben importarse con app.main: se cargan en el calentamiento
+LAZY_MODULES = ("groq", "pandas", "sklearn")
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench-key")
+    env["PYTHONPATH"] = ROOT
+    return env
+
+
+def measure_imports() -> tuple[float, list]:
+    """Retorna (ms totales de import app.main, [(ms acumulados, profundidad, módulo)])."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        # La indentación del nombre indica la profundidad en el árbol de imports
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        name = raw_name.strip()
+        if name == "app.main":
+            total = int(cumulative_us) / 1000
+        modules.append((int(cumulative_us) / 1000, depth, name))
+    return total, modules
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_server(timeout: float) -> tuple[float, float]:
+    """Retorna (ms hasta /health/live, ms hasta calentamiento completo) desde el lanzamiento."""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live_ms = ready_ms = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if live_ms is None and client.get("/health/live").status_code == 200:
+                        live_ms = (time.perf_counter() - start) * 1000
+                    if live_ms is not None:
+                        warmup = client.get("/health").json().get("warmup", {})
+                        if warmup.get("status") == "done":
+                            ready_ms = (time.perf_counter() - start) * 1000
+                            break
+                        if warmup.get("status") == "failed":
+                            raise RuntimeError("El calentamiento falló")
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    if live_ms is None or ready_ms is None:
+        raise RuntimeError(f"El servidor no estuvo listo en {timeout}s")
+    return live_ms, ready_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Módulos más costosos a listar")
+    parser.add_argument("--max-import-ms", type=float, default=1500.0)
+    parser.add_argument("--max-ready-ms", type=float, default=4000.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    import_runs, live_runs, ready_runs = [], [], []
+    modules = []
+    for _ in range(args.runs):
+        total, modules = measure_imports()
+        import_runs.append(total)
+        live_ms, ready_ms = measure_server(args.timeout)
+        live_runs.append(live_ms)
+        ready_runs.append(ready_ms)
+
+    print("Import por módulo (última ejecución, ms acumulados, importados por app.main):")
+    top_level = sorted(((ms, name) for ms, depth, name in modules if depth == 1), reverse=True)
+    for ms, name in top_level[:args.top]:
+        print(f"  {ms:9.1f}  {name}")
+    eager = [name for name in LAZY_MODULES if any(m[2] == name for m in modules)]
+
+    import_ms = statistics.median(import_runs)
+    live_ms = statistics.median(live_runs)
+    ready_ms = statistics.median(ready_runs)
+    print(f"import app.main:      {import_ms:8.1f} ms (umbral {args.max_import_ms:.0f})")
+    print(f"hasta /health/live:   {live_ms:8.1f} ms")
+    print(f"hasta calentamiento:  {ready_ms:8.1f} ms (umbral {args.max_ready_ms:.0f})")
+
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append("import app.main supera el umbral")
+    if ready_ms > args.max_ready_ms:
+        failures.append("el tiempo hasta servicios listos supera el umbral")
+    if eager:
+        failures.append(f"dependencias pesadas importadas con app.main: {', '.join(eager)}")
+    if failures:
+        print("REGRESIÓN: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de concurrencia para /predict/triage.
+
+Simula la latencia de Groq con un transporte HTTP asíncrono (sin red) y
+verifica que N peticiones paralelas terminen en un tiempo cercano al de una
+sola. Si el bucle de eventos se bloquease, el tiempo total crecería ~N veces.
+
+Uso:
+    python scripts/bench_triage_concurrency.py --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("GROQ_API_KEY", "bench-key")
+
+from app.config import Settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.groq_service import GroqService  # noqa: E402
+from app.services.triage_service import TriageService  # noqa: E402
+from app.services.severity_model import SeverityModel  # noqa: E402
+
+TRIAGE_PAYLOAD = {
+    "symptoms": "Dolor torácico opresivo de 30 minutos",
+    "age": 62,
+    "vitalSigns": {"temperature": 37.2, "bloodPressure": "150/95", "oxygenSaturation": 94},
+}
+
+
+def build_fake_groq_transport(latency: float) -> httpx.MockTransport:
+    """Transporte que responde como Groq tras `latency` segundos sin bloquear el loop."""
+    body = {
+        "id": "bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "llama-3.3-70b-versatile",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": json.dumps({
+                    "score": 70,
+                    "priority": "NARANJA (Muy Urgente)",
+                    "notes": "Respuesta simulada de benchmark con longitud suficiente para no enriquecerse.",
+                    "confidence": 0.9,
+                }),
+            },
+        }],
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=body)
+
+    return httpx.MockTransport(handler)
+
+
+async def run(n_requests: int, latency: float) -> tuple[float, float]:
+    fake_http = httpx.AsyncClient(transport=build_fake_groq_transport(latency))
+    # Cuota holgada: el benchmark mide el bucle de eventos, no el limitador
+    settings = Settings(groq_requests_per_minute=100_000, groq_tokens_per_minute=100_000_000)
+    app.state.groq = GroqService(settings, http_client=fake_http)
+    app.state.triage_service = TriageService(app.state.groq, SeverityModel.load(settings.severity_model_path))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        resp = await client.post("/predict/triage", json=TRIAGE_PAYLOAD)
+        resp.raise_for_status()
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/predict/triage", json=TRIAGE_PAYLOAD) for _ in range(n_requests)
+        ])
+        parallel = time.perf_counter() - start
+
+    for r in responses:
+        r.raise_for_status()
+    await fake_http.aclose()
+    return single, parallel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Latencia simulada de Groq (s)")
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="Máximo permitido de tiempo paralelo / tiempo de una petición")
+    args = parser.parse_args()
+
+    single, parallel = asyncio.run(run(args.requests, args.latency))
+    ratio = parallel / single
+    print(f"1 petición:          {single:.3f}s")
+    print(f"{args.requests} peticiones paralelas: {parallel:.3f}s (ratio {ratio:.2f}x)")
+    if ratio > args.max_ratio:
+        print(f"FALLO: el ratio supera {args.max_ratio}x; el bucle de eventos se está bloqueando.")
+        sys.exit(1)
+    print("OK: el throughput escala con las peticiones concurrentes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Entrenamiento offline del modelo de severidad de triaje de EdiCarex.
+
+Genera el artefacto versionado que TriageService carga una sola vez al arrancar:
+    models/triage_severity_v<N>.npy   Parámetros (memory-mappable)
+    models/triage_severity_v<N>.json  Metadatos: features, centros, imputación, métricas
+
+Etiquetado: alta severidad = NEWS2 >= 5 (más 1 punto por edad >= 65) sobre una cohorte
+de referencia. Mientras no se disponga de datos clínicos reales anonimizados, la cohorte
+se genera con rangos fisiológicos publicados (semilla fija, resultado reproducible).
+
+Uso:
+    python scripts/train_severity_model.py --version 1 --samples 200000
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+FEATURES = ["age", "temperature", "oxygenSaturation", "systolicBP", "heartRate", "respiratoryRate"]
+# Centro fisiológico de cada variable: el modelo usa el valor y su desviación cuadrática
+CENTERS = [40.0, 37.0, 98.0, 120.0, 75.0, 16.0]
+# Imputación cuando el signo vital no se informa (valor normal de referencia)
+DEFAULTS = [40.0, 37.0, 98.0, 120.0, 75.0, 16.0]
+
+
+def generate_reference_cohort(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Mezcla de pacientes estables (70%) y descompensados (30%) con rangos realistas."""
+    stable = rng.random(n) < 0.7
+    age = np.clip(rng.gamma(4.0, 12.0, n), 0, 105)
+    temp = np.where(stable, rng.normal(36.9, 0.4, n), rng.normal(38.0, 1.4, n))
+    spo2 = np.where(stable, rng.normal(97.5, 1.2, n), rng.normal(91.0, 5.0, n))
+    sbp = np.where(stable, rng.normal(122, 14, n), rng.normal(118, 38, n))
+    hr = np.where(stable, rng.normal(76, 10, n), rng.normal(105, 25, n))
+    rr = np.where(stable, rng.normal(15, 2, n), rng.normal(23, 6, n))
+    X = np.column_stack([age, temp, np.clip(spo2, 60, 100), np.clip(sbp, 50, 260), np.clip(hr, 25, 200), np.clip(rr, 4, 50)])
+    return X
+
+
+def news2_score(X: np.ndarray) -> np.ndarray:
+    """Puntaje NEWS2 vectorizado (escala 1 de SpO2, sin O2 suplementario ni AVPU)."""
+    age, temp, spo2, sbp, hr, rr = X.T
+    score = np.zeros(len(X))
+    score += np.select([rr <= 8, rr <= 11, rr <= 20, rr <= 24], [3, 1, 0, 2], 3)
+    score += np.select([spo2 <= 91, spo2 <= 93, spo2 <= 95], [3, 2, 1], 0)
+    score += np.select([sbp <= 90, sbp <= 100, sbp <= 110, sbp <= 219], [3, 2, 1, 0], 3)
+    score += np.select([hr <= 40, hr <= 50, hr <= 90, hr <= 110, hr <= 130], [3, 1, 0, 1, 2], 3)
+    score += np.select([temp <= 35.0, temp <= 36.0, temp <= 38.0, temp <= 39.0], [3, 1, 0, 1], 2)
+    score += (age >= 65).astype(float)
+    return score
+
+
+def expand_features(X: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """[x, (x - centro)^2] por variable: permite relaciones en U (hipo/hiper)."""
+    return np.hstack([X, (X - centers) ** 2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", type=int, default=1)
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--out-dir", default=os.path.join(os.path.dirname(__file__), "..", "models"))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    X = generate_reference_cohort(args.samples, rng)
+    y = (news2_score(X) >= 5).astype(int)
+
+    centers = np.array(CENTERS)
+    phi = expand_features(X, centers)
+    phi_train, phi_test, y_train, y_test = train_test_split(phi, y, test_size=0.2, random_state=args.seed, stratify=y)
+
+    scaler = StandardScaler().fit(phi_train)
+    clf = LogisticRegression(max_iter=2000).fit(scaler.transform(phi_train), y_train)
+
+    proba = clf.predict_proba(scaler.transform(phi_test))[:, 1]
+    metrics = {
+        "auc": round(float(roc_auc_score(y_test, proba)), 4),
+        "accuracy": round(float(accuracy_score(y_test, proba >= 0.5)), 4),
+        "positive_rate": round(float(y.mean()), 4),
+        "samples": int(args.samples),
+    }
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    base = os.path.join(args.out_dir, f"triage_severity_v{args.version}")
+    # Filas: media del escalador, escala del escalador, coeficientes
+    params = np.vstack([scaler.mean_, scaler.scale_, clf.coef_[0]]).astype(np.float64)
+    np.save(base + ".npy", params)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": args.version,
+            "features": FEATURES,
+            "centers": CENTERS,
+            "defaults": DEFAULTS,
+            "intercept": float(clf.intercept_[0]),
+            "label": "NEWS2 >= 5 (+1 si edad >= 65)",
+            "reference_data": f"Cohorte sintética de referencia (semilla {args.seed})",
+            "trained_at": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "metrics": metrics,
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"Modelo v{args.version} guardado en {base}.npy / .json -> {metrics}")
+
+
+if __name__ == "__main__":
+    main()